@@ -0,0 +1,189 @@
+"""
+Benchmark del reparto de ancho de banda entre descargas simultáneas.
+
+Sirve archivos desde un servidor HTTP local sin límite de velocidad y
+descarga a la vez un archivo grande (un 4K) y varios pequeños (MP3s) con
+ParallelYoutubeDL. Primero sin límite global y luego con BandwidthScheduler
+limitado a ``--limit-mb``, donde el trabajo grande tiene prioridad
+``--big-priority``. Muestra cuánto tarda cada trabajo y la velocidad media
+conseguida (del primer byte al último).
+
+Con límite, termina con error si el total no llega al ``--min-usage`` del
+límite o si algún trabajo no llega al ``--min-fair`` de su parte justa
+ponderada (la velocidad que tendría con un reparto ideal).
+
+Uso:
+    python scripts/bench_bandwidth.py [--limit-mb 16] [--big-mb 64] [--small-mb 4] [--small-jobs 3] [--big-priority 0]
+                                      [--min-usage 0.9] [--min-fair 0.8]
+"""
+import argparse
+import http.server
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add project root to sys path (one level up from scripts)
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.services.parallel_ydl import ParallelYoutubeDL
+from src.services.bandwidth import BandwidthScheduler, BandwidthShare
+
+
+def make_handler(files, sent):
+    class FileHandler(http.server.BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            data = files.get(self.path.lstrip('/'))
+            if data is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            # Primer byte: la conexión y la extracción no son reparto
+            sent[self.path.lstrip('/')] = time.perf_counter()
+            try:
+                self.wfile.write(data)
+            except OSError:
+                pass
+    return FileHandler
+
+
+def fair_rates(sizes, weights, limit):
+    """
+    Velocidad media de cada trabajo con un reparto ideal: ``limit``
+    repartido por peso entre los que no han terminado, empezando a la vez.
+    """
+    remaining = dict(sizes)
+    elapsed, finished = 0.0, {}
+    while remaining:
+        total_weight = sum(weights[name] for name in remaining)
+        rates = {name: limit * weights[name] / total_weight for name in remaining}
+        step = min(remaining[name] / rates[name] for name in remaining)
+        elapsed += step
+        for name in list(remaining):
+            remaining[name] -= rates[name] * step
+            if remaining[name] <= 1:
+                del remaining[name]
+                finished[name] = elapsed
+    return {name: sizes[name] / finished[name] for name in sizes}
+
+
+def download(name, base_url, folder, share, results):
+    info = {
+        'id': name,
+        'title': name,
+        'extractor': 'generic',
+        'extractor_key': 'Generic',
+        'webpage_url': f'{base_url}/{name}',
+        'formats': [{'format_id': 'file', 'url': f'{base_url}/{name}', 'ext': 'bin'}],
+    }
+    times = {}
+
+    def on_progress(progress):
+        if progress['status'] == 'finished':
+            times['last'] = time.perf_counter()
+
+    params = {
+        'outtmpl': str(Path(folder) / '%(id)s.%(ext)s'),
+        'quiet': True,
+        'noprogress': True,
+        'no_warnings': True,
+        'progress_hooks': [on_progress],
+    }
+    try:
+        # Sin rangos: una conexión por archivo, como un MP3 o un stream progresivo
+        with ParallelYoutubeDL(params, segmented=False, bandwidth=share) as ydl:
+            ydl.process_ie_result(info, download=True)
+    finally:
+        # Como DownloaderService.download: la parte se libera al terminar
+        if share:
+            share.close()
+    results[name] = times['last']
+
+
+def run_case(scheduler, priorities, sizes, base_url, folder, sent):
+    for f in Path(folder).iterdir():
+        f.unlink()
+    sent.clear()
+    results, threads = {}, []
+    for name, priority in priorities.items():
+        share = scheduler.open(name, priority) if scheduler else None
+        threads.append(threading.Thread(target=download, args=(name, base_url, folder, share, results)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    rates = {}
+    for name in priorities:
+        first, last = sent[name], results[name]
+        rates[name] = sizes[name] / (last - first)
+        print(f"  {name:<8} {priorities[name]:>9} {last - first:>9.2f} {rates[name] / 1024 / 1024:>9.1f}")
+    start = min(sent.values())
+    end = max(results.values())
+    total = sum(sizes.values()) / (end - start)
+    print(f"  {'total':<8} {'':>9} {end - start:>9.2f} {total / 1024 / 1024:>9.1f}")
+    return total, rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--limit-mb', type=float, default=16, help='Ancho de banda global (MB/s)')
+    parser.add_argument('--big-mb', type=float, default=64, help='Tamaño del archivo grande')
+    parser.add_argument('--small-mb', type=float, default=4, help='Tamaño de cada archivo pequeño')
+    parser.add_argument('--small-jobs', type=int, default=3, help='Número de archivos pequeños')
+    parser.add_argument('--big-priority', type=int, default=0, help='Prioridad del archivo grande')
+    parser.add_argument('--min-usage', type=float, default=0.9, help='Fracción mínima del límite usada en total')
+    parser.add_argument('--min-fair', type=float, default=0.8, help='Fracción mínima de la parte justa por trabajo')
+    args = parser.parse_args()
+
+    files = {'big': os.urandom(int(args.big_mb * 1024 * 1024))}
+    for i in range(args.small_jobs):
+        files[f'small{i}'] = os.urandom(int(args.small_mb * 1024 * 1024))
+    sizes = {name: len(data) for name, data in files.items()}
+    priorities = {name: args.big_priority if name == 'big' else 0 for name in files}
+
+    sent = {}
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), make_handler(files, sent))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    limit = int(args.limit_mb * 1024 * 1024)
+    folder = tempfile.mkdtemp(prefix='bench_bandwidth_')
+    try:
+        print(f"  {'trabajo':<8} {'prioridad':>9} {'segundos':>9} {'MB/s':>9}")
+        print('sin límite')
+        run_case(None, priorities, sizes, base_url, folder, sent)
+        print(f'límite global de {args.limit_mb:g} MB/s')
+        scheduler = BandwidthScheduler(limit)
+        total, rates = run_case(scheduler, priorities, sizes, base_url, folder, sent)
+    finally:
+        server.shutdown()
+        shutil.rmtree(folder, ignore_errors=True)
+
+    failures = []
+    if total < limit * args.min_usage:
+        failures.append(f"total {total / 1024 / 1024:.1f} MB/s < {args.min_usage:.0%} del límite")
+    weights = {name: BandwidthShare(scheduler, name, priority).weight for name, priority in priorities.items()}
+    for name, fair in fair_rates(sizes, weights, limit).items():
+        if rates[name] < fair * args.min_fair:
+            failures.append(
+                f"{name} {rates[name] / 1024 / 1024:.1f} MB/s < {args.min_fair:.0%} de su parte justa "
+                f"({fair / 1024 / 1024:.1f} MB/s)"
+            )
+    for failure in failures:
+        print(f"FALLO: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark de latencia del event loop con escaneos concurrentes.
+
+Lanza N escaneos lentos (get_video_info simulado con un sleep bloqueante) y,
+mientras tanto, mide la latencia de /health y /api/download/progress/{id}.
+Si los escaneos bloquearan el event loop, el p99 crecería con N. Termina
+con error si algún escaneo no responde 200 (las latencias medirían un
+event loop ocioso).
+
+Requiere httpx (``pip install -r requirements-dev.txt``).
+
+Uso:
+    python scripts/bench_event_loop.py [--scans 1,4,16] [--scan-seconds 2]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add project root to sys path (one level up from scripts)
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import httpx
+
+from src.app import app
+from src.api import routes
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+async def probe_latency(client, path, stop, samples):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get(path)
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+
+
+async def run_case(n_scans, scan_seconds):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        stop = asyncio.Event()
+        samples = {'/health': [], '/api/download/progress/bench': []}
+        probes = [
+            asyncio.create_task(probe_latency(client, path, stop, values))
+            for path, values in samples.items()
+        ]
+        scans = [
+            asyncio.create_task(client.get('/api/scan', params={'url': f'https://example.com/{i}'}))
+            for i in range(n_scans)
+        ]
+        # Al menos la duración de un escaneo para tener muestras bajo carga
+        await asyncio.sleep(max(scan_seconds, 0.5))
+        responses = await asyncio.gather(*scans)
+        stop.set()
+        await asyncio.gather(*probes)
+    failed = [response for response in responses if response.status_code != 200]
+    if failed:
+        raise SystemExit(f"{len(failed)}/{n_scans} escaneos fallaron: {failed[0].status_code} {failed[0].text[:200]}")
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scans', default='0,1,4,16', help='Escaneos concurrentes por caso (lista)')
+    parser.add_argument('--scan-seconds', type=float, default=2.0, help='Duración simulada de cada escaneo')
+    args = parser.parse_args()
+
+    # Misma firma que DownloaderService.get_video_info
+    def slow_scan(url, scan_id=None, **kwargs):
+        time.sleep(args.scan_seconds)
+        return {'title': 'bench', 'webpage_url': url, 'qualities': []}
+
+    routes.downloader.get_video_info = slow_scan
+
+    print(f"{'scans':>6} {'endpoint':<30} {'n':>5} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for n in [int(x) for x in args.scans.split(',')]:
+        samples = asyncio.run(run_case(n, args.scan_seconds))
+        for path, values in samples.items():
+            print(f"{n:>6} {path:<30} {len(values):>5} "
+                  f"{statistics.median(values):>8.2f} {percentile(values, 99):>8.2f} {max(values):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
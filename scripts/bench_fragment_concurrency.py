@@ -0,0 +1,130 @@
+"""
+Benchmark de descarga HLS fragmento a fragmento vs. con concurrencia adaptativa.
+
+Sirve una lista m3u8 desde un servidor HTTP local que limita la velocidad
+de cada conexión y responde 429 si hay más de ``--server-limit``
+peticiones simultáneas (como un CDN que protege sus VODs). Descarga la
+lista con ParallelYoutubeDL sin presupuesto de fragmentos (un fragmento
+detrás de otro, como antes) y con FragmentBudget, que sube la concurrencia
+mientras el rendimiento mejora y la recorta ante los 429.
+
+Uso:
+    python scripts/bench_fragment_concurrency.py [--fragments 60] [--fragment-kb 512] [--rate-mb 2] [--server-limit 6]
+"""
+import argparse
+import http.server
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add project root to sys path (one level up from scripts)
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.services.parallel_ydl import ParallelYoutubeDL
+from src.services.fragment_budget import FragmentBudget
+
+
+def make_handler(fragments, size, rate, server_limit, counters):
+    lock = threading.Lock()
+    playlist = ('#EXTM3U\n#EXT-X-TARGETDURATION:4\n'
+                + ''.join(f'#EXTINF:4,\nseg{i}.ts\n' for i in range(fragments))
+                + '#EXT-X-ENDLIST\n').encode()
+    data = bytes(size)
+
+    class FragmentHandler(http.server.BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.endswith('.m3u8'):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/vnd.apple.mpegurl')
+                self.send_header('Content-Length', str(len(playlist)))
+                self.end_headers()
+                self.wfile.write(playlist)
+                return
+            with lock:
+                counters['active'] += 1
+                counters['peak'] = max(counters['peak'], counters['active'])
+                rejected = counters['active'] > server_limit
+                counters['429'] += rejected
+            try:
+                if rejected:
+                    self.send_response(429)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'video/mp2t')
+                self.send_header('Content-Length', str(size))
+                self.end_headers()
+                chunk = 64 * 1024
+                start = time.perf_counter()
+                for offset in range(0, size, chunk):
+                    # Limitar cada conexión a ``rate`` bytes/s
+                    wait = offset / rate - (time.perf_counter() - start)
+                    if wait > 0:
+                        time.sleep(wait)
+                    self.wfile.write(data[offset:offset + chunk])
+            except OSError:
+                pass
+            finally:
+                with lock:
+                    counters['active'] -= 1
+    return FragmentHandler
+
+
+def run_case(budget, url, folder, counters):
+    for f in Path(folder).iterdir():
+        f.unlink()
+    counters.update({'active': 0, 'peak': 0, '429': 0})
+    params = {
+        'outtmpl': str(Path(folder) / 'bench.%(ext)s'),
+        'quiet': True,
+        'noprogress': True,
+        'no_warnings': True,
+        'hls_use_mpegts': True,
+        'concurrent_fragment_downloads': 16 if budget else 1,
+        'fragment_retries': 20,
+        'retry_sleep_functions': {'fragment': lambda n: 0.2},
+    }
+    start = time.perf_counter()
+    with ParallelYoutubeDL(params, fragment_budget=budget) as ydl:
+        ydl.download([url])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fragments', type=int, default=60, help='Fragmentos de la lista')
+    parser.add_argument('--fragment-kb', type=int, default=512, help='Tamaño de cada fragmento (KB)')
+    parser.add_argument('--rate-mb', type=float, default=2, help='Velocidad máxima por conexión (MB/s)')
+    parser.add_argument('--server-limit', type=int, default=6, help='Peticiones simultáneas antes de responder 429')
+    args = parser.parse_args()
+
+    counters = {}
+    handler = make_handler(args.fragments, args.fragment_kb * 1024, args.rate_mb * 1024 * 1024, args.server_limit, counters)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/vod/playlist.m3u8'
+
+    folder = tempfile.mkdtemp(prefix='bench_fragments_')
+    try:
+        print(f"{'modo':<12} {'segundos':>9} {'pico':>5} {'429':>5} {'límite final':>13}")
+        seconds = run_case(None, url, folder, counters)
+        print(f"{'secuencial':<12} {seconds:>9.2f} {counters['peak']:>5} {counters['429']:>5} {1:>13}")
+        budget = FragmentBudget(host_limits={}, default_limit=2)
+        seconds = run_case(budget, url, folder, counters)
+        learned = budget.stats()['learned'].get('127.0.0.1')
+        print(f"{'adaptativo':<12} {seconds:>9.2f} {counters['peak']:>5} {counters['429']:>5} {learned:>13}")
+    finally:
+        server.shutdown()
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark de búsqueda de archivos de un trabajo: glob en la carpeta
+compartida vs. carpeta propia e índice.
+
+Crea ``--files`` trabajos terminados de dos formas: todos en una misma
+carpeta (``<id>.mp4``, como antes) y cada uno en su subcarpeta con
+JobFileIndex. Mide lo que cuesta encontrar la salida de un trabajo
+(``glob('<id>.*')`` frente a consultar el índice) y limpiar sus parciales
+(glob frente a recorrer su carpeta scratch).
+
+Uso:
+    python scripts/bench_job_files.py [--files 100000] [--lookups 200]
+"""
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to sys path (one level up from scripts)
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.services.job_files import JobFileIndex
+
+
+def timed(func, job_ids):
+    start = time.perf_counter()
+    for job_id in job_ids:
+        func(job_id)
+    return (time.perf_counter() - start) / len(job_ids) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=100000, help='Trabajos (archivos) en la carpeta de descargas')
+    parser.add_argument('--lookups', type=int, default=200, help='Búsquedas a medir')
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix='bench_job_files_'))
+    try:
+        job_ids = [f'{i:08x}' for i in range(args.files)]
+        flat = root / 'flat'
+        flat.mkdir()
+        print(f"Creando {args.files} archivos en una carpeta y en {args.files} carpetas de trabajo...")
+        for job_id in job_ids:
+            (flat / f'{job_id}.mp4').touch()
+
+        index = JobFileIndex(root / 'jobs', root / 'job_files.jsonl', root / 'scratch')
+        # Alta directa en el índice: aquí solo interesa el coste de las búsquedas
+        for job_id in job_ids:
+            path = index.directory(job_id)
+            path.mkdir()
+            (path / f'{job_id}.mp4').touch()
+            index.scratch(job_id).mkdir()
+            (index.scratch(job_id) / f'{job_id}.mp4.part').touch()
+            index._jobs[job_id] = {'files': [str(path / f'{job_id}.mp4')], 'created': 0}
+        index._compact()
+
+        sample = random.sample(job_ids, min(args.lookups, len(job_ids)))
+        print(f"{'operación':<28} {'ms por trabajo':>15}")
+        print(f"{'glob en carpeta compartida':<28} {timed(lambda j: list(flat.glob(f'{j}.*')), sample):>15.3f}")
+        print(f"{'índice (files)':<28} {timed(index.files, sample):>15.3f}")
+        print(f"{'scratch propio (scan)':<28} {timed(lambda j: index.scan(j, include_partial=True), sample):>15.3f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark de descarga secuencial vs. paralela de video + audio.
+
+Sirve dos archivos desde un servidor HTTP local que limita la velocidad de
+cada conexión (como hacen los CDN por stream) y descarga la selección
+``video+audio`` con ParallelYoutubeDL, primero con los streams uno detrás
+de otro y luego a la vez. Sin ffmpeg no se mezclan: se mide solo la
+descarga, que es lo que cambia.
+
+Uso:
+    python scripts/bench_parallel_streams.py [--video-mb 16] [--audio-mb 4] [--rate-mb 8]
+"""
+import argparse
+import http.server
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add project root to sys path (one level up from scripts)
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.services.parallel_ydl import ParallelYoutubeDL
+
+
+def make_handler(files, rate):
+    class ThrottledHandler(http.server.BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            data = files.get(self.path.lstrip('/'))
+            if data is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            chunk = 64 * 1024
+            start = time.perf_counter()
+            for offset in range(0, len(data), chunk):
+                # Limitar cada conexión a ``rate`` bytes/s
+                wait = offset / rate - (time.perf_counter() - start)
+                if wait > 0:
+                    time.sleep(wait)
+                try:
+                    self.wfile.write(data[offset:offset + chunk])
+                except OSError:
+                    return
+    return ThrottledHandler
+
+
+def run_case(parallel, base_url, folder):
+    for f in Path(folder).iterdir():
+        f.unlink()
+    info = {
+        'id': 'bench',
+        'title': 'bench',
+        'extractor': 'generic',
+        'extractor_key': 'Generic',
+        'webpage_url': base_url,
+        'formats': [
+            {'format_id': 'video', 'url': f'{base_url}/video', 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'none'},
+            {'format_id': 'audio', 'url': f'{base_url}/audio', 'ext': 'm4a', 'vcodec': 'none', 'acodec': 'mp4a'},
+        ],
+    }
+    params = {
+        'outtmpl': str(Path(folder) / '%(id)s.%(ext)s'),
+        'format': 'video+audio',
+        # Sin ffmpeg: descargar ambos streams sin mezclarlos
+        'allow_unplayable_formats': True,
+        'quiet': True,
+        'noprogress': True,
+        'no_warnings': True,
+    }
+    start = time.perf_counter()
+    with ParallelYoutubeDL(params, parallel_streams=parallel) as ydl:
+        ydl.process_ie_result(info, download=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--video-mb', type=float, default=16, help='Tamaño del stream de video')
+    parser.add_argument('--audio-mb', type=float, default=4, help='Tamaño del stream de audio')
+    parser.add_argument('--rate-mb', type=float, default=8, help='Velocidad máxima por conexión (MB/s)')
+    args = parser.parse_args()
+
+    files = {
+        'video': os.urandom(int(args.video_mb * 1024 * 1024)),
+        'audio': os.urandom(int(args.audio_mb * 1024 * 1024)),
+    }
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), make_handler(files, args.rate_mb * 1024 * 1024))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    folder = tempfile.mkdtemp(prefix='bench_streams_')
+    try:
+        print(f"{'modo':<12} {'segundos':>9}")
+        for name, parallel in (('secuencial', False), ('paralelo', True)):
+            print(f"{name:<12} {run_case(parallel, base_url, folder):>9.2f}")
+    finally:
+        server.shutdown()
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Micro-benchmark del hook de progreso de descargas.
+
+Compara el coste por llamada del hook anterior (limpiar ANSI con regex y
+publicar cadenas formateadas en cada bloque) con ``DownloadProgressHook``
+(campos numéricos, EMA de velocidad y publicación limitada).
+
+Uso:
+    python scripts/bench_progress_hook.py [--calls 200000]
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+# Add project root to sys path (one level up from scripts)
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.services.downloader import DownloadProgressHook, download_jobs
+
+
+def make_legacy_hook(unique_id):
+    """Copia del hook anterior (closure en DownloaderService.download)"""
+    def clean_ansi(text):
+        ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+        return ansi_escape.sub('', str(text)) if text else ''
+
+    def progress_hook(d):
+        if download_jobs.take_cancel(unique_id):
+            raise Exception('Descarga cancelada por el usuario')
+        if d['status'] == 'downloading':
+            percent_str = clean_ansi(d.get('_percent_str', '0%')).strip().replace('%', '')
+            try:
+                percent = float(percent_str)
+            except ValueError:
+                percent = 0
+            download_jobs.update(
+                unique_id,
+                status='downloading',
+                percent=percent,
+                speed=clean_ansi(d.get('_speed_str', '')),
+                eta=clean_ansi(d.get('_eta_str', '')),
+                downloaded_bytes=clean_ansi(d.get('_downloaded_bytes_str', '')),
+                total_bytes=clean_ansi(d.get('_total_bytes_str', d.get('_total_bytes_estimate_str', '')))
+            )
+    return progress_hook
+
+
+def make_events(n, total=500 * 1024 * 1024):
+    """Eventos 'downloading' como los que emite yt-dlp (con cadenas ya formateadas)"""
+    chunk = total // n
+    events = []
+    for i in range(n):
+        downloaded = chunk * (i + 1)
+        events.append({
+            'status': 'downloading',
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+            'speed': 5e6 + (i % 100) * 1e4,
+            'eta': (total - downloaded) // 5_000_000,
+            '_percent_str': f'\x1b[0;94m{downloaded * 100 / total:5.1f}%\x1b[0m',
+            '_speed_str': '\x1b[0;32m   4.77MiB/s\x1b[0m',
+            '_eta_str': '\x1b[0;33m01:40\x1b[0m',
+            '_downloaded_bytes_str': f'{downloaded / 1048576:.2f}MiB',
+            '_total_bytes_str': '500.00MiB',
+        })
+    return events
+
+
+def bench(name, hook, events):
+    start = time.perf_counter()
+    for d in events:
+        hook(d)
+    elapsed = time.perf_counter() - start
+    version = download_jobs.version(name)
+    print(f"{name:<10} {elapsed * 1e9 / len(events):>10.0f} ns/llamada {version:>10} actualizaciones")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200_000, help='Llamadas al hook por caso')
+    args = parser.parse_args()
+
+    events = make_events(args.calls)
+    for name in ('legacy', 'numeric'):
+        download_jobs.create(name, status='starting')
+
+    bench('legacy', make_legacy_hook('legacy'), events)
+    bench('numeric', DownloadProgressHook('numeric'), events)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark de conversión a MP4 H.264: recodificación completa vs. plan por probe.
+
+Genera con ffmpeg (lavfi) un corpus de archivos sintéticos con distintas
+combinaciones de contenedor y códecs (H.264/AAC en MP4 y MKV, H.264/Opus,
+VP9/AAC, VP9/Opus, MPEG-4/MP3) y convierte cada uno de dos formas: siempre
+con libx264 + AAC (como antes) y con el plan de ``plan_h264``, que copia
+los streams compatibles. Muestra el modo elegido, los segundos de cada
+forma y la aceleración.
+
+Requiere ffmpeg y ffprobe en el PATH (o en las rutas de FFMPEG_LOCATIONS).
+
+Uso:
+    python scripts/bench_remux.py [--seconds 30] [--size 1280x720]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to sys path (one level up from scripts)
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import ffmpeg
+
+from src.utils import find_ffmpeg
+from src.services.conversion_plan import plan_h264, h264_output
+from src.services.ffmpeg_progress import run_with_progress
+
+# (archivo, códec de vídeo, códec de audio, opciones extra)
+CORPUS = [
+    ('h264_aac.mp4', 'libx264', 'aac', []),
+    ('h264_aac.mkv', 'libx264', 'aac', []),
+    ('h264_opus.mkv', 'libx264', 'libopus', []),
+    ('vp9_aac.mkv', 'libvpx-vp9', 'aac', ['-deadline', 'realtime', '-cpu-used', '8']),
+    ('vp9_opus.webm', 'libvpx-vp9', 'libopus', ['-deadline', 'realtime', '-cpu-used', '8']),
+    ('mpeg4_mp3.avi', 'mpeg4', 'libmp3lame', []),
+]
+
+
+def generate(folder: Path, seconds: int, size: str):
+    """Crea los archivos del corpus que permitan los codificadores instalados"""
+    files = []
+    for name, vcodec, acodec, extra in CORPUS:
+        path = folder / name
+        args = [
+            'ffmpeg', '-v', 'error', '-y',
+            '-f', 'lavfi', '-i', f'testsrc2=size={size}:rate=30:duration={seconds}',
+            '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+            '-c:v', vcodec, '-pix_fmt', 'yuv420p', '-c:a', acodec, *extra, str(path),
+        ]
+        result = subprocess.run(args, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"  (se omite {name}: {result.stderr.strip().splitlines()[-1:]})")
+            continue
+        files.append(path)
+    return files
+
+
+def convert(input_path: Path, output_path: Path, plan: dict) -> float:
+    start = time.perf_counter()
+    run_with_progress(ffmpeg.compile(h264_output(str(input_path), str(output_path), plan), overwrite_output=True), lambda progress: None)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=int, default=30, help='Duración de cada archivo sintético')
+    parser.add_argument('--size', default='1280x720', help='Resolución de los archivos sintéticos')
+    args = parser.parse_args()
+
+    ffmpeg_dir = find_ffmpeg()
+    if not ffmpeg_dir:
+        print("ffmpeg no encontrado")
+        return
+    os.environ["PATH"] += os.pathsep + ffmpeg_dir
+
+    folder = Path(tempfile.mkdtemp(prefix='bench_remux_'))
+    try:
+        print(f"Generando corpus de {args.seconds}s a {args.size}...")
+        files = generate(folder, args.seconds, args.size)
+
+        print(f"{'archivo':<16} {'modo':<16} {'completa (s)':>12} {'plan (s)':>9} {'x':>7}")
+        total_full = total_planned = 0.0
+        for path in files:
+            plan = plan_h264(ffmpeg.probe(str(path)))
+            # Misma selección de streams, pero recodificando siempre
+            full = dict(plan, video='libx264' if plan['video'] else None, audio='aac' if plan['audio'] else None)
+            full_seconds = convert(path, folder / f'{path.stem}_full.mp4', full)
+            planned_seconds = convert(path, folder / f'{path.stem}_plan.mp4', plan)
+            total_full += full_seconds
+            total_planned += planned_seconds
+            print(f"{path.name:<16} {plan['mode']:<16} {full_seconds:>12.2f} {planned_seconds:>9.2f} {full_seconds / planned_seconds:>7.1f}")
+        if files:
+            print(f"{'total':<16} {'':<16} {total_full:>12.2f} {total_planned:>9.2f} {total_full / total_planned:>7.1f}")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark de varias salidas: una pasada por salida vs. una sola decodificación.
+
+Genera con ffmpeg (lavfi) un vídeo sintético H.264 y produce de él las
+salidas pedidas (por defecto 720p, 480p y MP3 a 192k) de dos formas: un
+proceso ffmpeg por salida, que decodifica el origen cada vez, y un único
+proceso con ``split``/``asplit`` (``renditions_output``). Muestra los
+segundos de cada forma y comprueba que las salidas coinciden en duración.
+
+Requiere ffmpeg y ffprobe en el PATH (o en las rutas de FFMPEG_LOCATIONS).
+
+Uso:
+    python scripts/bench_renditions.py [--seconds 30] [--size 1920x1080] [--outputs mp4:720,mp4:480,mp3:192]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to sys path (one level up from scripts)
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import ffmpeg
+
+from src.utils import find_ffmpeg
+from src.services.renditions import plan_renditions, renditions_output
+from src.services.ffmpeg_progress import run_with_progress
+
+
+def parse_profiles(spec: str) -> list:
+    """'mp4:720,mp3:192' -> perfiles de salida"""
+    profiles = []
+    for item in spec.split(','):
+        fmt, _, value = item.partition(':')
+        value = int(value) if value else None
+        if fmt == 'mp3':
+            profiles.append({'format': 'mp3', 'quality': None, 'audio_quality': value})
+        else:
+            profiles.append({'format': 'mp4', 'quality': value, 'audio_quality': None})
+    return profiles
+
+
+def run(input_path: Path, renditions: list, paths: list) -> float:
+    start = time.perf_counter()
+    stream = renditions_output(str(input_path), renditions, [str(path) for path in paths])
+    run_with_progress(ffmpeg.compile(stream, overwrite_output=True), lambda progress: None)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=int, default=30, help='Duración del vídeo sintético')
+    parser.add_argument('--size', default='1920x1080', help='Resolución del vídeo sintético')
+    parser.add_argument('--outputs', default='mp4:720,mp4:480,mp3:192', help='Salidas (formato:altura o formato:kbps)')
+    args = parser.parse_args()
+
+    ffmpeg_dir = find_ffmpeg()
+    if not ffmpeg_dir:
+        print("ffmpeg no encontrado")
+        return
+    os.environ["PATH"] += os.pathsep + ffmpeg_dir
+
+    folder = Path(tempfile.mkdtemp(prefix='bench_renditions_'))
+    try:
+        source = folder / 'source.mp4'
+        print(f"Generando origen de {args.seconds}s a {args.size}...")
+        subprocess.run([
+            'ffmpeg', '-v', 'error', '-y',
+            '-f', 'lavfi', '-i', f'testsrc2=size={args.size}:rate=30:duration={args.seconds}',
+            '-f', 'lavfi', '-i', f'sine=frequency=440:duration={args.seconds}',
+            '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-c:a', 'aac', str(source),
+        ], check=True)
+
+        renditions = plan_renditions(ffmpeg.probe(str(source)), parse_profiles(args.outputs))
+        separate_paths = [folder / f"separate_{r['label']}.{r['ext']}" for r in renditions]
+        shared_paths = [folder / f"shared_{r['label']}.{r['ext']}" for r in renditions]
+
+        separate_times = [run(source, [r], [path]) for r, path in zip(renditions, separate_paths)]
+        shared_seconds = run(source, renditions, shared_paths)
+
+        print(f"{'salida':<10} {'separada (s)':>12} {'duración (s)':>13}")
+        for rendition, seconds, separate, shared in zip(renditions, separate_times, separate_paths, shared_paths):
+            duration = float(ffmpeg.probe(str(shared))['format']['duration'])
+            same = abs(duration - float(ffmpeg.probe(str(separate))['format']['duration'])) < 0.05
+            print(f"{rendition['label']:<10} {seconds:>12.2f} {duration:>13.2f}{'' if same else ' (distinta)'}")
+        separate_seconds = sum(separate_times)
+        print(f"{'separadas':<10} {separate_seconds:>12.2f}")
+        print(f"{'compartida':<10} {shared_seconds:>12.2f}   x{separate_seconds / shared_seconds:.2f}")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark de descarga con una conexión vs. por rangos con varias.
+
+Levanta un servidor HTTP local con soporte de Range que limita la velocidad
+de cada conexión (como hacen muchos orígenes por stream) y descarga el
+mismo archivo con ParallelYoutubeDL, primero con una sola conexión y luego
+por rangos. Comprueba además que el archivo descargado es idéntico.
+
+Uso:
+    python scripts/bench_segmented_download.py [--size-mb 64] [--rate-mb 8]
+"""
+import argparse
+import hashlib
+import http.server
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add project root to sys path (one level up from scripts)
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.services.parallel_ydl import ParallelYoutubeDL
+
+
+def make_handler(data, rate):
+    class RangeHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            start, end = 0, len(data) - 1
+            range_header = self.headers.get('Range')
+            if range_header:
+                first, _, last = range_header.split('=', 1)[1].partition('-')
+                start = int(first)
+                end = min(end, int(last)) if last else end
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{end}/{len(data)}')
+            else:
+                self.send_response(200)
+            self.send_header('Content-Type', 'video/mp4')
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('Content-Length', str(end - start + 1))
+            self.end_headers()
+            chunk = 64 * 1024
+            began = time.perf_counter()
+            sent = 0
+            for offset in range(start, end + 1, chunk):
+                # Limitar cada conexión a ``rate`` bytes/s
+                wait = sent / rate - (time.perf_counter() - began)
+                if wait > 0:
+                    time.sleep(wait)
+                piece = data[offset:min(offset + chunk, end + 1)]
+                try:
+                    self.wfile.write(piece)
+                except OSError:
+                    return
+                sent += len(piece)
+    return RangeHandler
+
+
+def run_case(segmented, url, folder):
+    for f in Path(folder).iterdir():
+        f.unlink()
+    info = {
+        'id': 'bench',
+        'title': 'bench',
+        'extractor': 'generic',
+        'extractor_key': 'Generic',
+        'webpage_url': url,
+        'formats': [{'format_id': 'mp4', 'url': url, 'ext': 'mp4'}],
+    }
+    params = {
+        'outtmpl': str(Path(folder) / '%(id)s.%(ext)s'),
+        'quiet': True,
+        'noprogress': True,
+        'no_warnings': True,
+    }
+    start = time.perf_counter()
+    with ParallelYoutubeDL(params, segmented=segmented) as ydl:
+        ydl.process_ie_result(info, download=True)
+    elapsed = time.perf_counter() - start
+    digest = hashlib.sha256((Path(folder) / 'bench.mp4').read_bytes()).hexdigest()
+    return elapsed, digest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=64, help='Tamaño del archivo')
+    parser.add_argument('--rate-mb', type=float, default=8, help='Velocidad máxima por conexión (MB/s)')
+    args = parser.parse_args()
+
+    data = os.urandom(int(args.size_mb * 1024 * 1024))
+    expected = hashlib.sha256(data).hexdigest()
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), make_handler(data, args.rate_mb * 1024 * 1024))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/video.mp4'
+
+    folder = tempfile.mkdtemp(prefix='bench_segmented_')
+    try:
+        print(f"{'modo':<12} {'segundos':>9} {'MB/s':>8} {'íntegro':>8}")
+        for name, segmented in (('1 conexión', False), ('por rangos', True)):
+            elapsed, digest = run_case(segmented, url, folder)
+            print(f"{name:<12} {elapsed:>9.2f} {args.size_mb / elapsed:>8.1f} {str(digest == expected):>8}")
+    finally:
+        server.shutdown()
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
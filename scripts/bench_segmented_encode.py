@@ -0,0 +1,108 @@
+"""
+Benchmark de codificación H.264 en una pasada vs. por segmentos en paralelo.
+
+Genera con ffmpeg (lavfi) un vídeo sintético largo en VP9 (hay que
+recodificarlo) y lo convierte a H.264 primero con un solo ffmpeg que usa
+todos los núcleos y después con SegmentedEncoder para 1, 2, 4... workers
+(hasta ``--max-workers``), cada segmento con un hilo de libx264. Comprueba
+que la salida tiene los mismos frames que la entrada y muestra el tiempo,
+los fps y la aceleración de cada caso.
+
+Requiere ffmpeg y ffprobe en el PATH (o en las rutas de FFMPEG_LOCATIONS).
+
+Uso:
+    python scripts/bench_segmented_encode.py [--seconds 180] [--size 1280x720] [--max-workers 8]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to sys path (one level up from scripts)
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import ffmpeg
+
+from src.utils import find_ffmpeg
+from src.services.conversion_plan import plan_h264, h264_output
+from src.services.ffmpeg_progress import run_with_progress
+from src.services.segmented_encode import (
+    SegmentedEncoder, video_packets, split_at_keyframes, count_frames
+)
+
+
+def frame_count(path: Path) -> int:
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-count_packets',
+         '-show_entries', 'stream=nb_read_packets', '-of', 'csv=p=0', str(path)],
+        capture_output=True, text=True,
+    )
+    return int(result.stdout.strip() or 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=int, default=180, help='Duración del vídeo sintético')
+    parser.add_argument('--size', default='1280x720', help='Resolución del vídeo sintético')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1, help='Máximo de workers a probar')
+    args = parser.parse_args()
+
+    ffmpeg_dir = find_ffmpeg()
+    if not ffmpeg_dir:
+        print("ffmpeg no encontrado")
+        return
+    os.environ["PATH"] += os.pathsep + ffmpeg_dir
+
+    folder = Path(tempfile.mkdtemp(prefix='bench_segmented_encode_'))
+    try:
+        source = folder / 'source.webm'
+        print(f"Generando {args.seconds}s a {args.size} (keyframe cada 2s)...")
+        subprocess.run([
+            'ffmpeg', '-v', 'error', '-y',
+            '-f', 'lavfi', '-i', f'testsrc2=size={args.size}:rate=30:duration={args.seconds}',
+            '-f', 'lavfi', '-i', f'sine=frequency=440:duration={args.seconds}',
+            '-c:v', 'libvpx-vp9', '-deadline', 'realtime', '-cpu-used', '8', '-g', '60',
+            '-c:a', 'libopus', str(source),
+        ], check=True)
+
+        probe = ffmpeg.probe(str(source))
+        plan = plan_h264(probe)
+        duration = float(probe['format']['duration'])
+        start_offset = float(probe['format'].get('start_time') or 0)
+        times, keyframes = video_packets(str(source), plan['video_map'], start_offset)
+        frames = len(times)
+
+        print(f"{'modo':<24} {'segundos':>9} {'fps':>7} {'x':>6} {'frames ok':>10}")
+        output = folder / 'single.mp4'
+        start = time.perf_counter()
+        run_with_progress(ffmpeg.compile(h264_output(str(source), str(output), plan), overwrite_output=True), lambda progress: None)
+        baseline = time.perf_counter() - start
+        print(f"{'una pasada (todos)':<24} {baseline:>9.2f} {frames / baseline:>7.1f} {1.0:>6.1f} {str(frame_count(output) == frames):>10}")
+
+        workers = 1
+        while workers <= args.max_workers:
+            segments = [
+                (seg_start, count_frames(times, seg_start, seg_end))
+                for seg_start, seg_end in split_at_keyframes(keyframes, duration, workers * 2)
+            ]
+            output = folder / f'segmented_{workers}.mp4'
+            start = time.perf_counter()
+            SegmentedEncoder(workers=workers).encode(
+                str(source), str(output), plan, segments, folder / f'work_{workers}',
+                lambda progress: None, duration, threads=1,
+            )
+            elapsed = time.perf_counter() - start
+            label = f'{workers} workers, {len(segments)} tramos'
+            print(f"{label:<24} {elapsed:>9.2f} {frames / elapsed:>7.1f} {baseline / elapsed:>6.1f} {str(frame_count(output) == frames):>10}")
+            workers *= 2
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 """Rutas de la API"""
-from fastapi import APIRouter, HTTPException, BackgroundTasks, UploadFile, File
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Request
 from fastapi.responses import FileResponse, StreamingResponse
 from starlette.background import BackgroundTask
 import uuid
@@ -8,20 +8,38 @@ import asyncio
 import json
 import shutil
 from pathlib import Path
-from typing import List
+from typing import Callable, List, Optional
 import os
+import time
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-from src.models import DownloadRequest, VideoInfo
+from src.models import DownloadRequest, VideoInfo, OutputProfile
+from src.models.schemas import check_output_count
 from src.services import DownloaderService
-from src.services.downloader import download_progress, downloads_to_cancel, conversion_progress
-from src.config import DOWNLOADS_DIR
+from src.services.downloader import download_jobs, conversion_jobs, job_journal, fragment_budget, host_limiter, bandwidth_scheduler, job_index, storage_manager
+from src.services.job_store import JobStore, TERMINAL_STATUSES
+from src.services.scheduler import DownloadScheduler, QueueFullError
+from src.services.conversion_pool import ConversionPool, ConversionQueueFullError
+from src.services.renditions import rendition_id
+from src.services.executor import BlockingExecutor
+from src.services.singleflight import SingleFlight, DownloadCoalescer
+from src.utils import get_host_key, normalize_url
+from src.config import (
+    DOWNLOADS_DIR, SCAN_WORKERS, SCAN_TIMEOUT,
+    SYNC_DOWNLOAD_WORKERS, SYNC_DOWNLOAD_TIMEOUT,
+    PROGRESS_STREAM_INTERVAL, PROGRESS_STREAM_KEEPALIVE, RESULT_CACHE_FOLDER,
+    JOB_TTL
+)
 
 router = APIRouter(prefix="/api", tags=["download"])
 downloader = DownloaderService()
 
+# Pools acotados para no bloquear el event loop con yt-dlp
+scan_executor = BlockingExecutor(SCAN_WORKERS, "scan")
+sync_download_executor = BlockingExecutor(SYNC_DOWNLOAD_WORKERS, "sync-download")
+
 class DownloadFile(BaseModel):
     filename: str
     size: str
@@ -40,11 +58,28 @@ async def scan_video(url: str):
     Returns:
         VideoInfo: Información del video
     """
+    scan_id = str(uuid.uuid4())[:8]
     try:
-        return downloader.get_video_info(url)
+        return await scan_executor.run(
+            downloader.get_video_info,
+            url,
+            scan_id=scan_id,
+            timeout=SCAN_TIMEOUT,
+            # Si nadie más espera la extracción, se aborta y libera su hilo
+            on_timeout=lambda: downloader.abandon_scan(url, scan_id)
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Tiempo de espera agotado al escanear el video")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/scan/cache")
+async def get_scan_cache_stats():
+    """
+    Obtiene las estadísticas de la caché de metadatos.
+    """
+    return downloader.metadata_cache.stats()
+
 # @router.get("/downloads", response_model=List[DownloadFile])
 # async def list_downloads():
 #     files = []
@@ -83,12 +118,153 @@ async def scan_video(url: str):
 class DownloadStartResponse(BaseModel):
     download_id: str
     message: str
+    outputs: List[str] = []  # IDs de las salidas pedidas, cada una con su progreso y archivo
+
+# Descargas idénticas en curso comparten un único trabajo
+coalescer = DownloadCoalescer()
+# Lo mismo para /api/download: las peticiones idénticas esperan al trabajo líder
+sync_coalescer = DownloadCoalescer()
+download_flight = SingleFlight()
+
+# Un trabajo con descargas adjuntas que aún no recogieron el archivo no se expulsa
+download_jobs.is_pinned = lambda job_id: coalescer.refcount(job_id) > 0 or sync_coalescer.refcount(job_id) > 0
+
+def discard_job_files(job_id: str):
+    """Borra la carpeta entera de un trabajo expulsado (salidas y parciales)"""
+    job_index.discard(job_id)
+    storage_manager.forget(job_id)
+
+def discard_download_job(job_id: str):
+    """Trabajo de descarga expulsado: sus alias y referencias pendientes caducan con él"""
+    coalescer.forget(job_id)
+    sync_coalescer.forget(job_id)
+    discard_job_files(job_id)
+
+def forget_evicted_job(job_id: str):
+    """La cuota de disco borró la carpeta del trabajo: olvidar su resultado"""
+    download_jobs.remove(job_id)
+    conversion_jobs.remove(job_id)
+    coalescer.forget(job_id)
+    sync_coalescer.forget(job_id)
+
+download_jobs.on_evict = discard_download_job
+conversion_jobs.on_evict = discard_job_files
+storage_manager.on_evict = forget_evicted_job
+
+def job_id_of(file_path: Path) -> Optional[str]:
+    """ID del trabajo dueño de un archivo (None si no está en una carpeta de trabajo)"""
+    parent = Path(file_path).parent
+    return parent.name if parent.parent == job_index.folder else None
+
+def serve_pinned(job_id: Optional[str], release: Optional[Callable] = None) -> BackgroundTask:
+    """
+    Fija el trabajo mientras se envía su archivo y lo suelta al terminar.
+    
+    Args:
+        job_id: Trabajo dueño del archivo (None si no tiene carpeta propia)
+        release: Limpieza adicional tras el envío
+    """
+    if job_id:
+        storage_manager.pin(job_id)
+    
+    def done():
+        if job_id:
+            storage_manager.unpin(job_id)
+        if release:
+            release()
+    return BackgroundTask(done)
 
-# Almacén temporal de descargas completadas
-download_results: dict = {}
+def serve_file(file_path: Path, filename: str, release: Optional[Callable] = None) -> FileResponse:
+    """
+    Envía el archivo de un trabajo o de la caché de resultados sin que
+    ninguna expulsión lo borre a medio enviar.
+    """
+    cache_pinned = downloader.result_cache.pin(file_path)
+    
+    def done():
+        if cache_pinned:
+            downloader.result_cache.unpin(file_path)
+        if release:
+            release()
+    return FileResponse(
+        path=file_path,
+        filename=filename,
+        media_type='application/octet-stream',
+        background=serve_pinned(job_id_of(file_path), done)
+    )
+
+def job_files(file_path: Path) -> list:
+    """Archivos que pertenecen al trabajo (los de la caché de resultados no)"""
+    if Path(file_path).parent == RESULT_CACHE_FOLDER:
+        return []
+    return [file_path]
+
+def coalesce_key(request: DownloadRequest) -> tuple:
+    """Clave que identifica descargas que producen el mismo archivo"""
+    return (
+        normalize_url(request.url), request.format, request.quality,
+        request.audio_quality, request.start_time, request.end_time,
+        tuple((output.format, output.quality, output.audio_quality) for output in request.outputs or ())
+    )
+
+def output_ids(job_id: str, outputs: Optional[list]) -> List[str]:
+    """IDs de los trabajos de las salidas pedidas"""
+    return [rendition_id(job_id, i) for i in range(len(outputs or ()))]
+
+def create_output_jobs(store: JobStore, job_id: str, outputs: Optional[list]) -> List[str]:
+    """Crea en cola un trabajo por salida pedida para que tenga su propio progreso"""
+    ids = output_ids(job_id, outputs)
+    for output_id in ids:
+        store.create(output_id, status='queued', percent=0, message='Esperando al origen...')
+    return ids
+
+def run_download_outputs(download_id: str, file_path: str, filename: str, request: DownloadRequest,
+                         result: dict, threads: Optional[int] = None, nice: int = 0):
+    """
+    Genera, en un hueco del pool de conversiones, las salidas pedidas a
+    partir del archivo descargado y cierra la descarga en el diario.
+    """
+    ids = output_ids(download_id, request.outputs)
+    results = []
+    try:
+        rendered = downloader.convert_renditions(
+            file_path, download_id, [output.dict() for output in request.outputs], download_jobs,
+            threads=threads,
+            nice=nice,
+            name_stem=Path(filename).stem
+        )
+        for output_id, output_path, output_name in rendered:
+            output_path = job_index.publish(output_id, output_path)
+            result = {'file_path': str(output_path), 'filename': output_name}
+            download_jobs.set_result(output_id, result, files=[output_path])
+            results.append({'download_id': output_id, **result})
+    except Exception as e:
+        print(f"[RENDITIONS] Salidas de {download_id} fallidas: {e}")
+    finally:
+        for output_id in ids:
+            job_index.drop_scratch(output_id)
+            storage_manager.track(output_id)
+        job_journal.finish(download_id, 'completed', result={**result, 'outputs': results})
+
+def queue_download_outputs(download_id: str, file_path: Path, filename: str, request: DownloadRequest, result: dict):
+    """Encola las salidas de una descarga terminada en el pool de conversiones"""
+    try:
+        position = conversion_pool.submit(
+            download_id, run_download_outputs, str(file_path), filename, request, result,
+            priority=request.priority
+        )
+    except ConversionQueueFullError as e:
+        for output_id in output_ids(download_id, request.outputs):
+            download_jobs.update(output_id, status='error', error=str(e), percent=0)
+        job_journal.finish(download_id, 'completed', result=result)
+        return
+    if position:
+        for output_id in output_ids(download_id, request.outputs):
+            download_jobs.update(output_id, queue_position=position, message=f'En cola de conversión (posición {position})')
 
 def run_download_task(download_id: str, request: DownloadRequest):
     """Ejecuta la descarga en segundo plano"""
+    job_journal.set_phase(download_id, 'running')
     try:
         file_path, filename = downloader.download(
             url=request.url,
@@ -97,50 +273,283 @@ def run_download_task(download_id: str, request: DownloadRequest):
             start_time=request.start_time,
             end_time=request.end_time,
             quality=request.quality,
-            audio_quality=request.audio_quality
+            audio_quality=request.audio_quality,
+            scan_token=request.scan_token,
+            priority=request.priority
         )
-        download_results[download_id] = {
-            'file_path': str(file_path),
-            'filename': filename
-        }
+        result = {'file_path': str(file_path), 'filename': filename}
+        download_jobs.set_result(download_id, result, files=job_files(file_path))
+        if request.outputs:
+            # Las salidas ocupan un hueco de conversión, no este hilo de descarga
+            queue_download_outputs(download_id, file_path, filename, request, result)
+        else:
+            job_journal.finish(download_id, 'completed', result=result)
     except Exception as e:
-        download_progress[download_id] = {
-            'status': 'error',
-            'error': str(e),
-            'percent': 0
-        }
+        download_jobs.update(download_id, status='error', error=str(e), percent=0)
+        for output_id in output_ids(download_id, request.outputs):
+            download_jobs.update(output_id, status='error', error=str(e), percent=0)
+        job_journal.finish(download_id, 'error', error=str(e))
+        job_index.drop_scratch(download_id)
+    finally:
+        coalescer.finish(download_id)
+        storage_manager.track(download_id)
+
+# Planificador con hilos propios (no usa el threadpool compartido de Starlette)
+scheduler = DownloadScheduler(run_download_task)
 
 @router.post("/download/start", response_model=DownloadStartResponse)
-async def start_download(request: DownloadRequest, background_tasks: BackgroundTasks):
+async def start_download(request: DownloadRequest):
     """
-    Inicia una descarga en segundo plano.
+    Encola una descarga para ejecutarla en segundo plano.
     """
     download_id = str(uuid.uuid4())[:8]
-    background_tasks.add_task(run_download_task, download_id, request)
-    return DownloadStartResponse(download_id=download_id, message="Descarga iniciada")
+    
+    # Si ya hay una descarga idéntica en curso, adjuntarse a ella
+    leader_id = coalescer.attach(coalesce_key(request), download_id)
+    if leader_id is not None:
+        return DownloadStartResponse(
+            download_id=download_id,
+            message="Descarga en curso (compartida)",
+            outputs=output_ids(leader_id, request.outputs)
+        )
+    
+    download_jobs.create(download_id, status='queued', queue_position=0)
+    outputs = create_output_jobs(download_jobs, download_id, request.outputs)
+    job_journal.record(download_id, 'download', request.dict(), priority=request.priority)
+    try:
+        scheduler.submit(download_id, get_host_key(request.url), request, priority=request.priority)
+    except QueueFullError as e:
+        download_jobs.remove(download_id)
+        for output_id in outputs:
+            download_jobs.remove(output_id)
+        job_journal.remove(download_id)
+        coalescer.finish(download_id)
+        coalescer.release(download_id)
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={'Retry-After': str(e.retry_after)}
+        )
+    return DownloadStartResponse(download_id=download_id, message="Descarga en cola", outputs=outputs)
+
+def resume_journaled_downloads():
+    """
+    Recupera las descargas del diario tras un reinicio.
+    
+    Las terminadas con éxito vuelven a poder descargarse mientras su archivo
+    exista; las que quedaron en cola o a medias se vuelven a encolar con su
+    mismo ID y yt-dlp continúa desde sus archivos parciales.
+    """
+    job_journal.prune(time.time() - JOB_TTL)
+    
+    for job in job_journal.completed('download', since=time.time() - JOB_TTL):
+        result = job['result'] or {}
+        if result.get('file_path') and Path(result['file_path']).exists():
+            download_jobs.create(job['job_id'], status='completed', percent=100, filename=result.get('filename'))
+            download_jobs.set_result(job['job_id'], result, files=job_files(result['file_path']))
+        for output in result.get('outputs', ()):
+            if Path(output['file_path']).exists():
+                download_jobs.create(output['download_id'], status='completed', percent=100, filename=output['filename'])
+                download_jobs.set_result(output['download_id'], output, files=[output['file_path']])
+    
+    resumed = 0
+    for job in job_journal.unfinished('download'):
+        download_id = job['job_id']
+        request = DownloadRequest(**job['request'])
+        if coalescer.attach(coalesce_key(request), download_id) is not None:
+            # Otra descarga recuperada idéntica ya atiende a esta
+            job_journal.remove(download_id)
+            continue
+        download_jobs.create(
+            download_id,
+            status='queued',
+            queue_position=0,
+            downloaded_bytes=job['downloaded_bytes'],
+            total_bytes=job['total_bytes'],
+            message='Reanudando descarga...' if job['downloaded_bytes'] else None
+        )
+        create_output_jobs(download_jobs, download_id, request.outputs)
+        try:
+            scheduler.submit(download_id, get_host_key(request.url), request, priority=job['priority'])
+            resumed += 1
+        except QueueFullError as e:
+            download_jobs.update(download_id, status='error', error=str(e))
+            job_journal.finish(download_id, 'error', error=str(e))
+            coalescer.finish(download_id)
+    if resumed:
+        print(f"[JOURNAL] {resumed} descargas reanudadas tras el reinicio")
+
+def reap_storage():
+    """
+    Limpia la carpeta de descargas tras restaurar el diario: carpetas de
+    trabajos desconocidos, parciales y archivos sueltos huérfanos.
+    """
+    def is_finished(job_id: str) -> bool:
+        job = download_jobs.get(job_id)
+        return job is not None and job['status'] in TERMINAL_STATUSES
+    
+    storage_manager.startup(is_known=lambda job_id: job_id in download_jobs, is_finished=is_finished)
+
+@router.get("/storage/stats")
+async def get_storage_stats():
+    """
+    Obtiene el uso de disco de las descargas frente a su cuota y el ahorro
+    de la deduplicación por contenido.
+    """
+    return {**storage_manager.stats(), 'dedup': job_index.dedup_stats()}
+
+@router.get("/download/queue")
+async def get_download_queue():
+    """
+    Obtiene el estado de la cola de descargas.
+    """
+    return {**scheduler.stats(), 'coalescing': coalescer.stats(), 'fragments': fragment_budget.stats()}
+
+@router.get("/hosts/limits")
+async def get_host_limits():
+    """
+    Obtiene los límites de peticiones por plataforma y los últimos 403/429.
+    """
+    return host_limiter.stats()
+
+@router.get("/download/bandwidth")
+async def get_download_bandwidth():
+    """
+    Obtiene el ancho de banda asignado y conseguido por cada descarga activa.
+    """
+    return bandwidth_scheduler.stats()
+
+@router.get("/download/cache")
+async def get_download_cache_stats():
+    """
+    Obtiene el uso y los contadores de la caché de resultados.
+    """
+    return downloader.result_cache.stats()
+
+@router.get("/jobs/stats")
+async def get_jobs_stats():
+    """
+    Obtiene el número de trabajos por estado y la memoria que ocupan.
+    """
+    return {
+        'downloads': download_jobs.stats(),
+        'conversions': conversion_jobs.stats(),
+        'journal': job_journal.stats(),
+        'job_files': job_index.stats()
+    }
 
 @router.get("/download/progress/{download_id}")
 async def get_download_progress(download_id: str):
     """
     Obtiene el progreso de una descarga.
     """
-    progress = download_progress.get(download_id, {'status': 'unknown', 'percent': 0})
+    progress = download_jobs.get(coalescer.resolve(download_id)) or {'status': 'unknown', 'percent': 0}
     return progress
 
+@router.get("/progress/stream")
+async def stream_progress(request: Request, downloads: str = "", conversions: str = ""):
+    """
+    Emite el progreso de varias descargas y conversiones por Server-Sent Events.
+    
+    Solo se envía un evento cuando el estado de un trabajo cambia; los
+    cambios que ocurren entre dos comprobaciones se agrupan en uno solo. El
+    stream se cierra cuando todos los trabajos suscritos han terminado. Un
+    trabajo desconocido (o ya expulsado) recibe un único evento ``unknown``
+    y deja de seguirse; si no existe ninguno, se responde 404.
+    
+    Args:
+        downloads: IDs de descarga separados por comas
+        conversions: IDs de conversión separados por comas
+    """
+    subscriptions = {}
+    for kind, ids, store in (('download', downloads, download_jobs), ('convert', conversions, conversion_jobs)):
+        for job_id in filter(None, (i.strip() for i in ids.split(','))):
+            subscriptions[(kind, job_id)] = store
+    if not subscriptions:
+        raise HTTPException(status_code=400, detail="No hay trabajos a los que suscribirse")
+    
+    def lookup(kind: str, job_id: str) -> str:
+        return coalescer.resolve(job_id) if kind == 'download' else job_id
+    
+    if not any(store.get(lookup(kind, job_id)) for (kind, job_id), store in subscriptions.items()):
+        raise HTTPException(status_code=404, detail="Trabajos no encontrados")
+    
+    async def event_stream():
+        last_sent = {}
+        last_event = asyncio.get_running_loop().time()
+        pending = dict(subscriptions)
+        while pending:
+            if await request.is_disconnected():
+                return
+            for (kind, job_id), store in list(pending.items()):
+                lookup_id = lookup(kind, job_id)
+                # El contador de versión evita serializar trabajos sin cambios
+                version = (lookup_id, store.version(lookup_id))
+                if last_sent.get((kind, job_id)) == version:
+                    continue
+                last_sent[(kind, job_id)] = version
+                progress = store.get(lookup_id)
+                finished = progress is None or progress.get('status') in TERMINAL_STATUSES
+                # Un trabajo que no existe (o se expulsó) ya no va a cambiar
+                progress = progress or {'status': 'unknown', 'percent': 0}
+                payload = json.dumps({'type': kind, 'id': job_id, 'progress': progress}, default=str)
+                last_event = asyncio.get_running_loop().time()
+                yield f"data: {payload}\n\n"
+                if finished:
+                    del pending[(kind, job_id)]
+            if asyncio.get_running_loop().time() - last_event >= PROGRESS_STREAM_KEEPALIVE:
+                last_event = asyncio.get_running_loop().time()
+                yield ": keep-alive\n\n"
+            if pending:
+                await asyncio.sleep(PROGRESS_STREAM_INTERVAL)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @router.post("/download/cancel/{download_id}")
 async def cancel_download(download_id: str):
     """
     Cancela una descarga en progreso.
     """
-    progress = download_progress.get(download_id)
+    job_id = coalescer.resolve(download_id)
+    progress = download_jobs.get(job_id)
     if not progress:
         raise HTTPException(status_code=404, detail="Descarga no encontrada")
     
     if progress.get('status') in ['completed', 'error', 'cancelled']:
         return {"message": "La descarga ya ha terminado", "cancelled": False}
     
+    # Si otras descargas comparten el trabajo, solo se suelta esta referencia
+    if coalescer.refcount(job_id) > 1:
+        if job_id != download_id:
+            # La seguidora pasa a tener su propio estado (cancelada)
+            coalescer.detach(download_id)
+            download_jobs.create(
+                download_id,
+                status='cancelled',
+                error='Descarga cancelada por el usuario'
+            )
+        else:
+            coalescer.release(download_id)
+        return {"message": "Descarga cancelada", "cancelled": True}
+    coalescer.release(download_id)
+    
+    # Si aún no empezó, basta con sacarla de la cola
+    if scheduler.cancel(job_id):
+        coalescer.finish(job_id)
+        download_jobs.update(
+            job_id,
+            status='cancelled',
+            error='Descarga cancelada por el usuario'
+        )
+        job_journal.finish(job_id, 'cancelled')
+        return {"message": "Descarga cancelada", "cancelled": True}
+    
     # Marcar para cancelar
-    downloads_to_cancel.add(download_id)
+    download_jobs.request_cancel(job_id)
     return {"message": "Descarga cancelada", "cancelled": True}
 
 @router.get("/download/file/{download_id}")
@@ -148,7 +557,7 @@ async def get_download_file(download_id: str):
     """
     Obtiene el archivo descargado una vez completada la descarga.
     """
-    result = download_results.get(download_id)
+    result = download_jobs.get_result(coalescer.resolve(download_id))
     if not result:
         raise HTTPException(status_code=404, detail="Descarga no encontrada")
     
@@ -156,11 +565,41 @@ async def get_download_file(download_id: str):
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
     
-    return FileResponse(
-        path=file_path,
-        filename=result['filename'],
-        media_type='application/octet-stream'
-    )
+    # Esta descarga ya recibió el archivo: suelta su referencia al trabajo
+    return serve_file(file_path, result['filename'], lambda: coalescer.release(download_id))
+
+def run_sync_download(unique_id: str, request: DownloadRequest):
+    """Descarga para /api/download, registrando el archivo en el trabajo"""
+    try:
+        file_path, filename = downloader.download(
+            url=request.url,
+            format_type=request.format,
+            unique_id=unique_id,
+            start_time=request.start_time,
+            end_time=request.end_time,
+            quality=request.quality,
+            scan_token=request.scan_token,
+            priority=request.priority
+        )
+        download_jobs.set_result(
+            unique_id,
+            {'file_path': str(file_path), 'filename': filename},
+            files=job_files(file_path)
+        )
+        return file_path, filename
+    except Exception:
+        job_index.drop_scratch(unique_id)
+        raise
+    finally:
+        sync_coalescer.finish(unique_id)
+        storage_manager.track(unique_id)
+
+def abandon_sync_download(unique_id: str):
+    """La petición dejó de esperar: la descarga se aborta solo si nadie más la espera"""
+    job_id = sync_coalescer.resolve(unique_id)
+    if sync_coalescer.release(unique_id):
+        # El hook de progreso aborta la descarga en curso
+        download_jobs.request_cancel(job_id)
 
 @router.post("/download")
 async def download_video(request: DownloadRequest):
@@ -176,24 +615,32 @@ async def download_video(request: DownloadRequest):
     Raises:
         HTTPException: Si ocurre un error durante la descarga
     """
+    if request.outputs:
+        # Una respuesta solo puede llevar un archivo
+        raise HTTPException(status_code=400, detail="Para varias salidas usa /api/download/start")
+    
+    unique_id = str(uuid.uuid4())[:8]
+    key = coalesce_key(request)
+    # Peticiones idénticas simultáneas comparten una sola descarga (la del líder)
+    job_id = sync_coalescer.attach(key, unique_id) or unique_id
     try:
-        unique_id = str(uuid.uuid4())[:8]
-        file_path, filename = downloader.download(
-            url=request.url,
-            format_type=request.format,
-            unique_id=unique_id,
-            start_time=request.start_time,
-            end_time=request.end_time,
-            quality=request.quality
+        file_path, filename = await sync_download_executor.run(
+            download_flight.do,
+            key,
+            run_sync_download,
+            job_id,
+            request,
+            timeout=SYNC_DOWNLOAD_TIMEOUT,
+            on_timeout=lambda: abandon_sync_download(unique_id)
         )
         
-        return FileResponse(
-            path=file_path,
-            filename=filename,
-            media_type='application/octet-stream'
-        )
+        # La referencia al trabajo se suelta cuando el archivo ya se envió
+        return serve_file(file_path, filename, lambda: sync_coalescer.release(unique_id))
     
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Tiempo de espera agotado en la descarga")
     except Exception as e:
+        sync_coalescer.release(unique_id)
         raise HTTPException(status_code=500, detail=str(e))
 
 # class OpenFolderRequest(BaseModel):
@@ -219,40 +666,132 @@ async def download_video(request: DownloadRequest):
 # H.264 CONVERSION ENDPOINTS
 # =====================================================
 
-# Almacén temporal de conversiones completadas
-conversion_results: dict = {}
-
 class ConvertRequest(BaseModel):
     filename: str
+    priority: int = 0  # Mayor = antes en la cola y ffmpeg menos "nice"
+    outputs: Optional[List[OutputProfile]] = None  # Varias salidas de una sola decodificación
+    
+    @validator('outputs')
+    def validate_outputs(cls, v):
+        return check_output_count(v)
 
 class ConvertStartResponse(BaseModel):
     convert_id: str
     message: str
+    outputs: List[str] = []  # IDs de las salidas pedidas, cada una con su progreso y archivo
+
+def parse_outputs(raw: Optional[str]) -> Optional[List[OutputProfile]]:
+    """Perfiles de salida enviados como JSON en un campo de formulario"""
+    if not raw:
+        return None
+    try:
+        return check_output_count([OutputProfile(**item) for item in json.loads(raw)])
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Salidas no válidas: {e}")
+
+def run_convert_outputs(convert_id: str, file_path: str, outputs: List[dict],
+                        threads: Optional[int] = None, nice: int = 0):
+    """Genera, en un hueco del pool, varias salidas de un archivo en una sola pasada de ffmpeg"""
+    ids = output_ids(convert_id, outputs)
+    conversion_jobs.create(convert_id, status='starting', percent=0, message='Iniciando conversión...')
+    try:
+        rendered = downloader.convert_renditions(
+            file_path, convert_id, outputs, conversion_jobs,
+            threads=threads, nice=nice, track_parent=True
+        )
+        for output_id, output_path, output_name in rendered:
+            output_path = job_index.publish(output_id, output_path)
+            conversion_jobs.set_result(
+                output_id,
+                {'output_path': str(output_path), 'output_name': output_name},
+                files=[output_path]
+            )
+        conversion_jobs.update(convert_id, status='completed', percent=100, message=f'Salidas completadas ({len(rendered)})')
+        # Solo las salidas son del trabajo: el origen de /api/convert es del usuario
+        conversion_jobs.set_result(convert_id, {'input_path': str(file_path), 'outputs': ids})
+    except Exception as e:
+        conversion_jobs.update(convert_id, status='error', percent=0, error=str(e))
+        conversion_jobs.set_result(convert_id, {'input_path': str(file_path)})
+    finally:
+        for job_id in [convert_id, *ids]:
+            job_index.drop_scratch(job_id)
+            storage_manager.track(job_id)
 
-def run_convert_task(convert_id: str, file_path: str):
-    """Ejecuta la conversión en segundo plano"""
+def run_convert_task(convert_id: str, file_path: str, threads: Optional[int] = None, nice: int = 0):
+    """Ejecuta la conversión en un hueco del pool de conversiones"""
     try:
         output_path, output_name = downloader.convert_to_h264(
             file_path=file_path,
-            convert_id=convert_id
+            convert_id=convert_id,
+            threads=threads,
+            nice=nice
+        )
+        output_path = job_index.publish(convert_id, output_path)
+        conversion_jobs.set_result(
+            convert_id,
+            {
+                'input_path': str(file_path),
+                'output_path': str(output_path),
+                'output_name': output_name
+            },
+            # Solo la salida es del trabajo: el origen de /api/convert es del
+            # usuario y una subida vive en la carpeta del trabajo
+            files=[output_path]
         )
-        conversion_results[convert_id] = {
-            'input_path': str(file_path),
-            'output_path': str(output_path),
-            'output_name': output_name
-        }
     except Exception as e:
-        conversion_progress[convert_id] = {
-            'status': 'error',
-            'percent': 0,
-            'error': str(e)
-        }
+        conversion_jobs.update(convert_id, status='error', percent=0, error=str(e))
+        conversion_jobs.set_result(convert_id, {'input_path': str(file_path)})
+    finally:
+        # La subida y los restos de ffmpeg solo vivían en el scratch
+        job_index.drop_scratch(convert_id)
+        storage_manager.track(convert_id)
+
+def run_conversion_slot(job_id: str, task: Callable, *args, threads: Optional[int] = None, nice: int = 0):
+    """Ejecuta en un hueco del pool una conversión o las salidas de una descarga"""
+    task(job_id, *args, threads=threads, nice=nice)
+
+conversion_pool = ConversionPool(run_conversion_slot)
+
+def submit_conversion(convert_id: str, file_path: Path, priority: int,
+                      outputs: Optional[List[OutputProfile]] = None) -> ConvertStartResponse:
+    """Encola una conversión o responde 429 si la cola está llena"""
+    conversion_jobs.create(convert_id, status='queued', percent=0, queue_position=0)
+    ids = create_output_jobs(conversion_jobs, convert_id, outputs)
+    # Cada tarea recibe del pool su presupuesto de hilos y su nice
+    if outputs:
+        task = (run_convert_outputs, str(file_path), [output.dict() for output in outputs])
+    else:
+        task = (run_convert_task, str(file_path))
+    try:
+        position = conversion_pool.submit(convert_id, *task, priority=priority)
+    except ConversionQueueFullError as e:
+        for job_id in [convert_id, *ids]:
+            conversion_jobs.remove(job_id)
+        job_index.discard(convert_id)
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={'Retry-After': str(e.retry_after)}
+        )
+    message = f"Conversión en cola (posición {position})" if position else "Conversión iniciada"
+    return ConvertStartResponse(convert_id=convert_id, message=message, outputs=ids)
+
+@router.get("/convert/queue")
+async def get_conversion_queue_stats():
+    """
+    Estado del pool de conversiones: núcleos, huecos, hilos por conversión y cola.
+    """
+    return conversion_pool.stats()
 
 @router.post("/upload-convert", response_model=ConvertStartResponse)
-async def upload_and_convert(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def upload_and_convert(file: UploadFile = File(...), priority: int = Form(0), outputs: Optional[str] = Form(None)):
     """
     Sube un archivo e inicia la conversión a H.264 en segundo plano.
+    
+    ``outputs`` (JSON con una lista de perfiles) pide varias salidas de una
+    sola decodificación en vez de la conversión a H.264.
     """
+    profiles = parse_outputs(outputs)
     valid_extensions = {'.mp4', '.webm', '.mkv', '.avi', '.mov'}
     ext = Path(file.filename).suffix.lower()
     
@@ -261,11 +800,11 @@ async def upload_and_convert(background_tasks: BackgroundTasks, file: UploadFile
         
     convert_id = str(uuid.uuid4())[:8]
     
-    # Save the uploaded file to DOWNLOADS_DIR
+    # Save the uploaded file to the conversion's own directory
     import re
     safe_name = re.sub(r'[^\w\s-]', '', Path(file.filename).stem).strip()
     save_filename = f"upload_{convert_id}_{safe_name}{ext}"
-    file_path = Path(DOWNLOADS_DIR) / save_filename
+    file_path = job_index.create(convert_id) / save_filename
     
     try:
         with open(file_path, "wb") as buffer:
@@ -273,18 +812,10 @@ async def upload_and_convert(background_tasks: BackgroundTasks, file: UploadFile
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error guardando archivo: {str(e)}")
     
-    # Inicializar progreso
-    conversion_progress[convert_id] = {
-        'status': 'starting',
-        'percent': 0,
-        'message': 'Iniciando conversión...'
-    }
-    
-    background_tasks.add_task(run_convert_task, convert_id, str(file_path))
-    return ConvertStartResponse(convert_id=convert_id, message="Conversión iniciada")
+    return submit_conversion(convert_id, file_path, priority, profiles)
 
 @router.post("/convert", response_model=ConvertStartResponse)
-async def start_conversion(request: ConvertRequest, background_tasks: BackgroundTasks):
+async def start_conversion(request: ConvertRequest):
     """
     Inicia una conversión a H.264 para un archivo local existente. (Mantener para test/compatibilidad remota)
     """
@@ -297,56 +828,47 @@ async def start_conversion(request: ConvertRequest, background_tasks: Background
         raise HTTPException(status_code=400, detail="Formato de archivo no soportado")
     
     convert_id = str(uuid.uuid4())[:8]
-    conversion_progress[convert_id] = {
-        'status': 'starting',
-        'percent': 0,
-        'message': 'Iniciando conversión...'
-    }
-    background_tasks.add_task(run_convert_task, convert_id, str(file_path))
-    return ConvertStartResponse(convert_id=convert_id, message="Conversión iniciada")
+    return submit_conversion(convert_id, file_path, request.priority, request.outputs)
 
 @router.get("/convert/progress/{convert_id}")
 async def get_conversion_progress(convert_id: str):
     """
     Obtiene el progreso de una conversión.
     """
-    progress = conversion_progress.get(convert_id, {'status': 'unknown', 'percent': 0})
+    progress = conversion_jobs.get(convert_id) or {'status': 'unknown', 'percent': 0}
     return progress
 
 @router.get("/convert/download/{convert_id}")
 async def download_conversion_file(convert_id: str):
     """
     Obtiene el archivo convertido pidiendo al navegador que lo descargue 
-    formalmente y luego se auto-destruyen ambos archivos (entrada y salida).
+    formalmente y luego se auto-destruyen la salida y, si era una subida,
+    la entrada (un archivo de /api/convert se conserva).
     """
-    result = conversion_results.get(convert_id)
-    if not result:
+    result = conversion_jobs.get_result(convert_id)
+    if not result or 'output_path' not in result:
         raise HTTPException(status_code=404, detail="Conversión no encontrada")
     
     output_path = Path(result['output_path'])
-    input_path = Path(result.get('input_path', ''))
     
     if not output_path.exists():
         raise HTTPException(status_code=404, detail="Archivo convertido no encontrado")
         
     def cleanup_files():
-        try:
-            if input_path.exists():
-                input_path.unlink()
-        except: pass
         try:
             if output_path.exists():
                 output_path.unlink()
         except: pass
+        # La carpeta del trabajo incluye la subida; un origen de /api/convert no se toca
+        job_index.discard(convert_id)
         # Remover progreso para limpiar ram
-        conversion_progress.pop(convert_id, None)
-        conversion_results.pop(convert_id, None)
+        conversion_jobs.remove(convert_id)
 
     return FileResponse(
         path=output_path,
         filename=result['output_name'],
-        media_type='video/mp4',
-        background=BackgroundTask(cleanup_files)
+        media_type='audio/mpeg' if output_path.suffix == '.mp3' else 'video/mp4',
+        background=serve_pinned(job_id_of(output_path), cleanup_files)
     )
 
 @router.get("/convert/file/{convert_id}")
@@ -354,8 +876,8 @@ async def get_conversion_file(convert_id: str):
     """
     Mantiene la ruta local / file direct.
     """
-    result = conversion_results.get(convert_id)
-    if not result:
+    result = conversion_jobs.get_result(convert_id)
+    if not result or 'output_path' not in result:
         raise HTTPException(status_code=404, detail="Conversión no encontrada")
     
     file_path = Path(result['output_path'])
@@ -365,5 +887,6 @@ async def get_conversion_file(convert_id: str):
     return FileResponse(
         path=file_path,
         filename=result['output_name'],
-        media_type='video/mp4'
+        media_type='audio/mpeg' if file_path.suffix == '.mp3' else 'video/mp4',
+        background=serve_pinned(job_id_of(file_path))
     )
@@ -4,6 +4,7 @@ Aplicación principal FastAPI
 Autor: Pool Anthony Deza Millones
 GitHub: @iPool23
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.responses import HTMLResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
@@ -12,6 +13,7 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from src.api import router as api_router
+from src.api.routes import resume_journaled_downloads, reap_storage, downloader
 
 from src.config import DOWNLOADS_DIR
 
@@ -19,11 +21,24 @@ from src.config import DOWNLOADS_DIR
 BASE_DIR = Path(__file__).parent.parent
 PUBLIC_DIR = BASE_DIR / "public"
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Reanuda las descargas pendientes y limpia los huérfanos del reinicio
+    anterior; al parar, guarda los accesos pendientes de la caché.
+    """
+    resume_journaled_downloads()
+    reap_storage()
+    yield
+    downloader.result_cache.flush()
+
+
 # Crear aplicación
 app = FastAPI(
     title="Downloader API",
     description="API para descargar videos y audio de YouTube",
-    version="2.1.0"
+    version="2.1.0",
+    lifespan=lifespan
 )
 
 # Montar archivos estáticos
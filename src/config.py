@@ -7,6 +7,15 @@ BASE_DIR = Path(__file__).parent.parent
 DOWNLOAD_FOLDER = BASE_DIR / "downloads"
 DOWNLOAD_FOLDER.mkdir(exist_ok=True)
 DOWNLOADS_DIR = str(DOWNLOAD_FOLDER)
+# Datos internos (no se sirven en /content)
+DATA_FOLDER = BASE_DIR / "data"
+# Carpeta propia de cada trabajo (descargas, subidas y conversiones)
+JOB_FOLDER = DOWNLOAD_FOLDER / "jobs"
+# Diario del índice de archivos (una línea JSON por cambio, compactado al arrancar)
+JOB_FILES_INDEX_PATH = DATA_FOLDER / "job_files.jsonl"
+# Volumen rápido de trabajo (p. ej. tmpfs o NVMe local) para parciales,
+# fragmentos y mezclas; solo el archivo terminado se publica en JOB_FOLDER
+SCRATCH_FOLDER = BASE_DIR / "scratch"
 
 # Servidor
 HOST = "127.0.0.1"
@@ -28,3 +37,125 @@ SUPPORTED_FORMATS = ['mp3', 'mp4']
 
 # Calidad máxima de video (altura en píxeles)
 MAX_VIDEO_HEIGHT = 2160  # 4K
+
+# Planificador de descargas
+MAX_CONCURRENT_DOWNLOADS = 4  # Descargas simultáneas en total
+MAX_QUEUED_DOWNLOADS = 50  # Descargas en cola antes de responder 429
+
+# Descargas simultáneas por plataforma (clave de get_host_key)
+HOST_CONCURRENCY_LIMITS = {
+    'youtube': 2,
+    'tiktok': 2,
+    'kick': 1,
+    'twitch': 1,
+}
+DEFAULT_HOST_CONCURRENCY = 2
+
+# Caché de metadatos de /api/scan
+METADATA_CACHE_SIZE = 256  # Número máximo de URLs en caché
+METADATA_CACHE_TTL = 1800  # Segundos que vive una entrada
+METADATA_CACHE_NEGATIVE_TTL = 60  # Segundos que se recuerda un fallo
+METADATA_CACHE_EXPIRY_MARGIN = 300  # Margen antes de que caduquen las URLs firmadas
+
+# Ejecutores para trabajo bloqueante fuera del event loop
+SCAN_WORKERS = 4  # Extracciones (/api/scan) simultáneas
+SCAN_TIMEOUT = 60  # Segundos máximos por escaneo
+SYNC_DOWNLOAD_WORKERS = 2  # Descargas síncronas (/api/download) simultáneas
+SYNC_DOWNLOAD_TIMEOUT = 1800  # Segundos máximos por descarga síncrona
+
+# Caché de resultados (archivos ya descargados); fuera de /content
+RESULT_CACHE_FOLDER = DATA_FOLDER / "result_cache"
+RESULT_CACHE_MAX_BYTES = 10 * 1024 ** 3  # 10 GB
+RESULT_CACHE_SAVE_INTERVAL = 30  # Segundos mínimos entre escrituras del índice por accesos
+RESULT_CACHE_LEASE = 3600  # Segundos que un acierto protege su archivo (como JOB_TTL)
+
+# Streaming de progreso (SSE)
+PROGRESS_STREAM_INTERVAL = 0.25  # Segundos entre comprobaciones de cambios
+PROGRESS_STREAM_KEEPALIVE = 15  # Segundos entre comentarios keep-alive
+
+# Cuota de disco de las carpetas de trabajo (expulsión LRU)
+STORAGE_MAX_BYTES = 20 * 1024 ** 3  # 20 GB
+STORAGE_HIGH_WATERMARK = 0.9  # Fracción a partir de la que se expulsa
+STORAGE_LOW_WATERMARK = 0.7  # Fracción hasta la que se expulsa
+STORAGE_PIN_TIMEOUT = 6 * 3600  # Segundos máximos que un archivo servido bloquea su expulsión
+
+# Almacén de trabajos
+JOB_TTL = 3600  # Segundos que se conserva un trabajo terminado (y sus archivos)
+JOB_PINNED_TTL = 24 * 3600  # Máximo para trabajos con referencias pendientes
+JOB_EVICTION_INTERVAL = 60  # Segundos entre pasadas de limpieza
+
+# Progreso de descargas
+PROGRESS_UPDATE_INTERVAL = 0.25  # Segundos mínimos entre actualizaciones publicadas
+PROGRESS_SPEED_EMA_ALPHA = 0.3  # Suavizado de la velocidad (0-1, mayor = más reactivo)
+
+# Diario persistente de trabajos
+JOB_JOURNAL_PATH = DATA_FOLDER / "jobs.db"
+JOB_JOURNAL_PROGRESS_INTERVAL = 2.0  # Segundos mínimos entre escrituras de progreso
+
+# Reintentos por trabajo (URLs firmadas caducadas, 403)
+RETRY_BUDGET_ATTEMPTS = 4  # Reintentos máximos por trabajo
+RETRY_BUDGET_SECONDS = 120  # Espera total máxima entre reintentos
+RETRY_BASE_DELAY = 1.0  # Espera mínima antes de un reintento
+RETRY_MAX_DELAY = 30.0  # Tope de la espera exponencial
+
+# Descarga simultánea de los streams de video y audio antes de mezclarlos
+PARALLEL_STREAM_DOWNLOADS = True
+
+# Descarga por rangos con varias conexiones (formatos HTTP de un solo archivo)
+SEGMENTED_DOWNLOADS = True
+SEGMENTED_MIN_SIZE = 16 * 1024 ** 2  # Por debajo, una sola conexión basta
+SEGMENTED_SEGMENT_SIZE = 4 * 1024 ** 2  # Bytes por petición de rango
+SEGMENTED_MIN_CONNECTIONS = 2  # Conexiones iniciales
+SEGMENTED_MAX_CONNECTIONS = 8  # Tope de conexiones por archivo
+SEGMENTED_RETRIES = 3  # Reintentos por segmento
+SEGMENTED_PROBE_INTERVAL = 0.5  # Segundos entre mediciones de rendimiento
+
+# Fragmentos simultáneos (HLS/DASH) por plataforma (clave de get_host_key)
+FRAGMENT_CONCURRENCY = {
+    'youtube': 4,
+    'twitch': 4,
+    'kick': 4,
+}
+DEFAULT_FRAGMENT_CONCURRENCY = 2  # Punto de partida para el resto
+FRAGMENT_CONCURRENCY_MAX = 16  # Tope por trabajo (hilos que crea yt-dlp)
+FRAGMENT_WORKERS_TOTAL = 32  # Fragmentos simultáneos entre todos los trabajos
+FRAGMENT_ADAPT_WINDOW = 2.0  # Segundos por medición de rendimiento
+FRAGMENT_BACKOFF_COOLDOWN = 10.0  # Segundos sin subir tras un 403/429
+
+# Peticiones HTTP por plataforma compartidas por todos los trabajos (clave de get_host_key)
+HOST_REQUEST_RATES = {
+    'youtube': (10.0, 30),  # (peticiones/s, ráfaga)
+    'tiktok': (5.0, 15),
+}
+DEFAULT_HOST_REQUEST_RATE = (20.0, 50)
+HOST_INFLIGHT_INITIAL = 8  # Peticiones en vuelo iniciales por plataforma
+HOST_INFLIGHT_MAX = 64  # Tope del aumento aditivo
+HOST_THROTTLE_COOLDOWN = 2.0  # Segundos mínimos entre recortes por 403/429
+HOST_RETRY_AFTER_MAX = 60  # Pausa máxima por Retry-After
+
+# Ancho de banda global repartido entre las descargas activas
+BANDWIDTH_LIMIT = 0  # Bytes/s para todas las descargas (0 = sin límite)
+BANDWIDTH_REALLOCATE_INTERVAL = 1.0  # Segundos entre repartos
+BANDWIDTH_MIN_RATE = 256 * 1024  # Mínimo por trabajo (bytes/s)
+BANDWIDTH_BURST_SECONDS = 0.5  # Ráfaga permitida (segundos de su parte)
+BANDWIDTH_PRIORITY_STEP = 2.0  # Cada punto de prioridad multiplica el peso (-4 a 4)
+
+# Conversión con ffmpeg
+FFMPEG_STALL_TIMEOUT = 60  # Segundos sin avanzar antes de abortar una conversión
+
+# Codificación por segmentos en paralelo (vídeos largos)
+SEGMENTED_ENCODE_WORKERS = 0  # Codificadores simultáneos (0 = uno por núcleo)
+SEGMENTED_ENCODE_MIN_DURATION = 120  # Segundos mínimos de vídeo para partirlo
+SEGMENTED_ENCODE_MIN_SEGMENT = 10  # Segundos mínimos por segmento
+SEGMENTED_ENCODE_SEGMENTS_PER_WORKER = 2  # Más tramos que workers para repartir mejor la carga
+
+# Pool de conversiones (núcleos repartidos entre conversiones simultáneas)
+CONVERSION_THREADS_PER_JOB = 4  # Hilos de ffmpeg por conversión (define cuántas caben a la vez)
+CONVERSION_RESERVED_CPUS = 1  # Núcleos libres para las mezclas de las descargas (con más de 2)
+CONVERSION_MAX_QUEUED = 20  # Conversiones en cola antes de responder 429
+CONVERSION_NICE = 10  # Niceness de ffmpeg en conversiones de prioridad 0
+CONVERSION_NICE_STEP = 5  # Cada punto de prioridad resta (o suma) este nice
+
+# Varias salidas de una sola decodificación (split/asplit)
+RENDITIONS_MAX_OUTPUTS = 4  # Perfiles de salida máximos por petición
+RENDITIONS_AUDIO_BITRATE = 192  # kbps por defecto del audio de las salidas (AAC y MP3)
@@ -1,4 +1,4 @@
 """Modelos de datos"""
-from .schemas import DownloadRequest, VideoInfo
+from .schemas import DownloadRequest, VideoInfo, OutputProfile
 
-__all__ = ['DownloadRequest', 'VideoInfo']
+__all__ = ['DownloadRequest', 'VideoInfo', 'OutputProfile']
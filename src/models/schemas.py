@@ -1,7 +1,9 @@
 """Modelos de datos (DTOs)"""
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field, validator
 
+from src.config import RENDITIONS_MAX_OUTPUTS
+
 
 class VideoQuality(BaseModel):
     """Modelo para calidad de video"""
@@ -16,6 +18,27 @@ class VideoInfo(BaseModel):
     thumbnail: Optional[str] = None
     webpage_url: str
     qualities: list[VideoQuality] = []
+    scan_token: Optional[str] = None
+
+
+class OutputProfile(BaseModel):
+    """Perfil de una salida (rendición) generada a partir del mismo origen"""
+    format: str = Field(..., description="Formato de la salida (mp3 o mp4)")
+    quality: Optional[int] = Field(None, description="Altura máxima del video en píxeles (solo mp4; vacío = la del origen)")
+    audio_quality: Optional[int] = Field(None, description="Calidad del audio en kbps (ej: 128, 192, 320)")
+    
+    @validator('format')
+    def validate_format(cls, v):
+        if v not in ['mp3', 'mp4']:
+            raise ValueError('Formato debe ser mp3 o mp4')
+        return v
+
+
+def check_output_count(outputs: Optional[List[OutputProfile]]) -> Optional[List[OutputProfile]]:
+    """Comprueba que la lista de perfiles no esté vacía ni supere el máximo"""
+    if outputs is not None and not 1 <= len(outputs) <= RENDITIONS_MAX_OUTPUTS:
+        raise ValueError(f'Se admiten entre 1 y {RENDITIONS_MAX_OUTPUTS} salidas')
+    return outputs
 
 
 class DownloadRequest(BaseModel):
@@ -27,6 +50,9 @@ class DownloadRequest(BaseModel):
     end_time: Optional[str] = Field(None, description="Tiempo de fin (HH:MM:SS)")
     quality: Optional[int] = Field(None, description="Calidad del video en píxeles (ej: 720, 1080)")
     audio_quality: Optional[int] = Field(None, description="Calidad del audio en kbps (ej: 128, 192, 256, 320)")
+    scan_token: Optional[str] = Field(None, description="Token devuelto por /api/scan para reutilizar su extracción")
+    priority: int = Field(0, description="Prioridad en la cola y en el reparto del ancho de banda (mayor = antes y más rápido, -4 a 4 para el ancho de banda)")
+    outputs: Optional[List[OutputProfile]] = Field(None, description="Salidas a generar del archivo descargado con una sola decodificación")
     
     @validator('format')
     def validate_format(cls, v):
@@ -34,6 +60,13 @@ class DownloadRequest(BaseModel):
             raise ValueError('Formato debe ser mp3 o mp4')
         return v
     
+    @validator('outputs')
+    def validate_outputs(cls, v, values):
+        check_output_count(v)
+        if v and values.get('format') == 'mp3' and any(output.format == 'mp4' for output in v):
+            raise ValueError('Las salidas mp4 necesitan una descarga en formato mp4')
+        return v
+    
     @validator('url')
     def validate_url(cls, v):
         if not v or not v.strip():
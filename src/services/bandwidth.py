@@ -0,0 +1,225 @@
+"""Reparto del ancho de banda global entre las descargas activas"""
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.config import (
+    BANDWIDTH_LIMIT, BANDWIDTH_REALLOCATE_INTERVAL, BANDWIDTH_MIN_RATE,
+    BANDWIDTH_BURST_SECONDS, BANDWIDTH_PRIORITY_STEP
+)
+
+# Margen sobre lo medido que recibe un trabajo que no agota su parte
+# (permite que vuelva a acelerar: se duplica en cada reparto)
+DEMAND_HEADROOM = 2.0
+# Fracción de su asignación a partir de la que un trabajo se considera frenado por ella
+SATURATED_RATIO = 0.8
+# Fracción de la ventana durmiendo por el límite a partir de la que un
+# trabajo cuenta como frenado: su velocidad medida no es su demanda
+THROTTLED_RATIO = 0.05
+# Suavizado de la velocidad conseguida por trabajo
+ACHIEVED_EMA_ALPHA = 0.5
+
+
+class BandwidthShare:
+    """
+    Parte del ancho de banda asignada a un trabajo.
+
+    Funciona como un cubo de tokens con ``rate`` bytes/s: cada lectura
+    descuenta sus bytes y, si el cubo queda en negativo, el hilo duerme lo
+    necesario. Todos los hilos del trabajo (streams, fragmentos, rangos)
+    comparten la misma parte. Una lectura grande se cobra a trozos del
+    tamaño de la ráfaga, así que la deuda nunca pasa de una ráfaga y cada
+    trozo se cobra a la asignación vigente.
+    """
+
+    def __init__(self, scheduler: "BandwidthScheduler", job_id: str, priority: int):
+        self.scheduler = scheduler
+        self.job_id = job_id
+        self.priority = priority
+        self.weight = BANDWIDTH_PRIORITY_STEP ** max(-4, min(4, priority))
+        self.rate: Optional[float] = None
+        self.tokens = 0.0
+        self.refilled = time.monotonic()
+        self.bytes = 0
+        self.achieved: Optional[float] = None
+        # Si en la última ventana durmió por el límite (su demanda es mayor)
+        self.throttled = False
+        self._window_bytes = 0
+        self._window_started = self.refilled
+        # Tiempo dormido por el límite en la ventana (unión de las esperas
+        # de todos sus hilos) y hasta cuándo duerme alguno
+        self._window_throttled = 0.0
+        self._blocked_until = self.refilled
+
+    def consume(self, size: int):
+        """Descuenta ``size`` bytes leídos y espera si el trabajo va por encima de su parte"""
+        while size > 0:
+            chunk = self.scheduler._charge_size(self, size)
+            delay = self.scheduler._consume(self, chunk)
+            if delay > 0:
+                time.sleep(delay)
+            size -= chunk
+
+    def close(self):
+        self.scheduler._close(self)
+
+
+class BandwidthScheduler:
+    """
+    Límite de ancho de banda global repartido de forma justa y ponderada.
+
+    Cada ``BANDWIDTH_REALLOCATE_INTERVAL`` (y cada vez que un trabajo
+    empieza o termina) se reparte ``limit`` por llenado de agua: los
+    trabajos que consumen menos que su parte ponderada se quedan con lo que
+    usan (más margen para acelerar) y el sobrante se reparte entre el resto
+    según su peso. El peso sale de la prioridad de la petición: cada punto
+    multiplica por ``BANDWIDTH_PRIORITY_STEP``.
+
+    Con ``limit`` a 0 no se frena nada, pero se sigue midiendo la velocidad
+    conseguida por cada trabajo.
+    """
+
+    def __init__(self, limit: int = BANDWIDTH_LIMIT, interval: float = BANDWIDTH_REALLOCATE_INTERVAL):
+        self.limit = limit
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._shares: Dict[str, BandwidthShare] = {}
+        self._last_allocation = 0.0
+
+    def open(self, job_id: str, priority: int = 0) -> BandwidthShare:
+        """
+        Da de alta un trabajo y reparte de nuevo el ancho de banda.
+
+        Args:
+            job_id: ID de la descarga
+            priority: Prioridad de la petición (mayor = más ancho de banda)
+
+        Returns:
+            BandwidthShare: Parte del trabajo; hay que cerrarla al terminar
+        """
+        with self._lock:
+            share = BandwidthShare(self, job_id, priority)
+            self._shares[job_id] = share
+            self._reallocate(time.monotonic())
+            return share
+
+    def _close(self, share: BandwidthShare):
+        with self._lock:
+            if self._shares.get(share.job_id) is share:
+                del self._shares[share.job_id]
+                self._reallocate(time.monotonic())
+
+    def _charge_size(self, share: BandwidthShare, size: int) -> int:
+        """Bytes de una lectura que se cobran de una vez (como mucho, una ráfaga)"""
+        rate = share.rate
+        return size if rate is None else min(size, max(1, int(self._burst(rate))))
+
+    def _consume(self, share: BandwidthShare, size: int) -> float:
+        """Contabiliza los bytes y devuelve los segundos que debe esperar el hilo"""
+        with self._lock:
+            now = time.monotonic()
+            if not share.bytes:
+                # La primera ventana y el cubo empiezan con el primer byte, no
+                # con la conexión: el arranque no es falta de demanda ni
+                # acumula una ráfaga que se salte el límite global
+                share._window_started = share.refilled = now
+            share.bytes += size
+            share._window_bytes += size
+            if now - self._last_allocation >= self.interval:
+                self._reallocate(now)
+            if share.rate is None:
+                return 0.0
+            share.tokens = min(share.tokens + (now - share.refilled) * share.rate, self._burst(share.rate))
+            share.refilled = now
+            share.tokens -= size
+            if share.tokens >= 0:
+                return 0.0
+            delay = -share.tokens / share.rate
+            # Solo cuenta el tramo que no se solapa con otra espera del trabajo
+            until = now + delay
+            if until > share._blocked_until:
+                share._window_throttled += until - max(now, share._blocked_until)
+                share._blocked_until = until
+            return delay
+
+    @staticmethod
+    def _burst(rate: float) -> float:
+        return max(rate * BANDWIDTH_BURST_SECONDS, 64 * 1024)
+
+    def _reallocate(self, now: float):
+        """Mide la velocidad de cada trabajo y reparte ``limit`` por llenado de agua"""
+        self._last_allocation = now
+        shares = list(self._shares.values())
+        for share in shares:
+            elapsed = now - share._window_started
+            if share.bytes and elapsed >= self.interval / 2:
+                measured = share._window_bytes / elapsed
+                share.achieved = measured if share.achieved is None else (
+                    ACHIEVED_EMA_ALPHA * measured + (1 - ACHIEVED_EMA_ALPHA) * share.achieved
+                )
+                # La parte de la espera que cae después de ``now`` es de la siguiente ventana
+                pending_sleep = max(0.0, share._blocked_until - now)
+                throttled = share._window_throttled - pending_sleep
+                share.throttled = pending_sleep > 0 or throttled >= elapsed * THROTTLED_RATIO
+                share._window_bytes, share._window_started = 0, now
+                share._window_throttled = pending_sleep
+
+        if not self.limit:
+            for share in shares:
+                share.rate = None
+            return
+
+        remaining = float(self.limit)
+        pending = shares
+        while pending:
+            total_weight = sum(share.weight for share in pending)
+            # Trabajos que no llegan a su parte: se quedan con lo que usan y
+            # el resto vuelve a los que siguen ocupados. Si durmieron por el
+            # límite o gastan casi toda su asignación, es el límite el que
+            # los frena y su demanda real se desconoce
+            satisfied = []
+            for share in pending:
+                fair = remaining * share.weight / total_weight
+                if (share.achieved is not None and not share.throttled
+                        and share.achieved * DEMAND_HEADROOM < fair
+                        and (share.rate is None or share.achieved < share.rate * SATURATED_RATIO)):
+                    satisfied.append((share, max(share.achieved * DEMAND_HEADROOM, BANDWIDTH_MIN_RATE)))
+            if not satisfied:
+                break
+            for share, rate in satisfied:
+                self._set_rate(share, rate, now)
+                remaining -= rate
+            done = {id(share) for share, _ in satisfied}
+            pending = [share for share in pending if id(share) not in done]
+        if pending:
+            total_weight = sum(share.weight for share in pending)
+            for share in pending:
+                self._set_rate(share, max(remaining * share.weight / total_weight, BANDWIDTH_MIN_RATE), now)
+
+    def _set_rate(self, share: BandwidthShare, rate: float, now: float):
+        if share.rate is None:
+            # Un trabajo nuevo empieza sin ráfaga y la acumula a su ritmo
+            share.tokens, share.refilled = 0.0, now
+        share.rate = rate
+        share.tokens = min(share.tokens, self._burst(rate))
+
+    def stats(self) -> Dict:
+        """Ancho de banda asignado y conseguido por cada trabajo activo"""
+        with self._lock:
+            return {
+                'limit': self.limit or None,
+                'jobs': {
+                    share.job_id: {
+                        'priority': share.priority,
+                        'weight': share.weight,
+                        'allocated': int(share.rate) if share.rate is not None else None,
+                        'achieved': int(share.achieved) if share.achieved is not None else None,
+                        'throttled': share.throttled,
+                        'downloaded_bytes': share.bytes,
+                    }
+                    for share in self._shares.values()
+                },
+            }
@@ -0,0 +1,118 @@
+"""Plan de conversión a MP4 H.264/AAC a partir de ffprobe"""
+from typing import Dict, Optional
+
+# Formatos de píxel de H.264 que reproducen navegadores y móviles
+COMPATIBLE_PIX_FMTS = ('yuv420p', 'yuvj420p')
+
+# Modos de conversión, de más barato a más caro
+MODE_REMUX = 'remux'                    # copia de vídeo y audio (solo cambia el contenedor)
+MODE_TRANSCODE_AUDIO = 'transcode_audio'  # copia el vídeo, recodifica el audio
+MODE_TRANSCODE_VIDEO = 'transcode_video'  # recodifica el vídeo, copia el audio
+MODE_TRANSCODE = 'transcode'            # recodifica ambos
+
+MODE_MESSAGES = {
+    MODE_REMUX: 'Remuxando (sin recodificar)...',
+    MODE_TRANSCODE_AUDIO: 'Convirtiendo audio a AAC...',
+    MODE_TRANSCODE_VIDEO: 'Convirtiendo vídeo a H.264...',
+    MODE_TRANSCODE: 'Convirtiendo a H.264...',
+}
+
+
+def _first_stream(probe: Dict, codec_type: str) -> Optional[Dict]:
+    """Primer stream de un tipo (sin contar carátulas incrustadas)"""
+    for stream in probe.get('streams', ()):
+        if stream.get('codec_type') != codec_type:
+            continue
+        if stream.get('disposition', {}).get('attached_pic'):
+            continue
+        return stream
+    return None
+
+
+def video_is_compatible(stream: Optional[Dict]) -> bool:
+    """H.264 de 8 bits 4:2:0: se puede copiar tal cual al MP4"""
+    return (
+        stream is not None
+        and stream.get('codec_name') == 'h264'
+        and stream.get('pix_fmt') in COMPATIBLE_PIX_FMTS
+    )
+
+
+def audio_is_compatible(stream: Optional[Dict]) -> bool:
+    """AAC: se puede copiar tal cual al MP4"""
+    return stream is not None and stream.get('codec_name') == 'aac'
+
+
+def plan_h264(probe: Optional[Dict]) -> Dict:
+    """
+    Decide qué streams copiar y cuáles recodificar.
+
+    Args:
+        probe: Resultado de ``ffmpeg.probe`` (None si falló: se recodifica todo)
+
+    Returns:
+        Dict: ``mode``, ``video`` y ``audio`` ('copy', el códec a usar o
+        None si la entrada no tiene ese stream), el selector de cada stream
+        para ``-map`` y ``probed``
+    """
+    if not probe:
+        return {'mode': MODE_TRANSCODE, 'video': 'libx264', 'audio': 'aac', 'probed': False}
+
+    video = _first_stream(probe, 'video')
+    audio = _first_stream(probe, 'audio')
+    video_codec = None if video is None else ('copy' if video_is_compatible(video) else 'libx264')
+    audio_codec = None if audio is None else ('copy' if audio_is_compatible(audio) else 'aac')
+
+    copy_video = video_codec in (None, 'copy')
+    copy_audio = audio_codec in (None, 'copy')
+    if copy_video and copy_audio:
+        mode = MODE_REMUX
+    elif copy_video:
+        mode = MODE_TRANSCODE_AUDIO
+    elif copy_audio:
+        mode = MODE_TRANSCODE_VIDEO
+    else:
+        mode = MODE_TRANSCODE
+    return {
+        'mode': mode,
+        'video': video_codec,
+        'audio': audio_codec,
+        # Índice absoluto: 'v:0' podría ser una carátula
+        'video_map': str(video['index']) if video is not None and 'index' in video else 'v:0',
+        'audio_map': str(audio['index']) if audio is not None and 'index' in audio else 'a:0',
+        'probed': True,
+    }
+
+
+def h264_output(input_path: str, output_path: str, plan: Dict, threads: Optional[int] = None):
+    """
+    Construye la salida de ffmpeg-python para un plan.
+
+    Solo se pasan las opciones de calidad de los streams que se recodifican;
+    ``+faststart`` se aplica siempre para que el MP4 empiece a reproducirse
+    antes de descargarse entero. ``threads`` limita los hilos del codificador
+    de vídeo (None = los que elija libx264, uno y medio por núcleo).
+    """
+    import ffmpeg
+
+    source = ffmpeg.input(input_path)
+    kwargs = {'movflags': '+faststart'}
+    if plan['video']:
+        kwargs['vcodec'] = plan['video']
+        if plan['video'] != 'copy':
+            kwargs.update(preset='medium', crf=23)
+            if threads:
+                kwargs['threads'] = threads
+    if plan['audio']:
+        kwargs['acodec'] = plan['audio']
+        if plan['audio'] != 'copy':
+            kwargs['audio_bitrate'] = '192k'
+    if not plan['probed']:
+        # Sin probe no se sabe qué streams hay: mapeo por defecto de ffmpeg
+        return ffmpeg.output(source, output_path, **kwargs)
+    streams = []
+    if plan['video']:
+        streams.append(source[plan['video_map']])
+    if plan['audio']:
+        streams.append(source[plan['audio_map']])
+    return ffmpeg.output(*streams, output_path, **kwargs)
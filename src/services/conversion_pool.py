@@ -0,0 +1,102 @@
+"""Pool de conversiones con reparto de núcleos e hilos por trabajo"""
+import sys
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.config import (
+    CONVERSION_THREADS_PER_JOB, CONVERSION_RESERVED_CPUS, CONVERSION_MAX_QUEUED,
+    CONVERSION_NICE, CONVERSION_NICE_STEP
+)
+from src.services.downloader import conversion_jobs
+from src.services.worker_pool import PriorityWorkerPool, QueuedJob
+from src.utils import available_cpus
+
+
+class ConversionQueueFullError(Exception):
+    """La cola de conversiones está llena"""
+    def __init__(self, retry_after: int):
+        super().__init__("La cola de conversiones está llena, inténtalo más tarde")
+        self.retry_after = retry_after
+
+
+def conversion_nice(priority: int) -> int:
+    """Niceness de ffmpeg para una prioridad (mayor prioridad = menos nice)"""
+    return max(0, min(19, CONVERSION_NICE - priority * CONVERSION_NICE_STEP))
+
+
+class ConversionPool(PriorityWorkerPool):
+    """
+    Ejecuta conversiones en un número de hilos ajustado a la CPU.
+
+    Los núcleos disponibles para el proceso (afinidad y cuota del cgroup),
+    menos los que se reservan para las mezclas de las descargas, se reparten
+    en huecos de ``threads_per_job`` hilos; cada conversión recibe su
+    presupuesto de hilos (``-threads`` o número de segmentos) y el resto
+    espera en cola con su posición visible. ffmpeg corre con ``nice`` para
+    que las conversiones no frenen a las descargas.
+    """
+
+    queue_full_error = ConversionQueueFullError
+    worker_name = 'convert-worker'
+    log_prefix = '[CONVERT] Conversión'
+    initial_duration = 60.0
+    retry_after_max = 600
+
+    def __init__(
+        self,
+        handler: Callable,
+        cpus: Optional[int] = None,
+        threads_per_job: int = CONVERSION_THREADS_PER_JOB,
+        reserved_cpus: int = CONVERSION_RESERVED_CPUS,
+        max_queued: int = CONVERSION_MAX_QUEUED,
+    ):
+        self.cpus = cpus or available_cpus()
+        # Con 1-2 núcleos no se reserva nada: las conversiones no avanzarían
+        usable = self.cpus - reserved_cpus if self.cpus > 2 else self.cpus
+        max_workers = max(1, usable // max(1, threads_per_job))
+        super().__init__(handler, max_workers, max_queued)
+        self.threads_per_job = max(1, usable // self.max_workers)
+        self._running: Dict[str, int] = {}  # job_id -> nice
+
+    def submit(self, job_id: str, *args, priority: int = 0) -> int:
+        """
+        Encola una conversión.
+
+        Returns:
+            int: Posición en la cola (1 = siguiente en ejecutarse)
+
+        Raises:
+            ConversionQueueFullError: Si la cola alcanzó su tamaño máximo
+        """
+        return self._enqueue(job_id, args, priority)
+
+    def stats(self) -> Dict:
+        """Estado actual del pool"""
+        with self._cond:
+            return {
+                'cpus': self.cpus,
+                'max_workers': self.max_workers,
+                'threads_per_job': self.threads_per_job,
+                'running': len(self._running),
+                'running_nice': dict(self._running),
+                'queued': len(self._queue),
+                'max_queued': self.max_queued,
+            }
+
+    def _publish_position(self, job: QueuedJob, position: int):
+        conversion_jobs.update(
+            job.job_id,
+            status='queued',
+            queue_position=position,
+            message=f'En cola (posición {position})'
+        )
+
+    def _started(self, job: QueuedJob):
+        self._running[job.job_id] = conversion_nice(job.priority)
+
+    def _finished(self, job: QueuedJob):
+        self._running.pop(job.job_id, None)
+
+    def _run(self, job: QueuedJob):
+        self._handler(job.job_id, *job.args, threads=self.threads_per_job, nice=self._running[job.job_id])
@@ -1,5 +1,7 @@
 """Servicio de descarga de videos"""
 import yt_dlp
+from yt_dlp.utils import DownloadCancelled
+import copy
 import sys
 import os
 import shutil
@@ -8,20 +10,55 @@ import asyncio
 import threading
 import time
 from pathlib import Path
-from typing import Dict, Optional, Tuple, Callable
+from typing import Dict, List, Optional, Tuple, Callable
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-from src.config import DOWNLOAD_FOLDER, MAX_VIDEO_HEIGHT
-from src.utils import find_ffmpeg, sanitize_filename
+from src.config import (
+    MAX_VIDEO_HEIGHT,
+    PROGRESS_UPDATE_INTERVAL, PROGRESS_SPEED_EMA_ALPHA, JOB_JOURNAL_PROGRESS_INTERVAL,
+    FRAGMENT_CONCURRENCY_MAX
+)
+from src.utils import find_ffmpeg, sanitize_filename, normalize_url
+from src.services.metadata_cache import MetadataCache, get_signed_url_expiry
+from src.services.singleflight import SingleFlight
+from src.services.result_cache import ResultCache, make_result_key
+from src.services.job_store import JobStore
+from src.services.job_journal import JobJournal
+from src.services.retry import RetryBudget
+from src.services.parallel_ydl import ParallelYoutubeDL
+from src.services.fragment_budget import FragmentBudget
+from src.services.host_limiter import HostLimiter
+from src.services.bandwidth import BandwidthScheduler, BandwidthShare
+from src.services.ffmpeg_progress import run_with_progress, FFmpegError
+from src.services.conversion_plan import plan_h264, h264_output, MODE_MESSAGES
+from src.services.segmented_encode import SegmentedEncoder, plan_segments
+from src.services.renditions import plan_renditions, renditions_output, rendition_id
+from src.services.job_files import JobFileIndex
+from src.services.storage import StorageManager
 
-# Almacén global de progreso de descargas
-download_progress: Dict[str, Dict] = {}
+# Estado de las descargas (progreso, resultado y marcas de cancelación)
+download_jobs = JobStore('download')
 
-# Almacén global de progreso de conversiones
-conversion_progress: Dict[str, Dict] = {}
+# Estado de las conversiones
+conversion_jobs = JobStore('convert')
 
-# Descargas marcadas para cancelar
-downloads_to_cancel: set = set()
+# Diario persistente de las descargas en segundo plano
+job_journal = JobJournal()
+
+# Fragmentos HLS/DASH simultáneos, repartidos entre todas las descargas
+fragment_budget = FragmentBudget()
+
+# Ritmo y concurrencia de peticiones por plataforma (metadatos y medios)
+host_limiter = HostLimiter()
+
+# Ancho de banda global repartido entre las descargas según su prioridad
+bandwidth_scheduler = BandwidthScheduler()
+
+# Carpeta de cada trabajo y archivos que produce (sin recorrer DOWNLOAD_FOLDER)
+job_index = JobFileIndex()
+
+# Cuota de disco de esas carpetas
+storage_manager = StorageManager(job_index)
 
 
 class ProgressLogger:
@@ -42,8 +79,130 @@ class ProgressLogger:
 
     def error(self, msg):
         print(f"ERROR: {msg}")
-        if self.download_id in download_progress:
-            download_progress[self.download_id]['error'] = msg
+        download_jobs.update(self.download_id, error=msg)
+
+
+class DownloadProgressHook:
+    """
+    Hook de progreso de yt-dlp de bajo coste.
+    
+    Se llama por cada bloque descargado, así que usa los campos numéricos de
+    yt-dlp (sin formatear ni parsear cadenas), suaviza la velocidad con una
+    media móvil exponencial y solo publica en el almacén de trabajos cada
+    ``interval`` segundos. Los cambios de estado se publican siempre.
+    
+    Si el video y el audio se descargan a la vez, su progreso se suma en una
+    sola entrada. Los archivos parciales y los bytes descargados se guardan
+    además en el diario de trabajos (con menos frecuencia) para poder
+    reanudar tras un reinicio.
+    """
+    __slots__ = (
+        'download_id', 'interval', 'alpha', 'speed', 'cancelled', 'partials',
+        '_streams', '_lock', '_last_publish', '_last_journal'
+    )
+    
+    def __init__(self, download_id: str, interval: float = PROGRESS_UPDATE_INTERVAL, alpha: float = PROGRESS_SPEED_EMA_ALPHA):
+        self.download_id = download_id
+        self.interval = interval
+        self.alpha = alpha
+        self.speed: Optional[float] = None  # bytes/s (EMA)
+        self.cancelled = False
+        self.partials: list = []
+        # archivo -> [bytes descargados, bytes totales, velocidad, terminado]
+        self._streams: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._last_publish = 0.0
+        self._last_journal = 0.0
+    
+    @property
+    def downloaded_bytes(self) -> int:
+        """Bytes descargados de todos los streams, sin limitar por ``interval``"""
+        return sum(stream[0] for stream in self._streams.values())
+    
+    def _stream(self, d: Dict) -> list:
+        key = d.get('filename')
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = self._streams[key] = [0, None, None, False]
+            tmpfilename = d.get('tmpfilename')
+            if tmpfilename:
+                self.partials.append(tmpfilename)
+        return stream
+    
+    def __call__(self, d: Dict):
+        # Verificar si se debe cancelar la descarga (en todos los streams)
+        if self.cancelled or download_jobs.take_cancel(self.download_id):
+            if not self.cancelled:
+                self.cancelled = True
+                download_jobs.update(
+                    self.download_id,
+                    status='cancelled',
+                    error='Descarga cancelada por el usuario'
+                )
+            raise Exception('Descarga cancelada por el usuario')
+        
+        status = d['status']
+        if status == 'downloading':
+            with self._lock:
+                stream = self._stream(d)
+                stream[0] = d.get('downloaded_bytes') or 0
+                stream[1] = d.get('total_bytes') or d.get('total_bytes_estimate') or stream[1]
+                stream[2] = d.get('speed')
+                speed = stream[2]
+                if speed is not None:
+                    if len(self._streams) > 1:
+                        speed = sum(s[2] or 0 for s in self._streams.values() if not s[3])
+                    self.speed = speed if self.speed is None else self.speed + self.alpha * (speed - self.speed)
+                
+                now = time.monotonic()
+                if now - self._last_publish < self.interval:
+                    return
+                self._last_publish = now
+                
+                downloaded = self.downloaded_bytes
+                totals = [s[1] for s in self._streams.values()]
+                total = sum(totals) if all(totals) else None
+            
+            fields = {
+                'status': 'downloading',
+                'speed': int(self.speed) if self.speed is not None else None,
+                'eta': d.get('eta'),
+                'downloaded_bytes': downloaded,
+                'message': None,
+            }
+            if total:
+                # Sin tamaño total se conserva el último porcentaje conocido
+                fields['percent'] = min(100.0, round(downloaded * 100 / total, 1))
+                fields['total_bytes'] = int(total)
+                if self.speed:
+                    fields['eta'] = int((total - downloaded) / self.speed)
+            download_jobs.update(self.download_id, **fields)
+            
+            if now - self._last_journal >= JOB_JOURNAL_PROGRESS_INTERVAL:
+                self._last_journal = now
+                job_journal.update_progress(self.download_id, self.partials, downloaded, fields.get('total_bytes'))
+        elif status == 'finished':
+            with self._lock:
+                stream = self._stream(d)
+                stream[0] = stream[1] = d.get('total_bytes') or d.get('downloaded_bytes') or stream[0]
+                stream[2] = None
+                stream[3] = True
+                if not all(s[3] for s in self._streams.values()):
+                    return
+                # El siguiente archivo (si lo hay) vuelve a medir desde cero
+                self._last_publish = 0.0
+                self.speed = None
+            download_jobs.update(
+                self.download_id,
+                status='processing',
+                percent=100
+            )
+        elif status == 'error':
+            download_jobs.update(
+                self.download_id,
+                status='error',
+                error=str(d.get('error', 'Error desconocido'))
+            )
 
 
 class QuietLogger:
@@ -75,6 +234,17 @@ class DownloaderService:
             # Añadir a PATH para asegurar que yt-dlp lo encuentre
             os.environ["PATH"] += os.pathsep + self.ffmpeg_path
         
+        # Caché de metadatos para /api/scan
+        self.metadata_cache = MetadataCache()
+        # Escaneos simultáneos de la misma URL comparten una sola extracción
+        self._scan_flight = SingleFlight()
+        # Peticiones que esperan cada extracción y su señal de cancelación
+        self._scan_lock = threading.Lock()
+        self._scan_waiters: Dict[str, set] = {}
+        self._scan_cancels: Dict[str, threading.Event] = {}
+        # Caché de archivos ya descargados
+        self.result_cache = ResultCache()
+        
         # Ensure deno is on PATH (required by yt-dlp for YouTube n-challenge)
         self._setup_deno_path()
     
@@ -128,18 +298,19 @@ class DownloaderService:
     def _download_with_pybalt_sync(self, url: str, unique_id: str) -> Tuple[Path, str]:
         """Download TikTok video using pybalt CLI (subprocess)"""
         import subprocess
-        import glob
         
-        download_progress[unique_id].update({
-            'status': 'downloading',
-            'percent': 50,
-            'speed': 'cobalt.tools'
-        })
+        download_jobs.update(
+            unique_id,
+            status='downloading',
+            percent=50,
+            message='cobalt.tools'
+        )
         
-        # Use pybalt CLI with output directory
+        # Use pybalt CLI with the job's own directory as output
+        job_dir = job_index.create(unique_id)
         try:
             result = subprocess.run(
-                ['pybalt', '-u', url, '-fp', str(DOWNLOAD_FOLDER), '-y'],
+                ['pybalt', '-u', url, '-fp', str(job_dir), '-y'],
                 capture_output=True,
                 text=True,
                 timeout=120,
@@ -149,40 +320,28 @@ class DownloaderService:
             if result.returncode != 0:
                 raise Exception(f"pybalt CLI failed: {result.stderr}")
             
-            # Find the downloaded file (pybalt uses tiktok_username_id.mp4 format)
-            # Get the most recent .mp4 file in download folder
-            import re
-            video_id_match = re.search(r'/video/(\d+)', url)
-            video_id = video_id_match.group(1) if video_id_match else None
-            
-            if video_id:
-                # Look for file with video ID
-                pattern = str(DOWNLOAD_FOLDER / f"*{video_id}*.mp4")
-                files = glob.glob(pattern)
-                if files:
-                    downloaded_file = Path(files[0])
-                else:
-                    # Fallback: get most recent mp4
-                    mp4_files = list(DOWNLOAD_FOLDER.glob("*.mp4"))
-                    if mp4_files:
-                        downloaded_file = max(mp4_files, key=lambda p: p.stat().st_mtime)
-                    else:
-                        raise Exception("No downloaded file found")
-            else:
-                raise Exception("Could not extract video ID")
+            # Find the downloaded file (pybalt uses tiktok_username_id.mp4 format);
+            # the job directory only holds this job's files
+            mp4_files = [f for f in job_index.scan(unique_id) if f.suffix == '.mp4']
+            if not mp4_files:
+                raise Exception("No downloaded file found")
+            downloaded_file = mp4_files[0]
             
-            # Rename to use unique_id
-            new_path = DOWNLOAD_FOLDER / f"{unique_id}.mp4"
+            # Rename to use unique_id and publish it out of scratch
+            new_path = job_dir / f"{unique_id}.mp4"
             if downloaded_file != new_path:
                 downloaded_file.rename(new_path)
+            new_path = job_index.publish(unique_id, new_path)
+            job_index.drop_scratch(unique_id)
             
             filename = f"tiktok_{unique_id}.mp4"
             
-            download_progress[unique_id].update({
-                'status': 'completed',
-                'percent': 100,
-                'filename': filename
-            })
+            download_jobs.update(
+                unique_id,
+                status='completed',
+                percent=100,
+                filename=filename
+            )
             
             return new_path, filename
             
@@ -244,13 +403,69 @@ class DownloaderService:
         
         return None
 
-    def get_video_info(self, url: str) -> Dict:
-        """Obtiene información del video sin descargar"""
-        # Limpiar URL de TikTok
-        original_url = url
-        if 'tiktok.com' in url and '?' in url:
-            url = url.split('?')[0]
-
+    def get_video_info(self, url: str, scan_id: Optional[str] = None) -> Dict:
+        """
+        Obtiene información del video sin descargar.
+        
+        Args:
+            url: URL del video
+            scan_id: ID de la petición, para abandonarla con ``abandon_scan``
+        """
+        # Limpiar URL de TikTok y normalizar (también es la clave de la caché)
+        url = normalize_url(url)
+        
+        cached = self.metadata_cache.get(url)
+        if cached is not None:
+            if cached.error is not None:
+                raise Exception(cached.error)
+            return dict(cached.value['response'])
+        
+        # Cada petición que espera la extracción compartida es un interesado;
+        # solo se aborta cuando todos la abandonan
+        waiter = scan_id or object()
+        with self._scan_lock:
+            self._scan_waiters.setdefault(url, set()).add(waiter)
+            self._scan_cancels.setdefault(url, threading.Event())
+        try:
+            while True:
+                try:
+                    return dict(self._scan_flight.do(url, self._extract_video_info, url))
+                except DownloadCancelled:
+                    # Se unió a una extracción que los demás ya abandonaron
+                    with self._scan_lock:
+                        if waiter not in self._scan_waiters.get(url, ()):
+                            raise
+                        self._scan_cancels.setdefault(url, threading.Event())
+        finally:
+            with self._scan_lock:
+                waiters = self._scan_waiters.get(url)
+                if waiters is not None:
+                    waiters.discard(waiter)
+                    if not waiters:
+                        del self._scan_waiters[url]
+                        self._scan_cancels.pop(url, None)
+    
+    def abandon_scan(self, url: str, scan_id: str):
+        """
+        La petición ``scan_id`` dejó de esperar (superó su plazo). Si nadie
+        más espera esa extracción, se aborta en su siguiente petición HTTP y
+        libera su hilo del pool de escaneos.
+        """
+        url = normalize_url(url)
+        with self._scan_lock:
+            waiters = self._scan_waiters.get(url)
+            if waiters is None:
+                return
+            waiters.discard(scan_id)
+            if not waiters:
+                del self._scan_waiters[url]
+                cancel = self._scan_cancels.pop(url, None)
+                if cancel is not None:
+                    cancel.set()
+                    print(f"[SCAN] Escaneo abandonado: {url}")
+    
+    def _extract_video_info(self, url: str) -> Dict:
+        """Extrae la información del video con yt-dlp y la guarda en caché"""
         # Usamos logger silencioso y opciones por defecto
         opts = {
             'quiet': True,
@@ -266,7 +481,9 @@ class DownloaderService:
             opts['ffmpeg_location'] = self.ffmpeg_path if path_obj.is_dir() else str(path_obj.parent)
         
         try:
-            with yt_dlp.YoutubeDL(opts) as ydl:
+            with self._scan_lock:
+                cancel = self._scan_cancels.get(url)
+            with ParallelYoutubeDL(opts, host_limiter=host_limiter, cancel=cancel) as ydl:
                 info = ydl.extract_info(url, download=False)
                 
                 # Extraer calidades disponibles
@@ -275,13 +492,24 @@ class DownloaderService:
                 # Obtener thumbnail
                 thumbnail = self._get_thumbnail(info, url)
                 
-                return {
+                response = {
                     'title': info.get('title'),
                     'duration': info.get('duration'),
                     'thumbnail': thumbnail,
                     'webpage_url': info.get('webpage_url'),
                     'qualities': qualities
                 }
+                entry = self.metadata_cache.put(
+                    url,
+                    {'info': ydl.sanitize_info(info), 'response': response},
+                    url_expiry=get_signed_url_expiry(info)
+                )
+                # Token para que la descarga reutilice esta extracción
+                response['scan_token'] = entry.token if entry else None
+                return response
+        except DownloadCancelled:
+            # Abandonada, no fallida: ni fallback ni caché negativa
+            raise
         except Exception as e:
             # TikTok fallback: use oEmbed API for metadata
             if self._is_tiktok_url(url):
@@ -310,7 +538,7 @@ class DownloaderService:
                 except Exception:
                     pass  # Use default values if oEmbed fails
                 
-                return {
+                response = {
                     'title': title,
                     'duration': None,
                     'thumbnail': thumbnail,
@@ -318,6 +546,14 @@ class DownloaderService:
                     'qualities': [{'value': 720, 'label': '720p (HD)'}],
                     '_tiktok_fallback': True  # Flag to indicate pybalt should be used
                 }
+                # Resultado degradado: solo se recuerda lo que dura la caché negativa
+                self.metadata_cache.put(
+                    url,
+                    {'info': None, 'response': response},
+                    ttl=self.metadata_cache.negative_ttl
+                )
+                return response
+            self.metadata_cache.put_error(url, str(e))
             raise
     
     def _extract_qualities(self, info: Dict) -> list:
@@ -357,12 +593,15 @@ class DownloaderService:
     def _get_base_options(self, unique_id: str) -> Dict:
         """Obtiene las opciones base para yt-dlp"""
         opts = {
-            'outtmpl': str(DOWNLOAD_FOLDER / f'{unique_id}.%(ext)s'),
+            'outtmpl': str(job_index.create(unique_id) / f'{unique_id}.%(ext)s'),
             'quiet': False,
             'no_warnings': False,
             'verbose': True,
             'logger': QuietLogger(),
             'extractor_retries': 3,
+            # Hilos por archivo fragmentado; cuántos trabajan a la vez lo
+            # decide fragment_budget según la plataforma y el rendimiento
+            'concurrent_fragment_downloads': FRAGMENT_CONCURRENCY_MAX,
             # Auto-download latest EJS challenge solver from GitHub
             # (required when bundled version is outdated for YouTube n-challenge)
             'remote_components': ['ejs:github'],
@@ -416,7 +655,119 @@ class DownloaderService:
         
         return opts
     
-    def download(self, url: str, format_type: str, unique_id: str, start_time: Optional[str] = None, end_time: Optional[str] = None, quality: Optional[int] = None, audio_quality: Optional[int] = None) -> Tuple[Path, str]:
+    def _get_scanned_info(self, url: str, scan_token: Optional[str]) -> Optional[Dict]:
+        """Recupera el info_dict de un escaneo previo si sus URLs siguen vigentes"""
+        if not scan_token:
+            return None
+        entry = self.metadata_cache.get_by_token(scan_token)
+        if entry is None or entry.key != url or not entry.value.get('info'):
+            return None
+        info = entry.value['info']
+        expiry = get_signed_url_expiry(info)
+        if expiry and expiry <= time.time() + 60:
+            return None
+        return info
+    
+    def _result_cache_key(self, ydl, info: Dict, format_type: str, audio_quality: Optional[int], start_time: Optional[str], end_time: Optional[str]) -> Optional[str]:
+        """Clave de la caché de resultados: video, formatos elegidos y postprocesado"""
+        if info.get('_type', 'video') != 'video' or not info.get('id'):
+            return None
+        try:
+            # Solo selección de formatos, sin descargar
+            selected = ydl.process_ie_result(copy.deepcopy(info), download=False)
+        except Exception:
+            return None
+        if not selected.get('format_id'):
+            return None
+        return make_result_key(
+            info.get('extractor_key') or info.get('extractor', ''),
+            info['id'],
+            selected['format_id'],
+            {
+                'format': format_type,
+                'audio_quality': audio_quality if format_type == 'mp3' else None,
+                'merge_output_format': ydl.params.get('merge_output_format'),
+                'start_time': start_time,
+                'end_time': end_time,
+            }
+        )
+    
+    def _output_path(self, info: Dict, unique_id: str) -> Optional[Path]:
+        """
+        Publica el archivo final de una descarga de yt-dlp y devuelve su ruta.
+        
+        yt-dlp deja la ruta definitiva (ya mezclada y postprocesada) en
+        ``requested_downloads``; solo si falta se mira la carpeta scratch del
+        trabajo. El archivo pasa a la carpeta publicada y el resto del
+        scratch (parciales, fragmentos) se borra.
+        """
+        downloads = (info or {}).get('requested_downloads') or ()
+        paths = [Path(d['filepath']) for d in downloads if d.get('filepath')]
+        paths = [p for p in paths if p.exists()] or job_index.scan(unique_id)
+        if not paths:
+            return None
+        file_path = job_index.publish(unique_id, paths[0])
+        job_index.drop_scratch(unique_id)
+        return file_path
+    
+    def _selected_format_spec(self, ydl, info: Dict) -> Optional[str]:
+        """Formatos concretos (ej: '137+140') que yt-dlp eligió para un info_dict"""
+        try:
+            selected = ydl.process_ie_result(copy.deepcopy(info), download=False)
+        except Exception:
+            return None
+        formats = selected.get('requested_formats') or [selected]
+        format_ids = [f.get('format_id') for f in formats]
+        if not all(format_ids):
+            return None
+        return '+'.join(format_ids)
+    
+    def _download_from_info(self, ydl, url: str, info: Dict, unique_id: str, retry: RetryBudget, progress_hook: DownloadProgressHook) -> Dict:
+        """
+        Descarga partiendo de un info_dict ya resuelto (de /api/scan o de
+        una extracción sin descarga).
+        
+        Si las URLs firmadas caducan a mitad de descarga (403) solo se vuelven
+        a extraer los metadatos, se fijan los mismos formatos y yt-dlp
+        continúa cada stream desde su archivo parcial (byte o fragmento), sin
+        empezar de cero. Cada renovación consume el presupuesto de reintentos.
+        """
+        format_spec = None
+        while True:
+            try:
+                result = ydl.process_ie_result(copy.deepcopy(info), download=True)
+                retry.end('ok')
+                return result
+            except yt_dlp.utils.DownloadError as e:
+                forbidden = '403' in str(e)
+                retry.end('403' if forbidden else 'error')
+                if not forbidden or not retry.can_retry():
+                    raise
+            
+            if format_spec is None:
+                format_spec = self._selected_format_spec(ydl, info)
+                if format_spec:
+                    # Mismos formatos que los archivos parciales; si alguno
+                    # ya no existe, la selección original
+                    original = ydl.params.get('format')
+                    ydl.format_selector = ydl.build_format_selector(f"{format_spec}/{original}" if original else format_spec)
+            
+            attempt = retry.begin('403', resumed_from=progress_hook.downloaded_bytes)
+            print(f"[RETRY] 403 a mitad de descarga, renovando URLs de {format_spec or 'los formatos'} "
+                  f"en {attempt['wait']}s (intento {attempt['attempt']}/{retry.max_attempts})...")
+            download_jobs.update(
+                unique_id,
+                message=f"Renovando enlaces ({attempt['attempt']}/{retry.max_attempts})...",
+                retries=retry.snapshot()
+            )
+            time.sleep(attempt['wait'])
+            
+            self.metadata_cache.invalidate(url)
+            refresh_started = time.monotonic()
+            info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+            attempt['refresh_seconds'] = round(time.monotonic() - refresh_started, 2)
+    
+    def download(self, url: str, format_type: str, unique_id: str, start_time: Optional[str] = None, end_time: Optional[str] = None, quality: Optional[int] = None, audio_quality: Optional[int] = None, scan_token: Optional[str] = None, priority: int = 0) -> Tuple[Path, str]:
         """
         Descarga un video o audio de YouTube.
         
@@ -426,6 +777,8 @@ class DownloaderService:
             unique_id: ID único para el archivo
             quality: Calidad del video en píxeles (ej: 720, 1080)
             audio_quality: Calidad del audio en kbps (ej: 128, 192, 256, 320)
+            scan_token: Token devuelto por /api/scan para reutilizar su extracción
+            priority: Prioridad de la petición; da más parte del ancho de banda global
             
         Returns:
             Tuple[Path, str]: Ruta del archivo descargado y nombre sanitizado
@@ -433,62 +786,24 @@ class DownloaderService:
         Raises:
             Exception: Si ocurre un error durante la descarga
         """
+        bandwidth = bandwidth_scheduler.open(unique_id, priority)
+        try:
+            return self._download(url, format_type, unique_id, start_time, end_time, quality, audio_quality, scan_token, bandwidth)
+        finally:
+            bandwidth.close()
+    
+    def _download(self, url: str, format_type: str, unique_id: str, start_time: Optional[str], end_time: Optional[str], quality: Optional[int], audio_quality: Optional[int], scan_token: Optional[str], bandwidth: BandwidthShare) -> Tuple[Path, str]:
+        """Implementación de ``download`` con la parte de ancho de banda del trabajo"""
         # Inicializar progreso
-        download_progress[unique_id] = {
-            'status': 'starting',
-            'percent': 0,
-            'speed': '',
-            'eta': '',
-            'filename': '',
-            'error': None
-        }
+        download_jobs.create(
+            unique_id,
+            status='starting',
+            percent=0,
+            cache_hit=False
+        )
         
         # Limpiar URL de TikTok
-        if 'tiktok.com' in url and '?' in url:
-            url = url.split('?')[0]
-        
-        def clean_ansi(text):
-            """Elimina códigos de escape ANSI del texto"""
-            import re
-            ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-            return ansi_escape.sub('', str(text)) if text else ''
-        
-        def progress_hook(d):
-            # Verificar si se debe cancelar la descarga
-            if unique_id in downloads_to_cancel:
-                downloads_to_cancel.discard(unique_id)
-                download_progress[unique_id].update({
-                    'status': 'cancelled',
-                    'error': 'Descarga cancelada por el usuario'
-                })
-                raise Exception('Descarga cancelada por el usuario')
-            
-            if d['status'] == 'downloading':
-                # Extraer porcentaje (limpiar ANSI)
-                percent_str = clean_ansi(d.get('_percent_str', '0%')).strip().replace('%', '')
-                try:
-                    percent = float(percent_str)
-                except:
-                    percent = 0
-                
-                download_progress[unique_id].update({
-                    'status': 'downloading',
-                    'percent': percent,
-                    'speed': clean_ansi(d.get('_speed_str', '')),
-                    'eta': clean_ansi(d.get('_eta_str', '')),
-                    'downloaded': clean_ansi(d.get('_downloaded_bytes_str', '')),
-                    'total': clean_ansi(d.get('_total_bytes_str', d.get('_total_bytes_estimate_str', '')))
-                })
-            elif d['status'] == 'finished':
-                download_progress[unique_id].update({
-                    'status': 'processing',
-                    'percent': 100
-                })
-            elif d['status'] == 'error':
-                download_progress[unique_id].update({
-                    'status': 'error',
-                    'error': str(d.get('error', 'Error desconocido'))
-                })
+        url = normalize_url(url)
         
         # Seleccionar opciones según formato
         if format_type == 'mp3':
@@ -497,6 +812,7 @@ class DownloaderService:
             ydl_opts = self._get_video_options(unique_id, quality)
         
         # Agregar hook de progreso
+        progress_hook = DownloadProgressHook(unique_id)
         ydl_opts['progress_hooks'] = [progress_hook]
         ydl_opts['logger'] = ProgressLogger(unique_id)
             
@@ -511,24 +827,26 @@ class DownloaderService:
             # Force re-encoding at cuts for precision and broad compatibility (fixes Facebook/others)
             ydl_opts['force_keyframes_at_cuts'] = True
         
+        # Reutilizar la extracción de /api/scan si el cliente envió su token
+        scanned_info = self._get_scanned_info(url, scan_token)
+        
         # Descargar con reintentos para errores 403
         max_retries = 3
         last_error = None
+        retry = RetryBudget()
         
         for attempt in range(max_retries):
-            # Clean up partial files from previous attempts
+            # Los archivos parciales se conservan: yt-dlp continúa desde ellos
             if attempt > 0:
-                for f in DOWNLOAD_FOLDER.glob(f'{unique_id}.*'):
-                    try: f.unlink()
-                    except: pass
-                wait_time = 2 ** attempt  # 2s, 4s
-                print(f"[RETRY] Attempt {attempt + 1}/{max_retries} after {wait_time}s wait...")
-                download_progress[unique_id].update({
-                    'status': 'downloading',
-                    'percent': 0,
-                    'speed': f'Reintentando ({attempt + 1}/{max_retries})...',
-                })
-                time.sleep(wait_time)
+                stats = retry.begin('403-extract', resumed_from=progress_hook.downloaded_bytes)
+                print(f"[RETRY] Attempt {attempt + 1}/{max_retries} after {stats['wait']}s wait...")
+                download_jobs.update(
+                    unique_id,
+                    status='downloading',
+                    message=f'Reintentando ({attempt + 1}/{max_retries})...',
+                    retries=retry.snapshot()
+                )
+                time.sleep(stats['wait'])
                 
                 # On retry, try alternate player clients to bypass n-challenge issues
                 if attempt == 1:
@@ -539,36 +857,63 @@ class DownloaderService:
                     print("[RETRY] Switching to mweb player client...")
             
             try:
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(url, download=True)
+                with ParallelYoutubeDL(ydl_opts, fragment_budget=fragment_budget, host_limiter=host_limiter, bandwidth=bandwidth) as ydl:
+                    # Resolver metadatos (del escaneo o extrayendo sin descargar)
+                    if scanned_info is not None and attempt == 0:
+                        base_info = scanned_info
+                    else:
+                        base_info = ydl.sanitize_info(ydl.extract_info(url, download=False))
                     
-                    # Buscar archivo descargado
-                    downloaded_files = list(DOWNLOAD_FOLDER.glob(f'{unique_id}.*'))
+                    # Servir desde la caché si ya se descargó exactamente lo mismo
+                    cache_key = self._result_cache_key(ydl, base_info, format_type, audio_quality, start_time, end_time)
+                    cached = self.result_cache.get(cache_key) if cache_key else None
+                    if cached:
+                        file_path, filename = cached
+                        print(f"[CACHE] Resultado servido desde caché: {file_path.name}")
+                        download_jobs.update(
+                            unique_id,
+                            status='completed',
+                            percent=100,
+                            filename=filename,
+                            cache_hit=True
+                        )
+                        return file_path, filename
                     
-                    if not downloaded_files:
-                        raise Exception("No se pudo descargar el archivo")
+                    info = self._download_from_info(ydl, url, base_info, unique_id, retry, progress_hook)
                     
-                    file_path = downloaded_files[0]
+                    # Archivo final según yt-dlp (tras mezclar y postprocesar)
+                    file_path = self._output_path(info, unique_id)
+                    
+                    if file_path is None:
+                        raise Exception("No se pudo descargar el archivo")
                     
                     # Generar nombre de archivo
                     title = info.get('title', 'video')
                     safe_title = sanitize_filename(title)
                     filename = f"{safe_title}.{file_path.suffix[1:]}"
                     
+                    if cache_key:
+                        self.result_cache.put(cache_key, file_path, filename)
+                    
                     # Marcar como completado
-                    download_progress[unique_id].update({
-                        'status': 'completed',
-                        'percent': 100,
-                        'filename': filename
-                    })
+                    download_jobs.update(
+                        unique_id,
+                        status='completed',
+                        percent=100,
+                        filename=filename,
+                        # Los errores de intentos recuperados ya no aplican
+                        error=None,
+                        retries=retry.snapshot() or None
+                    )
                     
                     return file_path, filename
             except Exception as e:
                 last_error = e
                 error_str = str(e).lower()
+                retry.end('403' if '403' in error_str else 'error')
                 
                 # If 403 Forbidden, retry with fresh extraction
-                if '403' in error_str and attempt < max_retries - 1:
+                if '403' in error_str and attempt < max_retries - 1 and retry.can_retry():
                     print(f"[RETRY] Got 403 Forbidden, will retry with fresh URLs...")
                     continue
                 
@@ -576,47 +921,47 @@ class DownloaderService:
                 if self._is_tiktok_url(url):
                     try:
                         print(f"yt-dlp failed for TikTok, trying pybalt fallback...")
-                        download_progress[unique_id].update({
-                            'status': 'downloading',
-                            'percent': 25,
-                            'speed': 'Trying cobalt.tools...'
-                        })
+                        download_jobs.update(
+                            unique_id,
+                            status='downloading',
+                            percent=25,
+                            message='Trying cobalt.tools...'
+                        )
                         result = self._download_with_pybalt_sync(url, unique_id)
                         return result
                     except Exception as pybalt_error:
-                        download_progress[unique_id].update({
-                            'status': 'error',
-                            'error': f"yt-dlp: {str(e)} | pybalt: {str(pybalt_error)}"
-                        })
+                        download_jobs.update(
+                            unique_id,
+                            status='error',
+                            error=f"yt-dlp: {str(e)} | pybalt: {str(pybalt_error)}"
+                        )
                         raise Exception(f"All download methods failed. yt-dlp: {str(e)} | pybalt: {str(pybalt_error)}")
                 
                 # General fallback: try 'best' single format (no merge needed)
-                downloaded_files = list(DOWNLOAD_FOLDER.glob(f'{unique_id}.*'))
+                downloaded_files = job_index.scan(unique_id)
                 if "ffmpeg" in error_str or "403" in error_str or not downloaded_files or (downloaded_files and downloaded_files[0].stat().st_size < 1000000):
                     print(f"Download failed. Retrying with 'best' single format (no merge)...")
                     # Remove corrupted/partial files
-                    for f in DOWNLOAD_FOLDER.glob(f'{unique_id}.*'):
-                        try: f.unlink()
-                        except: pass
+                    job_index.clear(unique_id)
                     
                     ydl_opts['format'] = 'best'
                     if 'merge_output_format' in ydl_opts:
                         del ydl_opts['merge_output_format']
                     
                     try:
-                        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                        with ParallelYoutubeDL(ydl_opts, fragment_budget=fragment_budget, host_limiter=host_limiter, bandwidth=bandwidth) as ydl:
                             info = ydl.extract_info(url, download=True)
-                            downloaded_files = list(DOWNLOAD_FOLDER.glob(f'{unique_id}.*'))
-                            if downloaded_files:
-                                file_path = downloaded_files[0]
+                            file_path = self._output_path(info, unique_id)
+                            if file_path:
                                 title = info.get('title', 'video')
                                 safe_title = sanitize_filename(title)
                                 filename = f"{safe_title}.{file_path.suffix[1:]}"
-                                download_progress[unique_id].update({
-                                    'status': 'completed',
-                                    'percent': 100,
-                                    'filename': filename
-                                })
+                                download_jobs.update(
+                                    unique_id,
+                                    status='completed',
+                                    percent=100,
+                                    filename=filename
+                                )
                                 return file_path, filename
                     except Exception:
                         pass  # Fall through to error
@@ -625,103 +970,116 @@ class DownloaderService:
                 break
         
         # All retries exhausted
-        download_progress[unique_id].update({
-            'status': 'error',
-            'error': str(last_error)
-        })
+        download_jobs.update(
+            unique_id,
+            status='error',
+            error=str(last_error)
+        )
         raise last_error
     
-    def convert_to_h264(self, file_path: str, convert_id: str) -> Tuple[Path, str]:
+    def convert_to_h264(self, file_path: str, convert_id: str, threads: Optional[int] = None,
+                        nice: int = 0) -> Tuple[Path, str]:
         """
         Convierte un video a H.264 usando ffmpeg-python.
+        
+        Los streams que ya son compatibles (H.264 8 bits 4:2:0, AAC) se copian
+        sin recodificar; un archivo ya compatible solo cambia de contenedor.
+        Los vídeos largos que hay que recodificar se parten en keyframes y
+        los tramos se codifican en paralelo.
+        El progreso sale del canal ``-progress`` de ffmpeg (tiempo codificado,
+        velocidad y fps reales); si la conversión deja de avanzar se aborta.
+        
+        Args:
+            file_path: Archivo a convertir
+            convert_id: ID de la conversión
+            threads: Núcleos asignados a la conversión (hilos de libx264 o
+                segmentos simultáneos); None = todos los disponibles
+            nice: Niceness de los procesos ffmpeg
         """
         import ffmpeg
-        import time
-        import threading
         
         input_path = Path(file_path)
         if not input_path.exists():
             raise Exception("Archivo no encontrado")
         
-        # Crear nombre de salida con sufijo _h264
+        # Crear nombre de salida con sufijo _h264 en el scratch de la conversión
         stem = input_path.stem
-        output_path = input_path.parent / f"{stem}_h264.mp4"
+        output_path = job_index.create(convert_id) / f"{stem}_h264.mp4"
         
         # Eliminar archivo de salida si existe
         if output_path.exists():
             output_path.unlink()
         
         # Inicializar progreso
-        conversion_progress[convert_id] = {
-            'status': 'starting',
-            'percent': 0,
-            'message': 'Iniciando conversión...'
-        }
+        conversion_jobs.create(
+            convert_id,
+            status='starting',
+            percent=0,
+            message='Iniciando conversión...'
+        )
         
+        probe = None
         try:
-            # Obtener duración del video
+            # Obtener duración y códecs del video
             probe = ffmpeg.probe(str(input_path))
             duration = float(probe['format']['duration'])
             print(f"[CONVERT] Duración del video: {duration}s")
         except Exception as e:
+            # Sin duración no hay porcentaje, pero sí tiempo codificado y velocidad
             print(f"[CONVERT] No se pudo obtener duración: {e}")
-            duration = 60  # Asumir 60 segundos si no se puede obtener
+            duration = None
+        
+        # Copiar los streams que ya son H.264/AAC y recodificar solo el resto
+        plan = plan_h264(probe)
+        print(f"[CONVERT] Modo: {plan['mode']} (vídeo: {plan['video']}, audio: {plan['audio']})")
         
         try:
-            conversion_progress[convert_id].update({
-                'status': 'converting',
-                'percent': 5,
-                'message': 'Convirtiendo a H.264...'
-            })
+            conversion_jobs.update(
+                convert_id,
+                status='converting',
+                percent=5,
+                message=MODE_MESSAGES[plan['mode']],
+                conversion_mode=plan['mode']
+            )
             
-            # Variable para almacenar el resultado del hilo
-            convert_error = [None]
+            def on_progress(progress: Dict):
+                fields = {
+                    'out_time': progress['out_time'],
+                    'encode_speed': progress['speed'],
+                    'fps': progress['fps'],
+                    'eta': progress['eta'],
+                }
+                speed = f" ({progress['speed']:.2f}x)" if progress['speed'] else ''
+                if progress['percent'] is not None:
+                    # 5% inicial reservado al análisis, 99% como tope hasta cerrar el archivo
+                    fields['percent'] = min(99, 5 + int(progress['percent'] * 0.95))
+                    fields['message'] = f"Convirtiendo... {fields['percent']}%{speed}"
+                else:
+                    fields['message'] = f"Convirtiendo... {progress['out_time']:.0f}s{speed}"
+                conversion_jobs.update(convert_id, status='converting', **fields)
             
-            def run_ffmpeg():
-                try:
-                    # Usar ffmpeg-python para la conversión
-                    stream = ffmpeg.input(str(input_path))
-                    stream = ffmpeg.output(
-                        stream,
-                        str(output_path),
-                        vcodec='libx264',
-                        acodec='aac',
-                        preset='medium',
-                        crf=23,
-                        audio_bitrate='192k',
-                        movflags='+faststart'
+            # Usar ffmpeg-python para construir la conversión
+            stream = h264_output(str(input_path), str(output_path), plan, threads=threads)
+            # Vídeos largos: tramos entre keyframes codificados en paralelo
+            start_offset = float(probe['format'].get('start_time') or 0) if probe else 0.0
+            segments = plan_segments(str(input_path), plan, duration, start_offset, workers=threads)
+            try:
+                if segments:
+                    print(f"[CONVERT] Codificando {len(segments)} segmentos en paralelo")
+                    conversion_jobs.update(
+                        convert_id,
+                        message=f"Convirtiendo a H.264 en {len(segments)} segmentos..."
                     )
-                    ffmpeg.run(stream, overwrite_output=True, quiet=True)
-                except ffmpeg.Error as e:
-                    convert_error[0] = str(e.stderr.decode('utf-8', errors='ignore') if e.stderr else str(e))
-                except Exception as e:
-                    convert_error[0] = str(e)
-            
-            # Ejecutar FFmpeg en un hilo separado
-            ffmpeg_thread = threading.Thread(target=run_ffmpeg)
-            ffmpeg_thread.start()
-            
-            # Monitorear progreso
-            start_time = time.time()
-            while ffmpeg_thread.is_alive():
-                time.sleep(0.5)
-                elapsed = time.time() - start_time
-                
-                # Calcular progreso basado en tiempo estimado (asumir 1.5x duración para conversión)
-                estimated_time = duration * 1.5
-                percent = min(95, int((elapsed / estimated_time) * 100) + 5)
-                
-                conversion_progress[convert_id].update({
-                    'status': 'converting',
-                    'percent': percent,
-                    'message': f'Convirtiendo... {percent}%'
-                })
-            
-            ffmpeg_thread.join()
-            
-            # Verificar si hubo error
-            if convert_error[0]:
-                raise Exception(f"Error de FFmpeg: {convert_error[0][:300]}")
+                    # Con presupuesto de núcleos, un hilo por segmento y tantos segmentos como núcleos
+                    SegmentedEncoder(workers=threads).encode(
+                        str(input_path), str(output_path), plan, segments,
+                        output_path.parent / 'segments', on_progress, duration,
+                        threads=1 if threads else None, nice=nice
+                    )
+                else:
+                    run_with_progress(ffmpeg.compile(stream, overwrite_output=True), on_progress, duration, nice=nice)
+            except FFmpegError as e:
+                raise Exception(f"Error de FFmpeg: {str(e)[-300:]}")
             
             if not output_path.exists():
                 raise Exception("No se pudo crear el archivo convertido")
@@ -729,21 +1087,113 @@ class DownloaderService:
             # Generar nombre de archivo
             filename = output_path.name
             
-            conversion_progress[convert_id].update({
-                'status': 'completed',
-                'percent': 100,
-                'message': 'Conversión completada',
-                'filename': filename
-            })
+            conversion_jobs.update(
+                convert_id,
+                status='completed',
+                percent=100,
+                message='Conversión completada',
+                filename=filename
+            )
             
             print(f"[CONVERT] Conversión completada: {filename}")
             return output_path, filename
             
         except Exception as e:
-            conversion_progress[convert_id].update({
-                'status': 'error',
-                'percent': 0,
-                'error': str(e)
-            })
+            conversion_jobs.update(
+                convert_id,
+                status='error',
+                percent=0,
+                error=str(e)
+            )
+            raise
+    
+    def convert_renditions(self, file_path: str, job_id: str, profiles: List[Dict], store: JobStore,
+                           threads: Optional[int] = None, nice: int = 0,
+                           track_parent: bool = False, name_stem: Optional[str] = None) -> List[Tuple[str, Path, str]]:
+        """
+        Genera varias salidas de un archivo con una sola pasada de ffmpeg.
+        
+        El origen se decodifica una vez y ``split``/``asplit`` reparten los
+        frames entre los codificadores de cada salida. Cada salida tiene su
+        propio trabajo en ``store`` (``<job_id>-1``, ``<job_id>-2``...) con su
+        progreso, y su archivo se escribe en el scratch de ese trabajo.
+        
+        Args:
+            file_path: Archivo de origen
+            job_id: Trabajo que pidió las salidas
+            profiles: Perfiles de salida (``format``, ``quality``, ``audio_quality``)
+            store: Almacén donde están los trabajos de las salidas
+            threads: Núcleos asignados (se reparten entre los codificadores)
+            nice: Niceness del proceso ffmpeg
+            track_parent: Reflejar también el progreso en el trabajo ``job_id``
+            name_stem: Nombre base de las salidas (por defecto, el del origen)
+            
+        Returns:
+            List[Tuple[str, Path, str]]: ID, ruta y nombre de cada salida
+        """
+        import ffmpeg
+        
+        input_path = Path(file_path)
+        name_stem = name_stem or input_path.stem
+        output_ids = [rendition_id(job_id, i) for i in range(len(profiles))]
+        tracked = output_ids + ([job_id] if track_parent else [])
+        
+        try:
+            if not input_path.exists():
+                raise Exception("Archivo no encontrado")
+            try:
+                probe = ffmpeg.probe(str(input_path))
+            except ffmpeg.Error:
+                # Sin probe no se sabe qué streams copiar ni a qué altura escalar
+                raise Exception("No se pudo analizar el archivo de entrada")
+            duration = float(probe['format'].get('duration') or 0) or None
+            renditions = plan_renditions(probe, profiles)
+            
+            output_paths = []
+            for output_id, rendition in zip(output_ids, renditions):
+                output_path = job_index.create(output_id) / f"{name_stem}_{rendition['label']}.{rendition['ext']}"
+                if output_path.exists():
+                    output_path.unlink()
+                output_paths.append(output_path)
+            
+            labels = ', '.join(rendition['label'] for rendition in renditions)
+            print(f"[RENDITIONS] {input_path.name} -> {labels} (una decodificación)")
+            for job in tracked:
+                store.update(job, status='converting', percent=5, message=f"Generando salidas ({labels})...")
+            
+            def on_progress(progress: Dict):
+                fields = {
+                    'out_time': progress['out_time'],
+                    'encode_speed': progress['speed'],
+                    'fps': progress['fps'],
+                    'eta': progress['eta'],
+                }
+                if progress['percent'] is not None:
+                    fields['percent'] = min(99, 5 + int(progress['percent'] * 0.95))
+                    done = f"{fields['percent']}%"
+                else:
+                    done = f"{progress['out_time']:.0f}s"
+                for job in tracked:
+                    label = renditions[output_ids.index(job)]['label'] if job in output_ids else labels
+                    store.update(job, status='converting', message=f"Generando {label}... {done}", **fields)
+            
+            stream = renditions_output(str(input_path), renditions, [str(path) for path in output_paths], threads=threads)
+            try:
+                run_with_progress(ffmpeg.compile(stream, overwrite_output=True), on_progress, duration, nice=nice)
+            except FFmpegError as e:
+                raise Exception(f"Error de FFmpeg: {str(e)[-300:]}")
+            
+            results = []
+            for output_id, output_path in zip(output_ids, output_paths):
+                if not output_path.exists():
+                    raise Exception(f"No se pudo crear {output_path.name}")
+                results.append((output_id, output_path, output_path.name))
+            for output_id, _, filename in results:
+                store.update(output_id, status='completed', percent=100, message='Salida completada', filename=filename)
+            print(f"[RENDITIONS] Salidas completadas: {len(results)}")
+            return results
+        
+        except Exception as e:
+            for output_id in output_ids:
+                store.update(output_id, status='error', percent=0, error=str(e))
             raise
-
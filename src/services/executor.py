@@ -0,0 +1,46 @@
+"""Ejecutor acotado para llamadas bloqueantes desde endpoints async"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+class BlockingExecutor:
+    """
+    Ejecuta funciones bloqueantes en un pool de hilos propio y acotado.
+
+    Cada llamada tiene un plazo; si se supera, la tarea se cancela si aún no
+    había empezado y, si ya estaba en marcha, se invoca ``on_timeout`` para
+    que el trabajo pueda abortarse de forma cooperativa.
+    """
+
+    def __init__(self, max_workers: int, name: str):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    async def run(
+        self,
+        func: Callable,
+        *args,
+        timeout: Optional[float] = None,
+        on_timeout: Optional[Callable[[], None]] = None,
+        **kwargs,
+    ):
+        """
+        Ejecuta ``func(*args, **kwargs)`` sin bloquear el event loop.
+
+        Raises:
+            asyncio.TimeoutError: Si la llamada supera ``timeout`` segundos
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._pool, functools.partial(func, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            if on_timeout:
+                on_timeout()
+            raise
+
+    def shutdown(self):
+        """Detiene el pool sin esperar a las tareas en curso"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
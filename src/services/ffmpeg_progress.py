@@ -0,0 +1,186 @@
+"""Ejecución de ffmpeg con progreso real (-progress) y detección de bloqueos"""
+import collections
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.config import FFMPEG_STALL_TIMEOUT
+
+# Líneas de stderr que se conservan para el mensaje de error
+STDERR_TAIL_LINES = 20
+# Segundos entre comprobaciones de bloqueo y cancelación
+WATCHDOG_INTERVAL = 0.5
+
+
+class FFmpegError(Exception):
+    """ffmpeg terminó con error; el mensaje lleva el final de su stderr"""
+
+
+class FFmpegStalledError(FFmpegError):
+    """ffmpeg dejó de avanzar durante más de ``stall_timeout`` y se terminó"""
+
+
+class FFmpegCancelledError(FFmpegError):
+    """ffmpeg se terminó porque se pidió cancelar"""
+
+
+def _number(value: Optional[str]) -> Optional[float]:
+    """Valor numérico de un campo de -progress ('N/A' y vacíos son None)"""
+    if value is None:
+        return None
+    try:
+        return float(value.rstrip('x'))
+    except ValueError:
+        return None
+
+
+class FFmpegProgress:
+    """
+    Intérprete de la salida de ``-progress``.
+
+    ffmpeg escribe bloques ``clave=valor`` terminados en ``progress=continue``
+    (o ``progress=end`` al acabar). Cada bloque completo produce una foto
+    con el tiempo de salida codificado, la velocidad respecto a tiempo real,
+    los fps y, si se conoce la duración, el porcentaje y el tiempo restante.
+    """
+
+    def __init__(self, duration: Optional[float] = None):
+        self.duration = duration if duration and duration > 0 else None
+        self._block: Dict[str, str] = {}
+        self.out_time: float = 0.0
+        self.last: Dict = {}
+
+    def feed(self, line: str) -> Optional[Dict]:
+        """
+        Procesa una línea de ``-progress``.
+
+        Returns:
+            Dict: Foto del progreso si la línea cierra un bloque, None si no
+        """
+        key, sep, value = line.strip().partition('=')
+        if not sep:
+            return None
+        if key != 'progress':
+            self._block[key] = value.strip()
+            return None
+
+        block, self._block = self._block, {}
+        # out_time_us es la clave documentada; out_time_ms también va en µs
+        out_time_us = _number(block.get('out_time_us')) or _number(block.get('out_time_ms'))
+        if out_time_us is not None and out_time_us >= 0:
+            self.out_time = out_time_us / 1_000_000
+        speed = _number(block.get('speed'))
+        snapshot = {
+            'out_time': round(self.out_time, 2),
+            'speed': speed,
+            'fps': _number(block.get('fps')),
+            'frame': int(_number(block.get('frame')) or 0),
+            'total_size': int(_number(block.get('total_size')) or 0),
+            'percent': None,
+            'eta': None,
+            'done': value.strip() == 'end',
+        }
+        if self.duration:
+            snapshot['percent'] = min(100.0, self.out_time / self.duration * 100)
+            if speed:
+                snapshot['eta'] = max(0, int((self.duration - self.out_time) / speed))
+        self.last = snapshot
+        return snapshot
+
+
+def run_with_progress(
+    args: list,
+    on_progress: Callable[[Dict], None],
+    duration: Optional[float] = None,
+    stall_timeout: float = FFMPEG_STALL_TIMEOUT,
+    cancel: Optional[threading.Event] = None,
+    nice: int = 0,
+) -> Dict:
+    """
+    Ejecuta ffmpeg leyendo su progreso por una tubería.
+
+    Si durante ``stall_timeout`` segundos no avanza ni el tiempo de salida
+    ni los bytes escritos, el proceso se termina y se lanza
+    ``FFmpegStalledError``.
+
+    Args:
+        args: Línea de comandos de ffmpeg (p. ej. de ``ffmpeg.compile``)
+        on_progress: Recibe cada foto del progreso (ver ``FFmpegProgress``)
+        duration: Duración de la entrada en segundos, si se conoce
+        stall_timeout: Segundos sin avance antes de abortar
+        cancel: Si se activa, ffmpeg se termina y se lanza ``FFmpegCancelledError``
+        nice: Niceness del proceso (0 = la del servidor)
+
+    Returns:
+        Dict: Última foto del progreso
+    """
+    args = [args[0], '-progress', 'pipe:1', '-nostats'] + list(args[1:])
+    popen_kwargs = {}
+    if nice > 0 and os.name == 'nt':
+        popen_kwargs['creationflags'] = subprocess.BELOW_NORMAL_PRIORITY_CLASS
+    process = subprocess.Popen(
+        args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        text=True, errors='replace', **popen_kwargs,
+    )
+    if nice > 0 and hasattr(os, 'setpriority'):
+        try:
+            os.setpriority(os.PRIO_PROCESS, process.pid, nice)
+        except OSError:
+            pass
+
+    stderr_tail = collections.deque(maxlen=STDERR_TAIL_LINES)
+
+    def drain_stderr():
+        for line in process.stderr:
+            stderr_tail.append(line.rstrip())
+
+    stderr_thread = threading.Thread(target=drain_stderr, daemon=True)
+    stderr_thread.start()
+
+    progress = FFmpegProgress(duration)
+    last_advance = [time.monotonic(), (-1.0, -1)]
+    stalled = threading.Event()
+    finished = threading.Event()
+
+    def watchdog():
+        while not finished.wait(WATCHDOG_INTERVAL):
+            if cancel is not None and cancel.is_set():
+                process.kill()
+                return
+            if time.monotonic() - last_advance[0] > stall_timeout:
+                stalled.set()
+                process.kill()
+                return
+
+    watchdog_thread = threading.Thread(target=watchdog, daemon=True)
+    watchdog_thread.start()
+
+    try:
+        for line in process.stdout:
+            snapshot = progress.feed(line)
+            if snapshot is None:
+                continue
+            position = (snapshot['out_time'], snapshot['total_size'])
+            if position != last_advance[1]:
+                last_advance[0], last_advance[1] = time.monotonic(), position
+            on_progress(snapshot)
+        returncode = process.wait()
+    finally:
+        finished.set()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        stderr_thread.join(timeout=5)
+
+    if returncode != 0 and cancel is not None and cancel.is_set():
+        raise FFmpegCancelledError("ffmpeg cancelado")
+    if stalled.is_set():
+        raise FFmpegStalledError(f"ffmpeg sin avanzar durante {stall_timeout:g}s (en {progress.out_time:.1f}s)")
+    if returncode != 0:
+        raise FFmpegError('\n'.join(stderr_tail) or f"ffmpeg terminó con código {returncode}")
+    return progress.last
@@ -0,0 +1,160 @@
+"""Reparto global y adaptativo de los hilos de descarga de fragmentos (HLS/DASH)"""
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.config import (
+    FRAGMENT_WORKERS_TOTAL, FRAGMENT_CONCURRENCY, DEFAULT_FRAGMENT_CONCURRENCY,
+    FRAGMENT_CONCURRENCY_MAX, FRAGMENT_ADAPT_WINDOW, FRAGMENT_BACKOFF_COOLDOWN
+)
+
+
+class FragmentLease:
+    """
+    Concurrencia de fragmentos de un trabajo.
+
+    ``limit`` sube de uno en uno mientras el rendimiento (bytes/s medidos en
+    ventanas de ``FRAGMENT_ADAPT_WINDOW``) siga creciendo, y se reduce a la
+    mitad cuando el servidor responde 403 o 429. Los rechazos que llegan
+    juntos (una ráfaga de fragmentos en vuelo) cuentan como un solo recorte,
+    y tras un recorte no vuelve a subir hasta pasado
+    ``FRAGMENT_BACKOFF_COOLDOWN``.
+    """
+
+    def __init__(self, budget: "FragmentBudget", host: str, limit: int, max_limit: int):
+        self.budget = budget
+        self.host = host
+        self.limit = limit
+        self.max_limit = max_limit
+        self.in_use = 0
+        self.fragments = 0
+        self.throttled = 0
+        self._best_rate = 0.0
+        self._window_started = time.monotonic()
+        self._window_bytes = 0
+        self._hold_until = 0.0
+        self._last_cut = float('-inf')
+
+    @contextmanager
+    def slot(self):
+        """Espera un hueco para descargar un fragmento"""
+        self.budget._acquire(self)
+        try:
+            yield
+        finally:
+            self.budget._release(self)
+
+    def record_fragment(self, size: int):
+        """Registra un fragmento descargado y ajusta ``limit`` al cerrar cada ventana"""
+        with self.budget._cond:
+            self.fragments += 1
+            self._window_bytes += size
+            now = time.monotonic()
+            elapsed = now - self._window_started
+            if elapsed < FRAGMENT_ADAPT_WINDOW:
+                return
+            rate = self._window_bytes / elapsed
+            self._window_started, self._window_bytes = now, 0
+            if now >= self._hold_until and rate > self._best_rate * 1.1 and self.limit < self.max_limit:
+                # Aumento aditivo mientras más conexiones den más rendimiento
+                self._best_rate = rate
+                self.limit += 1
+                self.budget._cond.notify_all()
+
+    def record_throttle(self):
+        """El servidor rechazó un fragmento (403/429): recorte multiplicativo"""
+        with self.budget._cond:
+            self.throttled += 1
+            now = time.monotonic()
+            self._hold_until = now + FRAGMENT_BACKOFF_COOLDOWN
+            if now - self._last_cut < FRAGMENT_ADAPT_WINDOW:
+                return
+            self._last_cut = now
+            self.limit = max(1, self.limit // 2)
+            self._best_rate = 0.0
+
+    def close(self):
+        self.budget._close(self)
+
+
+class FragmentBudget:
+    """
+    Hilos de fragmentos compartidos por todas las descargas.
+
+    yt-dlp crea su propio pool de hilos por archivo; aquí se limita cuántos
+    de esos hilos descargan a la vez. Cada trabajo recibe una parte justa
+    del total (``total // trabajos activos``) y, dentro de ella, la
+    concurrencia que su adaptación permita. La concurrencia alcanzada por
+    cada plataforma se recuerda como punto de partida del siguiente trabajo.
+    """
+
+    def __init__(
+        self,
+        total: int = FRAGMENT_WORKERS_TOTAL,
+        host_limits: Optional[Dict[str, int]] = None,
+        default_limit: int = DEFAULT_FRAGMENT_CONCURRENCY,
+        max_limit: int = FRAGMENT_CONCURRENCY_MAX,
+    ):
+        self.total = total
+        self.host_limits = dict(FRAGMENT_CONCURRENCY if host_limits is None else host_limits)
+        self.default_limit = default_limit
+        self.max_limit = max_limit
+        self._cond = threading.Condition()
+        self._leases: list = []
+        self._in_use = 0
+        self._learned: Dict[str, int] = {}
+
+    def lease(self, host: str) -> FragmentLease:
+        """Abre la cuota de fragmentos de un trabajo"""
+        with self._cond:
+            start = self._learned.get(host, self.host_limits.get(host, self.default_limit))
+            lease = FragmentLease(self, host, max(1, min(start, self.max_limit)), self.max_limit)
+            self._leases.append(lease)
+            return lease
+
+    def _close(self, lease: FragmentLease):
+        with self._cond:
+            if lease in self._leases:
+                self._leases.remove(lease)
+                self._learned[lease.host] = lease.limit
+                self._cond.notify_all()
+
+    def _share(self) -> int:
+        return max(1, self.total // max(1, len(self._leases)))
+
+    def _acquire(self, lease: FragmentLease):
+        with self._cond:
+            while lease.in_use >= min(lease.limit, self._share()) or self._in_use >= self.total:
+                self._cond.wait()
+            lease.in_use += 1
+            self._in_use += 1
+
+    def _release(self, lease: FragmentLease):
+        with self._cond:
+            lease.in_use -= 1
+            self._in_use -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> Dict:
+        """Uso actual del presupuesto y concurrencia de cada trabajo"""
+        with self._cond:
+            return {
+                'total': self.total,
+                'in_use': self._in_use,
+                'share': self._share(),
+                'jobs': [
+                    {
+                        'host': lease.host,
+                        'limit': lease.limit,
+                        'in_use': lease.in_use,
+                        'fragments': lease.fragments,
+                        'throttled': lease.throttled,
+                    }
+                    for lease in self._leases
+                ],
+                'learned': dict(self._learned),
+            }
@@ -0,0 +1,166 @@
+"""Límite de peticiones HTTP por plataforma compartido por todos los trabajos"""
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.config import (
+    HOST_REQUEST_RATES, DEFAULT_HOST_REQUEST_RATE, HOST_INFLIGHT_INITIAL,
+    HOST_INFLIGHT_MAX, HOST_THROTTLE_COOLDOWN, HOST_RETRY_AFTER_MAX
+)
+
+# Eventos de throttling que se conservan por plataforma para /hosts/limits
+THROTTLE_EVENTS_KEPT = 20
+
+
+class _HostState:
+    """Cubo de tokens, ventana de concurrencia y contadores de una plataforma"""
+
+    def __init__(self, rate: float, burst: int, inflight_limit: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.refilled = time.monotonic()
+        self.limit = inflight_limit
+        self.inflight = 0
+        self.requests = 0
+        self.throttled = 0
+        self.waited = 0.0
+        self.paused_until = 0.0
+        self.last_cut = float('-inf')
+        self.events = deque(maxlen=THROTTLE_EVENTS_KEPT)
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate)
+        self.refilled = now
+
+    def wait_time(self, now: float) -> float:
+        """Segundos hasta poder lanzar otra petición (0 = ya)"""
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        return 0.0
+
+
+class HostLimiter:
+    """
+    Limitador de peticiones por plataforma (clave de ``get_host_key``).
+
+    Cada plataforma tiene un cubo de tokens (peticiones por segundo con
+    ráfaga) y un límite de peticiones en vuelo que se ajusta con AIMD: crece
+    ``1/límite`` por cada petición correcta y se reduce a la mitad con cada
+    403/429 (como mucho una vez cada ``HOST_THROTTLE_COOLDOWN``). Un 429 con
+    ``Retry-After`` además detiene la plataforma ese tiempo.
+
+    Una petición está "en vuelo" hasta que llegan las cabeceras de la
+    respuesta, que es cuando el servidor decide si la rechaza; la lectura
+    del cuerpo ya la acotan el planificador y los presupuestos de conexiones.
+    """
+
+    def __init__(
+        self,
+        rates: Optional[Dict[str, Tuple[float, int]]] = None,
+        default_rate: Tuple[float, int] = DEFAULT_HOST_REQUEST_RATE,
+        inflight_initial: int = HOST_INFLIGHT_INITIAL,
+        inflight_max: int = HOST_INFLIGHT_MAX,
+    ):
+        self.rates = dict(HOST_REQUEST_RATES if rates is None else rates)
+        self.default_rate = default_rate
+        self.inflight_initial = inflight_initial
+        self.inflight_max = inflight_max
+        self._cond = threading.Condition()
+        self._hosts: Dict[str, _HostState] = {}
+
+    def _state(self, key: str) -> _HostState:
+        state = self._hosts.get(key)
+        if state is None:
+            rate, burst = self.rates.get(key, self.default_rate)
+            state = self._hosts[key] = _HostState(rate, burst, self.inflight_initial)
+        return state
+
+    @contextmanager
+    def request(self, key: str):
+        """
+        Espera turno para una petición a ``key`` y la cuenta como en vuelo.
+
+        Si el bloque termina sin excepción la petición cuenta como correcta
+        para el aumento aditivo; los rechazos se notifican con ``throttled``.
+        """
+        with self._cond:
+            state = self._state(key)
+            started = time.monotonic()
+            while True:
+                now = time.monotonic()
+                state.refill(now)
+                wait = state.wait_time(now)
+                if wait <= 0 and state.inflight < int(state.limit):
+                    break
+                self._cond.wait(wait if wait > 0 else None)
+            state.tokens -= 1
+            state.inflight += 1
+            state.requests += 1
+            state.waited += now - started
+        success = False
+        try:
+            yield
+            success = True
+        finally:
+            with self._cond:
+                state.inflight -= 1
+                if success:
+                    state.limit = min(self.inflight_max, state.limit + 1 / state.limit)
+                self._cond.notify_all()
+
+    def throttled(self, key: str, status: int, retry_after: Optional[str] = None):
+        """
+        Registra un 403/429 de ``key``: recorta la concurrencia y, si el
+        servidor indicó ``Retry-After`` (en segundos), pausa la plataforma.
+        """
+        with self._cond:
+            state = self._state(key)
+            now = time.monotonic()
+            state.throttled += 1
+            pause = 0.0
+            if retry_after:
+                try:
+                    pause = min(float(retry_after), HOST_RETRY_AFTER_MAX)
+                except ValueError:
+                    pause = 0.0
+            state.paused_until = max(state.paused_until, now + pause)
+            if now - state.last_cut >= HOST_THROTTLE_COOLDOWN:
+                state.last_cut = now
+                state.limit = max(1.0, state.limit / 2)
+            state.events.append({
+                'at': time.time(),
+                'status': status,
+                'limit': int(state.limit),
+                'pause': pause,
+            })
+            print(f"[LIMITER] {key}: {status}, límite en vuelo {int(state.limit)}"
+                  + (f", pausa {pause:.0f}s" if pause else ""))
+
+    def stats(self) -> Dict:
+        """Límites actuales y eventos de throttling por plataforma"""
+        with self._cond:
+            now = time.monotonic()
+            hosts = {}
+            for key, state in self._hosts.items():
+                state.refill(now)
+                hosts[key] = {
+                    'rate': state.rate,
+                    'burst': state.burst,
+                    'tokens': round(state.tokens, 2),
+                    'inflight': state.inflight,
+                    'inflight_limit': int(state.limit),
+                    'requests': state.requests,
+                    'throttled': state.throttled,
+                    'waited_seconds': round(state.waited, 2),
+                    'paused_for': round(max(0.0, state.paused_until - now), 2),
+                    'events': list(state.events),
+                }
+            return {'hosts': hosts}
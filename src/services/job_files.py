@@ -0,0 +1,356 @@
+"""Carpeta propia por trabajo e índice de los archivos que produce"""
+import errno
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.config import JOB_FOLDER, JOB_FILES_INDEX_PATH, SCRATCH_FOLDER
+
+# Archivos de trabajo de yt-dlp y de la descarga por rangos
+PARTIAL_SUFFIXES = ('.part', '.ytdl', '.segments', '.tmp', '.publishing')
+
+# Bloque de copia (y de hash) al publicar
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def copy_hashed(source: Path, destination: Path) -> str:
+    """
+    Copia un archivo calculando su hash SHA-256 en la misma pasada.
+
+    Returns:
+        str: Hash hexadecimal del contenido
+    """
+    digest = hashlib.sha256()
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        while True:
+            chunk = src.read(COPY_BUFFER_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            dst.write(chunk)
+        dst.flush()
+        os.fsync(dst.fileno())
+    return digest.hexdigest()
+
+
+class JobFileIndex:
+    """
+    Cada trabajo tiene dos carpetas propias: una de trabajo en el volumen
+    scratch (``SCRATCH_FOLDER/<id>``), donde se descarga, mezcla y convierte,
+    y otra publicada (``JOB_FOLDER/<id>``, servida en ``/content``) a la que
+    solo llega el archivo terminado con ``publish``. Los archivos publicados
+    quedan anotados en un índice en memoria, junto con el hash de su
+    contenido. Cada cambio se añade como una línea al diario en disco (coste
+    constante, fuera del cerrojo del índice); al arrancar se reproduce el
+    diario y se reescribe compactado con solo los trabajos vivos.
+
+    El mismo video llega por URLs distintas (youtu.be, enlaces ``vm.`` de
+    TikTok, resubidas); si al publicar se conoce el hash (calculado al
+    escribir o al copiar) y coincide con el de un archivo ya publicado, el
+    nuevo se sustituye por un enlace duro al existente y solo ocupa disco
+    una vez.
+
+    Encontrar la salida de un trabajo es una consulta al índice y limpiar
+    sus parciales solo recorre su carpeta, nunca la carpeta de descargas
+    compartida, que con miles de archivos hace que cada ``glob`` sea lento
+    y que "el .mp4 más reciente" pueda ser de otro trabajo.
+    """
+
+    def __init__(self, folder: Path = JOB_FOLDER, index_path: Path = JOB_FILES_INDEX_PATH, scratch_folder: Path = SCRATCH_FOLDER):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.scratch_folder = Path(scratch_folder)
+        self.scratch_folder.mkdir(parents=True, exist_ok=True)
+        self._index_path = Path(index_path)
+        self._lock = threading.Lock()
+        # Serializa las líneas del diario en el orden en que cambió el índice
+        self._log_lock = threading.Lock()
+        self._jobs: Dict[str, Dict] = {}
+        self._content: Dict[str, List[str]] = {}  # hash -> rutas publicadas
+        self.published = 0
+        self.published_by_copy = 0
+        self.deduplicated = 0
+        self.deduplicated_bytes = 0
+        self._load()
+
+    def _replay(self) -> Dict[str, Dict]:
+        """Estado del índice según el diario (o el JSON de versiones anteriores)"""
+        jobs: Dict[str, Dict] = {}
+        try:
+            with open(self._index_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # última línea cortada por un cierre brusco
+                    job_id, op = record.get('job'), record.get('op')
+                    if op == 'create':
+                        jobs.setdefault(job_id, {'files': [], 'created': record.get('created', 0)})
+                    elif op == 'file':
+                        entry = jobs.setdefault(job_id, {'files': [], 'created': 0})
+                        if record['path'] not in entry['files']:
+                            entry['files'].append(record['path'])
+                        if record.get('hash'):
+                            entry.setdefault('content', {})[record['path']] = [record['hash'], record['size']]
+                    elif op == 'discard':
+                        jobs.pop(job_id, None)
+            return jobs
+        except FileNotFoundError:
+            pass
+        try:
+            return json.loads(self._index_path.with_suffix('.json').read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return jobs
+
+    def _load(self):
+        for job_id, entry in self._replay().items():
+            if self.directory(job_id).is_dir() or self.scratch(job_id).is_dir():
+                self._jobs[job_id] = entry
+                for name, (digest, _) in entry.get('content', {}).items():
+                    self._content.setdefault(digest, []).append(name)
+        self._compact()
+
+    def _compact(self):
+        """Reescribe el diario con una línea por trabajo y archivo vivos"""
+        self._index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for job_id, entry in self._jobs.items():
+                f.write(json.dumps({'op': 'create', 'job': job_id, 'created': entry.get('created', 0)}) + '\n')
+                content = entry.get('content', {})
+                for name in entry['files']:
+                    digest, size = content.get(name, (None, None))
+                    f.write(json.dumps({'op': 'file', 'job': job_id, 'path': name, 'hash': digest, 'size': size}) + '\n')
+        os.replace(tmp_path, self._index_path)
+        try:
+            self._index_path.with_suffix('.json').unlink()
+        except OSError:
+            pass
+
+    def _append(self, record: Dict):
+        """
+        Añade una línea al diario. Se llama con ``_lock`` tomado: toma
+        ``_log_lock`` y suelta ``_lock`` antes de escribir, así las líneas
+        quedan en el orden de los cambios pero la escritura no bloquea el
+        índice.
+        """
+        self._log_lock.acquire()
+        self._lock.release()
+        try:
+            with open(self._index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+        except OSError as e:
+            print(f"[JOBS] No se pudo escribir el diario de archivos: {e}")
+        finally:
+            self._log_lock.release()
+            self._lock.acquire()
+
+    def directory(self, job_id: str) -> Path:
+        """Carpeta publicada del trabajo (sin comprobar que exista)"""
+        return self.folder / job_id
+
+    def scratch(self, job_id: str) -> Path:
+        """Carpeta de trabajo en el volumen scratch (sin comprobar que exista)"""
+        return self.scratch_folder / job_id
+
+    def create(self, job_id: str) -> Path:
+        """
+        Crea (o reutiliza, al reanudar) la carpeta scratch de un trabajo.
+
+        Returns:
+            Path: Carpeta donde el trabajo debe escribir
+        """
+        directory = self.scratch(job_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            if job_id not in self._jobs:
+                created = time.time()
+                self._jobs[job_id] = {'files': [], 'created': created}
+                self._append({'op': 'create', 'job': job_id, 'created': created})
+        return directory
+
+    def publish(self, job_id: str, file_path: Path, digest: Optional[str] = None) -> Path:
+        """
+        Mueve un archivo terminado a la carpeta publicada del trabajo.
+
+        En el mismo sistema de archivos es un ``rename`` atómico; entre
+        volúmenes distintos se copia a un nombre temporal, se sincroniza y se
+        renombra, así que ``/content`` nunca ve un archivo a medias. El hash
+        del contenido se calcula durante esa copia, o lo aporta quien
+        escribió el archivo (``digest``); si basta con renombrar y no hay
+        hash, el archivo no se deduplica: releerlo entero solo para
+        hacerlo costaría tanto como escribirlo.
+
+        Args:
+            digest: SHA-256 del contenido, si quien lo escribió ya lo calculó
+
+        Returns:
+            Path: Ruta publicada (anotada en el índice)
+        """
+        source = Path(file_path)
+        destination_dir = self.directory(job_id)
+        destination_dir.mkdir(parents=True, exist_ok=True)
+        destination = destination_dir / source.name
+        if source != destination:
+            try:
+                os.replace(source, destination)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                tmp_path = destination_dir / f'.{source.name}.publishing'
+                digest = copy_hashed(source, tmp_path)
+                shutil.copystat(source, tmp_path)
+                os.replace(tmp_path, destination)
+                source.unlink()
+                self.published_by_copy += 1
+        self.published += 1
+        if digest is None:
+            self.add(job_id, destination)
+        else:
+            self._deduplicate(job_id, destination, digest)
+        return destination
+
+    def _find_duplicate(self, digest: str, size: int, destination: Path) -> Optional[str]:
+        """Ruta publicada con el mismo contenido que ``destination`` (None si no hay)"""
+        for name in self._content.get(digest, ()):
+            try:
+                stat = os.stat(name)
+                if stat.st_size == size and not os.path.samefile(name, destination):
+                    return name
+            except OSError:
+                continue
+        return None
+
+    def _deduplicate(self, job_id: str, destination: Path, digest: str):
+        """Anota el archivo con su hash y lo enlaza a un duplicado si ya existe"""
+        size = destination.stat().st_size
+        with self._lock:
+            duplicate = self._find_duplicate(digest, size, destination)
+            if duplicate is not None:
+                tmp_path = destination.parent / f'.{destination.name}.publishing'
+                try:
+                    os.link(duplicate, tmp_path)
+                    os.replace(tmp_path, destination)
+                except OSError as e:
+                    # Sin enlaces duros (otro volumen, límite de enlaces): se queda la copia
+                    print(f"[DEDUP] No se pudo enlazar {destination.name}: {e}")
+                    try:
+                        tmp_path.unlink()
+                    except OSError:
+                        pass
+                else:
+                    self.deduplicated += 1
+                    self.deduplicated_bytes += size
+                    print(f"[DEDUP] {destination.name} enlazado a un archivo idéntico ({size / 1024 ** 2:.1f} MB ahorrados)")
+            entry = self._jobs.setdefault(job_id, {'files': [], 'created': time.time()})
+            name = str(destination)
+            if name not in entry['files']:
+                entry['files'].append(name)
+            entry.setdefault('content', {})[name] = [digest, size]
+            paths = self._content.setdefault(digest, [])
+            if name not in paths:
+                paths.append(name)
+            self._append({'op': 'file', 'job': job_id, 'path': name, 'hash': digest, 'size': size})
+
+    def add(self, job_id: str, file_path: Path):
+        """Anota un archivo de salida del trabajo"""
+        with self._lock:
+            entry = self._jobs.setdefault(job_id, {'files': [], 'created': time.time()})
+            name = str(file_path)
+            if name not in entry['files']:
+                entry['files'].append(name)
+                self._append({'op': 'file', 'job': job_id, 'path': name, 'hash': None, 'size': None})
+
+    def files(self, job_id: str) -> List[Path]:
+        """Archivos de salida anotados que siguen existiendo"""
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            names = list(entry['files']) if entry else []
+        return [Path(name) for name in names if os.path.exists(name)]
+
+    def scan(self, job_id: str, include_partial: bool = False) -> List[Path]:
+        """
+        Archivos presentes en la carpeta scratch del trabajo.
+
+        Solo se usa cuando el índice no sabe la salida (p. ej. herramientas
+        externas que eligen su propio nombre); su coste es el número de
+        archivos del trabajo, no el de la carpeta de descargas.
+        """
+        try:
+            entries = list(os.scandir(self.scratch(job_id)))
+        except FileNotFoundError:
+            return []
+        return [
+            Path(entry.path) for entry in entries
+            if entry.is_file() and (include_partial or not entry.name.endswith(PARTIAL_SUFFIXES))
+        ]
+
+    def clear(self, job_id: str):
+        """Borra todo lo que haya en la carpeta scratch del trabajo"""
+        for file_path in self.scan(job_id, include_partial=True):
+            try:
+                file_path.unlink()
+            except OSError:
+                pass
+
+    def drop_scratch(self, job_id: str):
+        """Elimina la carpeta scratch de un trabajo que ya no la necesita"""
+        shutil.rmtree(self.scratch(job_id), ignore_errors=True)
+
+    def discard(self, job_id: str):
+        """Elimina las carpetas del trabajo y su entrada del índice"""
+        shutil.rmtree(self.directory(job_id), ignore_errors=True)
+        self.drop_scratch(job_id)
+        with self._lock:
+            entry = self._jobs.pop(job_id, None)
+            if entry is not None:
+                for name, (digest, _) in entry.get('content', {}).items():
+                    paths = self._content.get(digest, [])
+                    if name in paths:
+                        paths.remove(name)
+                    if not paths:
+                        self._content.pop(digest, None)
+                self._append({'op': 'discard', 'job': job_id})
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'jobs': len(self._jobs),
+                'files': sum(len(entry['files']) for entry in self._jobs.values()),
+                'scratch_folder': str(self.scratch_folder),
+                'published': self.published,
+                'published_by_copy': self.published_by_copy,
+            }
+
+    def dedup_stats(self) -> Dict:
+        """
+        Ahorro de la deduplicación sobre los archivos publicados.
+
+        ``logical_bytes`` es lo que ocuparían todas las copias y
+        ``stored_bytes`` lo que ocupan los contenidos distintos; el ratio es
+        su cociente (1.0 = sin duplicados).
+        """
+        with self._lock:
+            sizes = {}
+            for entry in self._jobs.values():
+                for digest, size in entry.get('content', {}).values():
+                    sizes.setdefault(digest, [size, 0])[1] += 1
+            logical = sum(size * count for size, count in sizes.values())
+            stored = sum(size for size, _ in sizes.values())
+            return {
+                'files': sum(count for _, count in sizes.values()),
+                'unique_contents': len(sizes),
+                'logical_bytes': logical,
+                'stored_bytes': stored,
+                'bytes_saved': logical - stored,
+                'ratio': round(logical / stored, 2) if stored else 1.0,
+                'deduplicated': self.deduplicated,
+                'deduplicated_bytes': self.deduplicated_bytes,
+            }
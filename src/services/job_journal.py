@@ -0,0 +1,137 @@
+"""Diario persistente de trabajos (SQLite) para sobrevivir a reinicios"""
+import json
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.config import JOB_JOURNAL_PATH
+
+# Fases en las que el trabajo ya no se reanuda
+FINISHED_PHASES = ('completed', 'error', 'cancelled')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    request TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    phase TEXT NOT NULL,
+    partial_paths TEXT NOT NULL DEFAULT '[]',
+    downloaded_bytes INTEGER,
+    total_bytes INTEGER,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_phase ON jobs (phase);
+"""
+
+
+class JobJournal:
+    """
+    Registro durable de los trabajos y su avance.
+
+    Guarda la petición original, la fase, los archivos parciales y los bytes
+    descargados de cada trabajo. Al arrancar, los trabajos sin terminar se
+    vuelven a encolar y yt-dlp continúa desde sus archivos ``.part``.
+
+    Usa SQLite en modo WAL: las escrituras de progreso no bloquean las
+    lecturas y una transacción confirmada sobrevive a la caída del proceso.
+    """
+
+    def __init__(self, path: Path = JOB_JOURNAL_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def _query(self, sql: str, params: tuple = ()) -> Tuple[List[str], List[tuple]]:
+        """Columnas y filas de una consulta, leídas sin soltar la conexión compartida"""
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            return [c[0] for c in cursor.description], cursor.fetchall()
+
+    def record(self, job_id: str, kind: str, request: Dict, priority: int = 0):
+        """Registra un trabajo nuevo (o lo reinicia si ya existía)"""
+        now = time.time()
+        self._execute(
+            "INSERT OR REPLACE INTO jobs (job_id, kind, request, priority, phase, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+            (job_id, kind, json.dumps(request), priority, now, now)
+        )
+
+    def set_phase(self, job_id: str, phase: str):
+        self._execute(
+            "UPDATE jobs SET phase = ?, updated_at = ? WHERE job_id = ?",
+            (phase, time.time(), job_id)
+        )
+
+    def update_progress(self, job_id: str, partial_paths: Iterable[str], downloaded_bytes: int, total_bytes: Optional[int]):
+        """Guarda los archivos parciales y el desplazamiento alcanzado"""
+        self._execute(
+            "UPDATE jobs SET partial_paths = ?, downloaded_bytes = ?, total_bytes = ?, updated_at = ? "
+            "WHERE job_id = ?",
+            (json.dumps(list(partial_paths)), downloaded_bytes, total_bytes, time.time(), job_id)
+        )
+
+    def finish(self, job_id: str, phase: str, result: Optional[Dict] = None, error: Optional[str] = None):
+        """Marca un trabajo como terminado"""
+        self._execute(
+            "UPDATE jobs SET phase = ?, result = ?, error = ?, partial_paths = '[]', updated_at = ? "
+            "WHERE job_id = ?",
+            (phase, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+        )
+
+    def remove(self, job_id: str):
+        self._execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def _rows(self, where: str, params: tuple = ()) -> List[Dict]:
+        columns, results = self._query(f"SELECT * FROM jobs WHERE {where} ORDER BY created_at", params)
+        rows = []
+        for values in results:
+            row = dict(zip(columns, values))
+            row['request'] = json.loads(row['request'])
+            row['partial_paths'] = json.loads(row['partial_paths'])
+            row['result'] = json.loads(row['result']) if row['result'] else None
+            rows.append(row)
+        return rows
+
+    def unfinished(self, kind: str) -> List[Dict]:
+        """Trabajos de un tipo que quedaron en cola o a medias"""
+        placeholders = ','.join('?' * len(FINISHED_PHASES))
+        return self._rows(f"kind = ? AND phase NOT IN ({placeholders})", (kind,) + FINISHED_PHASES)
+
+    def completed(self, kind: str, since: float) -> List[Dict]:
+        """Trabajos terminados con éxito desde ``since``"""
+        return self._rows("kind = ? AND phase = 'completed' AND updated_at >= ?", (kind, since))
+
+    def prune(self, older_than: float) -> int:
+        """
+        Borra los trabajos terminados antes de ``older_than``.
+
+        Returns:
+            int: Número de trabajos borrados
+        """
+        placeholders = ','.join('?' * len(FINISHED_PHASES))
+        cursor = self._execute(
+            f"DELETE FROM jobs WHERE phase IN ({placeholders}) AND updated_at < ?",
+            FINISHED_PHASES + (older_than,)
+        )
+        return cursor.rowcount
+
+    def stats(self) -> Dict:
+        """Número de trabajos por fase"""
+        _, rows = self._query("SELECT phase, COUNT(*) FROM jobs GROUP BY phase")
+        return {'path': str(self.path), 'by_phase': dict(rows)}
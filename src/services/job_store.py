@@ -0,0 +1,258 @@
+"""Almacén de estado de trabajos (descargas y conversiones)"""
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.config import JOB_TTL, JOB_PINNED_TTL, JOB_EVICTION_INTERVAL
+
+# Estados en los que un trabajo ya no cambia
+TERMINAL_STATUSES = frozenset({'completed', 'error', 'cancelled'})
+
+
+class JobRecord:
+    """Estado compacto de un trabajo"""
+
+    # Campos que se exponen en la API de progreso
+    PUBLIC_FIELDS = (
+        'status', 'percent', 'speed', 'eta', 'downloaded_bytes', 'total_bytes',
+        'filename', 'error', 'message', 'queue_position', 'cache_hit', 'retries',
+        'fps', 'encode_speed', 'out_time', 'conversion_mode',
+    )
+
+    __slots__ = PUBLIC_FIELDS + (
+        'created_at', 'updated_at', 'finished_at', 'version',
+        'cancel_requested', 'result', 'files',
+    )
+
+    def __init__(self):
+        now = time.time()
+        self.created_at = now
+        self.cancel_requested = False
+        self.result: Optional[Dict] = None
+        self.files: tuple = ()
+        self.version = 0
+        self.finished_at: Optional[float] = None
+        self.reset(now)
+
+    def reset(self, now: float):
+        """Vuelve los campos públicos a sus valores iniciales"""
+        for field in self.PUBLIC_FIELDS:
+            setattr(self, field, None)
+        self.status = 'starting'
+        self.percent = 0
+        self.updated_at = now
+        self.finished_at = None
+
+    def to_dict(self) -> Dict:
+        """Campos públicos con valor"""
+        data = {}
+        for field in self.PUBLIC_FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                data[field] = value
+        return data
+
+
+class JobStore:
+    """
+    Almacén seguro entre hilos del estado de los trabajos.
+
+    Cada trabajo es un ``JobRecord`` con campos fijos. Las actualizaciones
+    son atómicas y los trabajos terminados se expulsan (junto con sus
+    archivos) pasado ``ttl``; si un trabajo está fijado (``is_pinned``) se
+    conserva hasta ``pinned_ttl``. ``on_evict`` recibe el ID de cada
+    trabajo expulsado (p. ej. para borrar su carpeta).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float = JOB_TTL,
+        pinned_ttl: float = JOB_PINNED_TTL,
+        is_pinned: Optional[Callable[[str], bool]] = None,
+        on_evict: Optional[Callable[[str], None]] = None,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.pinned_ttl = pinned_ttl
+        self.is_pinned = is_pinned
+        self.on_evict = on_evict
+        self._lock = threading.RLock()
+        self._jobs: Dict[str, JobRecord] = {}
+        self._janitor: Optional[threading.Thread] = None
+        self.evicted = 0
+
+    def __contains__(self, job_id: str) -> bool:
+        return job_id in self._jobs
+
+    def create(self, job_id: str, **fields):
+        """Crea un trabajo (o reinicia su progreso si ya existía)"""
+        now = time.time()
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None:
+                record = self._jobs[job_id] = JobRecord()
+            else:
+                record.reset(now)
+            self._apply(record, fields, now)
+        self._ensure_janitor()
+
+    def update(self, job_id: str, **fields) -> bool:
+        """
+        Actualiza campos de un trabajo de forma atómica.
+
+        Returns:
+            bool: False si el trabajo no existe
+        """
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None:
+                return False
+            self._apply(record, fields, time.time())
+            return True
+
+    def _apply(self, record: JobRecord, fields: Dict, now: float):
+        for field, value in fields.items():
+            if field not in JobRecord.PUBLIC_FIELDS:
+                raise AttributeError(f"Campo de trabajo desconocido: {field}")
+            setattr(record, field, value)
+        record.updated_at = now
+        record.version += 1
+        if record.status in TERMINAL_STATUSES:
+            if record.finished_at is None:
+                record.finished_at = now
+        else:
+            record.finished_at = None
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Copia del progreso público de un trabajo, o None"""
+        with self._lock:
+            record = self._jobs.get(job_id)
+            return record.to_dict() if record else None
+
+    def version(self, job_id: str) -> int:
+        """Contador de cambios de un trabajo (-1 si no existe)"""
+        record = self._jobs.get(job_id)
+        return record.version if record else -1
+
+    def set_result(self, job_id: str, result: Dict, files: Iterable[Path] = ()):
+        """
+        Guarda el resultado de un trabajo.
+
+        Args:
+            result: Datos del resultado (rutas, nombre de archivo...)
+            files: Archivos que pertenecen al trabajo y se borran al expulsarlo
+        """
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None:
+                record = self._jobs[job_id] = JobRecord()
+            record.result = dict(result)
+            record.files = tuple(str(f) for f in files)
+
+    def get_result(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            record = self._jobs.get(job_id)
+            return dict(record.result) if record and record.result else None
+
+    def remove(self, job_id: str):
+        """Olvida un trabajo sin borrar sus archivos"""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def request_cancel(self, job_id: str):
+        """Marca un trabajo para que se cancele"""
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is not None:
+                record.cancel_requested = True
+
+    def take_cancel(self, job_id: str) -> bool:
+        """Devuelve y limpia la marca de cancelación de un trabajo"""
+        record = self._jobs.get(job_id)
+        if record is None or not record.cancel_requested:
+            return False
+        with self._lock:
+            was_requested = record.cancel_requested
+            record.cancel_requested = False
+            return was_requested
+
+    def evict_expired(self, now: Optional[float] = None) -> List[str]:
+        """
+        Expulsa los trabajos terminados que superaron su tiempo de vida y
+        borra sus archivos.
+
+        Returns:
+            List[str]: IDs expulsados
+        """
+        now = time.time() if now is None else now
+        expired = []
+        with self._lock:
+            for job_id, record in list(self._jobs.items()):
+                if record.finished_at is None:
+                    continue
+                age = now - record.finished_at
+                if age < self.ttl:
+                    continue
+                if age < self.pinned_ttl and self.is_pinned and self.is_pinned(job_id):
+                    continue
+                expired.append((job_id, self._jobs.pop(job_id)))
+            self.evicted += len(expired)
+
+        for job_id, record in expired:
+            for file_path in record.files:
+                try:
+                    Path(file_path).unlink(missing_ok=True)
+                except OSError as e:
+                    print(f"[JOBS] No se pudo borrar {file_path}: {e}")
+            if self.on_evict:
+                self.on_evict(job_id)
+        return [job_id for job_id, _ in expired]
+
+    def _ensure_janitor(self):
+        if self._janitor is not None:
+            return
+        with self._lock:
+            if self._janitor is None:
+                self._janitor = threading.Thread(target=self._janitor_loop, name=f"{self.name}-janitor", daemon=True)
+                self._janitor.start()
+
+    def _janitor_loop(self):
+        while True:
+            time.sleep(JOB_EVICTION_INTERVAL)
+            try:
+                evicted = self.evict_expired()
+                if evicted:
+                    print(f"[JOBS] {len(evicted)} trabajos de {self.name} expulsados")
+            except Exception as e:
+                print(f"[JOBS] Error expulsando trabajos: {e}")
+
+    def memory_usage(self) -> int:
+        """Estimación en bytes de la memoria usada por los registros"""
+        with self._lock:
+            total = sys.getsizeof(self._jobs)
+            for job_id, record in self._jobs.items():
+                total += sys.getsizeof(job_id) + sys.getsizeof(record)
+                for field in JobRecord.__slots__:
+                    value = getattr(record, field, None)
+                    if isinstance(value, (str, dict, tuple)):
+                        total += sys.getsizeof(value)
+                        if isinstance(value, dict):
+                            total += sum(sys.getsizeof(v) for v in value.values())
+            return total
+
+    def stats(self) -> Dict:
+        """Número de trabajos por estado y memoria usada"""
+        with self._lock:
+            by_status: Dict[str, int] = {}
+            for record in self._jobs.values():
+                by_status[record.status] = by_status.get(record.status, 0) + 1
+            return {
+                'jobs': len(self._jobs),
+                'by_status': by_status,
+                'evicted': self.evicted,
+                'memory_bytes': self.memory_usage(),
+            }
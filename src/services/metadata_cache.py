@@ -0,0 +1,194 @@
+"""Caché de metadatos (info_dict de yt-dlp) para /api/scan"""
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.config import (
+    METADATA_CACHE_SIZE, METADATA_CACHE_TTL,
+    METADATA_CACHE_NEGATIVE_TTL, METADATA_CACHE_EXPIRY_MARGIN
+)
+
+
+def get_signed_url_expiry(info: Dict) -> Optional[float]:
+    """
+    Busca la caducidad más próxima de las URLs firmadas de los formatos.
+
+    YouTube (googlevideo) incluye ``expire=<timestamp>`` en la query o
+    ``/expire/<timestamp>/`` en la ruta de los manifiestos.
+
+    Returns:
+        float: Timestamp UNIX de caducidad, o None si no se conoce
+    """
+    earliest = None
+    for fmt in info.get('formats') or []:
+        for key in ('url', 'manifest_url'):
+            url = fmt.get(key)
+            if not url or 'expire' not in url:
+                continue
+            parsed = urlparse(url)
+            values = parse_qs(parsed.query).get('expire')
+            if not values:
+                segments = parsed.path.split('/')
+                if 'expire' in segments:
+                    idx = segments.index('expire')
+                    values = segments[idx + 1:idx + 2]
+            try:
+                expire = float(values[0]) if values else None
+            except ValueError:
+                expire = None
+            if expire and (earliest is None or expire < earliest):
+                earliest = expire
+    return earliest
+
+
+class CacheEntry:
+    """Entrada de la caché (resultado o error)"""
+    __slots__ = ('key', 'value', 'error', 'expires_at', 'token')
+
+    def __init__(self, key: str, value: Any, error: Optional[str], expires_at: float):
+        self.key = key
+        self.value = value
+        self.error = error
+        self.expires_at = expires_at
+        # Identificador opaco que el cliente puede devolver para reutilizar la entrada
+        self.token = secrets.token_urlsafe(12) if error is None else None
+
+
+class MetadataCache:
+    """
+    Caché LRU con caducidad por tiempo.
+
+    Las entradas positivas caducan antes que las URLs firmadas que contienen;
+    los fallos se guardan un tiempo corto (caché negativa) para no repetir
+    extracciones que sabemos que fallan.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = METADATA_CACHE_SIZE,
+        ttl: float = METADATA_CACHE_TTL,
+        negative_ttl: float = METADATA_CACHE_NEGATIVE_TTL,
+        expiry_margin: float = METADATA_CACHE_EXPIRY_MARGIN,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.expiry_margin = expiry_margin
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._tokens: Dict[str, str] = {}  # token -> clave
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Devuelve la entrada vigente para la clave, o None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= now:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if entry.error is not None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def get_by_token(self, token: str) -> Optional[CacheEntry]:
+        """
+        Devuelve la entrada vigente asociada a un token de escaneo, o None.
+
+        No cuenta en los aciertos y fallos de ``get``: la descarga que trae
+        el token no es una consulta de /api/scan.
+        """
+        now = time.time()
+        with self._lock:
+            key = self._tokens.get(token)
+            entry = self._entries.get(key) if key is not None else None
+            if entry is None or entry.token != token:
+                return None
+            if entry.expires_at <= now:
+                self._remove(key)
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None, url_expiry: Optional[float] = None) -> Optional[CacheEntry]:
+        """
+        Guarda un resultado.
+
+        Args:
+            key: Clave (URL normalizada)
+            value: Valor a guardar
+            ttl: Tiempo de vida; por defecto el configurado
+            url_expiry: Caducidad de las URLs firmadas del valor (timestamp)
+
+        Returns:
+            CacheEntry: La entrada guardada, o None si ya habría caducado
+        """
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        if url_expiry:
+            expires_at = min(expires_at, url_expiry - self.expiry_margin)
+        if expires_at <= now:
+            return None
+        entry = CacheEntry(key, value, None, expires_at)
+        self._store(key, entry)
+        return entry
+
+    def put_error(self, key: str, error: str):
+        """Guarda un fallo durante el tiempo de la caché negativa"""
+        if self.negative_ttl <= 0:
+            return
+        self._store(key, CacheEntry(key, None, error, time.time() + self.negative_ttl))
+
+    def invalidate(self, key: str):
+        """Elimina una entrada"""
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry.token:
+            self._tokens.pop(entry.token, None)
+
+    def _store(self, key: str, entry: CacheEntry):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            if entry.token:
+                self._tokens[entry.token] = key
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        """Contadores de la caché"""
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': round((self.hits + self.negative_hits) / lookups, 3) if lookups else 0.0,
+            }
@@ -0,0 +1,303 @@
+"""YoutubeDL con descargas en paralelo (streams y rangos de bytes)"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+import yt_dlp
+from yt_dlp.downloader import get_suitable_downloader
+from yt_dlp.downloader.fragment import FragmentFD
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.networking import Request
+from yt_dlp.networking.exceptions import HTTPError
+from yt_dlp.utils import DownloadCancelled, determine_protocol, parse_http_range
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.config import PARALLEL_STREAM_DOWNLOADS, SEGMENTED_DOWNLOADS, SEGMENTED_MIN_SIZE
+from src.services.segmented_download import SegmentedDownload
+from src.services.fragment_budget import FragmentBudget, FragmentLease
+from src.services.host_limiter import HostLimiter
+from src.services.bandwidth import BandwidthShare
+from src.utils import get_host_key
+
+
+class ParallelYoutubeDL(yt_dlp.YoutubeDL):
+    """
+    YoutubeDL que descarga a la vez el video y el audio de selecciones como
+    ``bestvideo+bestaudio``.
+
+    yt-dlp llama a ``dl()`` una vez por formato, uno detrás de otro, y luego
+    mezcla los archivos. Aquí cada llamada se lanza en su propio hilo y la
+    última espera a todas, así que la mezcla empieza cuando ambos streams
+    terminaron. Los errores de cualquier stream se propagan igual que en la
+    descarga secuencial.
+
+    Además, los formatos HTTP de un solo archivo (sin fragmentos) de tamaño
+    suficiente se descargan por rangos con varias conexiones
+    (``SegmentedDownload``) en lugar de con una sola, y los fragmentados
+    (HLS/DASH) reparten sus fragmentos simultáneos con el resto de trabajos
+    a través de ``fragment_budget``.
+
+    Con ``host_limiter`` todas las peticiones HTTP (extracción de metadatos
+    y descarga) pasan por el limitador de su plataforma, y con ``bandwidth``
+    todo lo leído de las respuestas cuenta para la parte de ancho de banda
+    del trabajo. Si se activa ``cancel``, la siguiente petición o lectura
+    HTTP aborta con ``DownloadCancelled`` (p. ej. un escaneo que superó su
+    plazo y ya nadie espera).
+    """
+
+    def __init__(
+        self,
+        params: Dict = None,
+        *args,
+        parallel_streams: bool = PARALLEL_STREAM_DOWNLOADS,
+        segmented: bool = SEGMENTED_DOWNLOADS,
+        fragment_budget: Optional[FragmentBudget] = None,
+        host_limiter: Optional[HostLimiter] = None,
+        bandwidth: Optional[BandwidthShare] = None,
+        cancel: Optional[threading.Event] = None,
+        **kwargs
+    ):
+        # urlopen() puede llamarse ya durante la inicialización
+        self.host_limiter = host_limiter
+        self.bandwidth = bandwidth
+        self.cancel = cancel
+        self._limit_key: Optional[str] = None
+        super().__init__(params, *args, **kwargs)
+        self.parallel_streams = parallel_streams
+        self.segmented = segmented
+        self.fragment_budget = fragment_budget
+        self._fragment_lease: Optional[FragmentLease] = None
+        self._lease_lock = threading.Lock()
+        self._local = threading.local()
+
+    def close(self):
+        if self._fragment_lease is not None:
+            self._fragment_lease.close()
+            self._fragment_lease = None
+        super().close()
+
+    def extract_info(self, url, *args, **kwargs):
+        # Las URLs de los medios (googlevideo, CDNs) cuentan para la plataforma del video
+        self._limit_key = self._limit_key or get_host_key(url)
+        return super().extract_info(url, *args, **kwargs)
+
+    def process_ie_result(self, ie_result, *args, **kwargs):
+        if self._limit_key is None and ie_result.get('webpage_url'):
+            self._limit_key = get_host_key(ie_result['webpage_url'])
+        return super().process_ie_result(ie_result, *args, **kwargs)
+
+    def _check_cancel(self):
+        if self.cancel is not None and self.cancel.is_set():
+            raise DownloadCancelled('Cancelado: nadie espera ya el resultado')
+
+    def urlopen(self, req):
+        self._check_cancel()
+        response = self._limited_urlopen(req)
+        if self.bandwidth is not None or self.cancel is not None:
+            read, share = response.read, self.bandwidth
+
+            def checked_read(*args, **kwargs):
+                self._check_cancel()
+                data = read(*args, **kwargs)
+                if share is not None:
+                    share.consume(len(data))
+                return data
+
+            response.read = checked_read
+        return response
+
+    def _limited_urlopen(self, req):
+        if self.host_limiter is None:
+            return super().urlopen(req)
+        url = req if isinstance(req, str) else getattr(req, 'url', None) or req.get_full_url()
+        key = self._limit_key or get_host_key(url)
+        with self.host_limiter.request(key):
+            try:
+                return super().urlopen(req)
+            except HTTPError as e:
+                if e.status in (403, 429):
+                    self.host_limiter.throttled(key, e.status, e.response.headers.get('Retry-After'))
+                raise
+
+    def process_info(self, info_dict):
+        # Número de streams que yt-dlp descargará por separado para este video
+        self._local.expected = len(info_dict.get('requested_formats') or ())
+        self._local.pending = []
+        self._local.pool = None
+        try:
+            return super().process_info(info_dict)
+        finally:
+            # Si yt-dlp abortó antes del último stream, no dejar hilos sueltos
+            if self._local.pool is not None:
+                self._local.pool.shutdown(wait=True)
+            self._local.expected = 0
+
+    def dl(self, name, info, subtitle=False, test=False):
+        expected = getattr(self._local, 'expected', 0)
+        # Solo los streams sueltos de un formato combinado; ffmpeg mezclando
+        # directamente recibe 'requested_formats' y va por el camino normal
+        if not self.parallel_streams or expected < 2 or subtitle or test or info.get('requested_formats'):
+            return self._dl_single(name, info, subtitle=subtitle, test=test)
+
+        if self._local.pool is None:
+            self._local.pool = ThreadPoolExecutor(max_workers=expected, thread_name_prefix='ydl-stream')
+        pending = self._local.pending
+        pending.append(self._local.pool.submit(self._dl_single, name, info))
+        if len(pending) < expected:
+            # El resultado real lo devuelve la llamada del último stream
+            return True, False
+
+        success, real_download, error = True, False, None
+        for future in pending:
+            try:
+                partial_success, partial_real = future.result()
+                success = success and partial_success
+                real_download = real_download or partial_real
+            except BaseException as e:
+                error = error or e
+        pending.clear()
+        self._local.pool.shutdown(wait=True)
+        self._local.pool = None
+        if error is not None:
+            raise error
+        return success, real_download
+
+    def _dl_single(self, name, info, subtitle=False, test=False):
+        """Descarga un archivo: por rangos si se puede, si no con yt-dlp"""
+        if subtitle or test or name == '-':
+            return super().dl(name, info, subtitle=subtitle, test=test)
+        fd_class = get_suitable_downloader(info, self.params)
+        # Un recorte por tiempo (section_start/end) lo hace FFmpegFD: los
+        # rangos de bytes descargarían el archivo entero ignorando el tramo
+        has_section = info.get('section_start') is not None or info.get('section_end') is not None
+        if (self.segmented and not has_section and not info.get('requested_formats')
+                and fd_class is not None and issubclass(fd_class, HttpFD)):
+            size = self._segmentable_size(info)
+            if size:
+                return self._dl_segmented(name, info, size)
+        if self.fragment_budget is not None and fd_class is not None and issubclass(fd_class, FragmentFD):
+            return self._dl_fragmented(name, info, fd_class)
+        return super().dl(name, info, subtitle=subtitle, test=test)
+
+    def _lease(self, info: Dict) -> FragmentLease:
+        """Cuota de fragmentos del trabajo, compartida por todos sus streams"""
+        with self._lease_lock:
+            if self._fragment_lease is None:
+                host = get_host_key(info.get('webpage_url') or info.get('url') or '')
+                self._fragment_lease = self.fragment_budget.lease(host)
+            return self._fragment_lease
+
+    def _dl_fragmented(self, name: str, info: Dict, fd_class):
+        """
+        Igual que ``YoutubeDL.dl`` pero cada fragmento espera un hueco en el
+        presupuesto global y alimenta la adaptación de la concurrencia.
+        """
+        if not info.get('url'):
+            self.raise_no_formats(info, True)
+        fd = fd_class(self, self.params)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+
+        lease = self._lease(info)
+        download_fragment = fd._download_fragment
+
+        def gated_download_fragment(ctx, *args, **kwargs):
+            with lease.slot():
+                try:
+                    success = download_fragment(ctx, *args, **kwargs)
+                except HTTPError as e:
+                    if e.status in (403, 429):
+                        lease.record_throttle()
+                    raise
+            if success:
+                try:
+                    size = os.path.getsize(ctx['fragment_filename_sanitized'])
+                except OSError:
+                    size = 0
+                lease.record_fragment(size)
+            return success
+
+        fd._download_fragment = gated_download_fragment
+        new_info = self._copy_infodict(info)
+        if new_info.get('http_headers') is None:
+            new_info['http_headers'] = self._calc_headers(new_info)
+        return fd.download(name, new_info)
+
+    def _open_range(self, info: Dict, start: int, end: int):
+        headers = dict(info.get('http_headers') or self._calc_headers(info))
+        headers['Range'] = f'bytes={start}-{end}'
+        headers['Accept-Encoding'] = 'identity'
+        return self.urlopen(Request(info['url'], headers=headers))
+
+    def _segmentable_size(self, info: Dict) -> Optional[int]:
+        """Tamaño del recurso si admite rangos y merece varias conexiones"""
+        if determine_protocol(info) not in ('http', 'https') or not info.get('url'):
+            return None
+        size = info.get('filesize')
+        if size is not None and size < SEGMENTED_MIN_SIZE:
+            return None
+        # Confirmar soporte de rangos (y el tamaño real) con el primer byte
+        try:
+            response = self._open_range(info, 0, 0)
+            content_range = response.headers.get('Content-Range')
+            status = response.status
+            response.close()
+        except Exception:
+            return None
+        if status != 206 or not content_range:
+            return None
+        _, _, size = parse_http_range(content_range)
+        if not size or size < SEGMENTED_MIN_SIZE:
+            return None
+        return size
+
+    def _report_progress(self, status: Dict):
+        for hook in self._progress_hooks:
+            hook(status)
+
+    def _dl_segmented(self, name: str, info: Dict, size: int):
+        if os.path.exists(name) and os.path.getsize(name) == size and self.params.get('continuedl', True):
+            self.to_screen(f'[download] {name} has already been downloaded')
+            self._report_progress({
+                'status': 'finished', 'filename': name, 'info_dict': info,
+                'downloaded_bytes': size, 'total_bytes': size,
+            })
+            return True, False
+
+        tmpfilename = f'{name}.part'
+        started = time.time()
+
+        def on_progress(downloaded: int, speed: float):
+            self._report_progress({
+                'status': 'downloading',
+                'filename': name,
+                'tmpfilename': tmpfilename,
+                'info_dict': info,
+                'downloaded_bytes': downloaded,
+                'total_bytes': size,
+                'speed': speed,
+                'eta': int((size - downloaded) / speed) if speed else None,
+                'elapsed': time.time() - started,
+            })
+
+        download = SegmentedDownload(lambda start, end: self._open_range(info, start, end), tmpfilename, size, on_progress=on_progress)
+        self.to_screen(f'[download] Destination: {name} (por rangos, {size} bytes)')
+        download.run()
+        os.replace(tmpfilename, name)
+        self.to_screen(
+            f"[download] {download.stats['segments']} segmentos con {download.stats['connections']} "
+            f"conexiones en {download.stats['seconds']}s"
+        )
+        self._report_progress({
+            'status': 'finished',
+            'filename': name,
+            'info_dict': info,
+            'downloaded_bytes': size,
+            'total_bytes': size,
+            'elapsed': time.time() - started,
+        })
+        return True, True
@@ -0,0 +1,133 @@
+"""Varias salidas de un mismo origen con una sola decodificación (split/asplit)"""
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.config import RENDITIONS_AUDIO_BITRATE
+from src.services.conversion_plan import plan_h264
+
+
+def rendition_id(job_id: str, index: int) -> str:
+    """ID del trabajo de la salida ``index`` (0, 1...) de ``job_id``"""
+    return f"{job_id}-{index + 1}"
+
+
+def rendition_label(profile: Dict) -> str:
+    """Etiqueta corta de un perfil para nombres de archivo y mensajes (720p, 192k...)"""
+    if profile['format'] == 'mp3':
+        return f"{profile.get('audio_quality') or RENDITIONS_AUDIO_BITRATE}k"
+    return f"{profile['quality']}p" if profile.get('quality') else 'original'
+
+
+def plan_renditions(probe: Dict, profiles: List[Dict]) -> List[Dict]:
+    """
+    Decide, para cada perfil, qué streams copiar, escalar o recodificar.
+
+    Una salida MP4 sin cambio de altura copia el vídeo si ya es H.264
+    compatible, y el audio si ya es AAC y no se pidió otra calidad; el resto
+    se recodifica a partir de la decodificación compartida.
+
+    Args:
+        probe: Resultado de ``ffmpeg.probe`` del origen
+        profiles: Perfiles (``format``, ``quality``, ``audio_quality``)
+
+    Returns:
+        List: Por perfil, ``video`` y ``audio`` ('copy', el códec o None),
+        ``height`` (altura a la que escalar o None) y ``audio_bitrate``
+
+    Raises:
+        ValueError: Si un perfil pide un stream que el origen no tiene
+    """
+    plan = plan_h264(probe)
+    source_height = next(
+        (stream.get('height') for stream in probe.get('streams', ())
+         if str(stream.get('index')) == plan['video_map']),
+        None
+    )
+    renditions = []
+    for profile in profiles:
+        bitrate = profile.get('audio_quality')
+        if profile['format'] == 'mp3':
+            if not plan['audio']:
+                raise ValueError("El archivo no tiene audio para la salida mp3")
+            renditions.append({
+                'profile': profile, 'label': rendition_label(profile), 'ext': 'mp3',
+                'video': None, 'height': None,
+                'audio': 'libmp3lame', 'audio_bitrate': bitrate or RENDITIONS_AUDIO_BITRATE,
+            })
+            continue
+
+        if not plan['video']:
+            raise ValueError("El archivo no tiene vídeo para la salida mp4")
+        # Solo se reduce la altura; pedir más que el origen lo deja como está
+        height = profile.get('quality')
+        if height and source_height and height >= source_height:
+            height = None
+        video = 'copy' if plan['video'] == 'copy' and not height else 'libx264'
+        audio = None
+        if plan['audio']:
+            audio = 'copy' if plan['audio'] == 'copy' and not bitrate else 'aac'
+        renditions.append({
+            'profile': profile, 'label': rendition_label(profile), 'ext': 'mp4',
+            'video': video, 'height': height,
+            'audio': audio, 'audio_bitrate': bitrate or RENDITIONS_AUDIO_BITRATE,
+        })
+    for rendition in renditions:
+        rendition['video_map'] = plan['video_map']
+        rendition['audio_map'] = plan['audio_map']
+    return renditions
+
+
+def renditions_output(input_path: str, renditions: List[Dict], output_paths: List[str],
+                      threads: Optional[int] = None):
+    """
+    Construye con ffmpeg-python un único comando con todas las salidas.
+
+    El vídeo y el audio del origen se decodifican una vez y se reparten con
+    ``split``/``asplit`` entre las salidas que recodifican; las que copian
+    leen el stream directamente. ``threads`` se reparte entre los
+    codificadores de vídeo.
+    """
+    import ffmpeg
+
+    source = ffmpeg.input(input_path)
+    encoded_video = [r for r in renditions if r['video'] not in (None, 'copy')]
+    encoded_audio = [r for r in renditions if r['audio'] not in (None, 'copy')]
+
+    def shared(selector: str, filter_name: str, count: int) -> list:
+        if count == 0:
+            return []
+        if count == 1:
+            return [source[selector]]
+        split = source[selector].filter_multi_output(filter_name, count)
+        return [split.stream(i) for i in range(count)]
+
+    video_streams = iter(shared(renditions[0]['video_map'], 'split', len(encoded_video)))
+    audio_streams = iter(shared(renditions[0]['audio_map'], 'asplit', len(encoded_audio)))
+    encoder_threads = max(1, threads // len(encoded_video)) if threads and encoded_video else None
+
+    outputs = []
+    for rendition, output_path in zip(renditions, output_paths):
+        streams, kwargs = [], {}
+        if rendition['video'] == 'copy':
+            streams.append(source[rendition['video_map']])
+            kwargs['vcodec'] = 'copy'
+        elif rendition['video']:
+            video = next(video_streams)
+            if rendition['height']:
+                video = video.filter('scale', -2, rendition['height'])
+            streams.append(video)
+            kwargs.update(vcodec=rendition['video'], preset='medium', crf=23, pix_fmt='yuv420p')
+            if encoder_threads:
+                kwargs['threads'] = encoder_threads
+        if rendition['audio'] == 'copy':
+            streams.append(source[rendition['audio_map']])
+            kwargs['acodec'] = 'copy'
+        elif rendition['audio']:
+            streams.append(next(audio_streams))
+            kwargs.update(acodec=rendition['audio'], audio_bitrate=f"{rendition['audio_bitrate']}k")
+        if rendition['ext'] == 'mp4':
+            kwargs['movflags'] = '+faststart'
+        outputs.append(ffmpeg.output(*streams, output_path, **kwargs))
+    return ffmpeg.merge_outputs(*outputs)
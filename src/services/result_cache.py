@@ -0,0 +1,298 @@
+"""Caché persistente de archivos descargados, direccionada por contenido"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.config import (
+    DOWNLOAD_FOLDER, RESULT_CACHE_FOLDER, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_SAVE_INTERVAL,
+    RESULT_CACHE_LEASE
+)
+
+# Ubicación anterior de la caché, servida por error en /content
+LEGACY_FOLDER = DOWNLOAD_FOLDER / "cache"
+
+# Tamaño de cada muestra del hash de integridad
+SAMPLE_SIZE = 1024 * 1024
+
+
+def make_result_key(extractor: str, video_id: str, format_id: str, params: Dict) -> str:
+    """
+    Clave de un resultado: video, formatos elegidos y parámetros de postprocesado.
+
+    Returns:
+        str: Hash hexadecimal de la descripción del resultado
+    """
+    description = json.dumps([extractor, video_id, format_id, params], sort_keys=True)
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()[:32]
+
+
+def sample_hash(path: Path, size: int) -> str:
+    """
+    Hash de integridad de un archivo: tamaño más muestras del inicio, el
+    centro y el final. Detecta truncados y sobrescrituras en milisegundos,
+    sin leer archivos de varios GB completos en cada acierto.
+    """
+    digest = hashlib.sha256(str(size).encode('ascii'))
+    with open(path, 'rb') as f:
+        for offset in (0, max(0, size // 2 - SAMPLE_SIZE // 2), max(0, size - SAMPLE_SIZE)):
+            f.seek(offset)
+            digest.update(f.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Guarda los archivos ya descargados para servir peticiones repetidas.
+
+    Los archivos viven en su propia carpeta (``<clave>.<ext>``, fuera de la
+    carpeta servida en /content) junto a un índice JSON. El tamaño total
+    está acotado y se expulsa por LRU. Antes de servir un archivo se
+    comprueban su tamaño y su hash de integridad.
+
+    Un acierto protege su archivo durante ``RESULT_CACHE_LEASE`` (lo que
+    vive el trabajo que lo recibe) y cada envío lo fija con ``pin`` hasta
+    terminar, así que la expulsión nunca borra un archivo que se está
+    sirviendo. Los accesos solo cambian el orden LRU en memoria; el índice
+    se reescribe como mucho cada ``RESULT_CACHE_SAVE_INTERVAL`` segundos.
+    """
+
+    def __init__(self, folder: Path = RESULT_CACHE_FOLDER, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.folder = Path(folder)
+        self._adopt_legacy_folder()
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._index_path = self.folder / 'index.json'
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._pins: Counter = Counter()  # clave -> envíos en curso
+        self._leases: Dict[str, float] = {}  # clave -> protegida hasta (time.monotonic)
+        self._bytes = 0
+        self._version = 0  # Cambios del índice en memoria
+        self._saved_version = 0
+        self._saved_at = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.corrupted = 0
+        self.evictions = 0
+        self._load()
+
+    def _adopt_legacy_folder(self):
+        """Trae la caché de su antigua ubicación, dentro de la carpeta de descargas"""
+        if not LEGACY_FOLDER.is_dir() or self.folder.exists():
+            return
+        self.folder.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.rename(LEGACY_FOLDER, self.folder)
+        except OSError:
+            # Otro volumen: no merece la pena copiar la caché entera
+            shutil.rmtree(LEGACY_FOLDER, ignore_errors=True)
+
+    def _load(self):
+        try:
+            data = json.loads(self._index_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return
+        # Reconstruir el orden LRU a partir del último acceso
+        for key, entry in sorted(data.items(), key=lambda kv: kv[1].get('last_access', 0)):
+            if (self.folder / entry['file']).exists():
+                self._entries[key] = entry
+                self._bytes += entry['size']
+
+    def _changed(self, force: bool = False):
+        """
+        Anota un cambio del índice (con ``_lock`` tomado).
+
+        Returns:
+            tuple: Versión e índice serializado si toca escribirlo, o None
+        """
+        self._version += 1
+        if not force and time.monotonic() - self._saved_at < RESULT_CACHE_SAVE_INTERVAL:
+            return None
+        self._saved_at = time.monotonic()
+        return self._version, json.dumps(self._entries)
+
+    def _save(self, snapshot):
+        """Escribe un índice serializado por ``_changed`` (sin ``_lock``)"""
+        if snapshot is None:
+            return
+        version, data = snapshot
+        with self._save_lock:
+            # Una instantánea más nueva ya está en disco
+            if version <= self._saved_version:
+                return
+            tmp_path = self._index_path.with_suffix('.tmp')
+            tmp_path.write_text(data, encoding='utf-8')
+            os.replace(tmp_path, self._index_path)
+            self._saved_version = version
+
+    def flush(self):
+        """Escribe el índice si tiene accesos pendientes de guardar"""
+        with self._lock:
+            snapshot = self._changed(force=True) if self._version > self._saved_version else None
+        self._save(snapshot)
+
+    def _is_pinned(self, key: str, now: float) -> bool:
+        return self._pins[key] > 0 or self._leases.get(key, 0) > now
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        self._leases.pop(key, None)
+        if entry:
+            self._bytes -= entry['size']
+            try:
+                (self.folder / entry['file']).unlink()
+            except OSError:
+                pass
+
+    def get(self, key: str) -> Optional[Tuple[Path, str]]:
+        """
+        Busca un resultado y verifica su integridad.
+
+        El hash se calcula fuera del lock; un acierto queda protegido de la
+        expulsión durante ``RESULT_CACHE_LEASE``.
+
+        Returns:
+            Tuple[Path, str]: Ruta del archivo y nombre para el cliente, o None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            # Protegido mientras se verifica
+            self._pins[key] += 1
+
+        path = self.folder / entry['file']
+        try:
+            size = path.stat().st_size
+            valid = size == entry['size'] and sample_hash(path, size) == entry['hash']
+        except OSError:
+            valid = False
+
+        with self._lock:
+            self._pins[key] -= 1
+            if self._pins[key] <= 0:
+                del self._pins[key]
+            if not valid:
+                print(f"[CACHE] Archivo en caché corrupto, descartado: {path.name}")
+                self.corrupted += 1
+                self.misses += 1
+                if self._entries.get(key) is entry:
+                    self._remove(key)
+                snapshot = self._changed(force=True)
+            else:
+                entry['last_access'] = time.time()
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                self._leases[key] = time.monotonic() + RESULT_CACHE_LEASE
+                self.hits += 1
+                snapshot = self._changed()
+        self._save(snapshot)
+        return (path, entry['filename']) if valid else None
+
+    def _key_of(self, path: Path) -> Optional[str]:
+        path = Path(path)
+        if path.parent != self.folder:
+            return None
+        return path.stem
+
+    def pin(self, path: Path) -> bool:
+        """
+        Impide expulsar un archivo de la caché mientras se envía.
+
+        Returns:
+            bool: True si la ruta es de la caché (hay que llamar a ``unpin``)
+        """
+        key = self._key_of(path)
+        if key is None:
+            return False
+        with self._lock:
+            self._pins[key] += 1
+        return True
+
+    def unpin(self, path: Path):
+        key = self._key_of(path)
+        if key is None:
+            return
+        with self._lock:
+            self._pins[key] -= 1
+            if self._pins[key] <= 0:
+                del self._pins[key]
+
+    def put(self, key: str, file_path: Path, filename: str) -> Optional[Path]:
+        """
+        Guarda un archivo descargado en la caché (enlace duro o copia).
+
+        Returns:
+            Path: Ruta del archivo dentro de la caché, o None si no cabe
+        """
+        file_path = Path(file_path)
+        size = file_path.stat().st_size
+        if size > self.max_bytes:
+            return None
+        cached_path = self.folder / f"{key}{file_path.suffix}"
+        try:
+            if cached_path.exists():
+                cached_path.unlink()
+            try:
+                os.link(file_path, cached_path)
+            except OSError:
+                shutil.copy2(file_path, cached_path)
+            entry = {
+                'file': cached_path.name,
+                'filename': filename,
+                'size': size,
+                'hash': sample_hash(cached_path, size),
+                'created': time.time(),
+                'last_access': time.time(),
+            }
+        except OSError as e:
+            print(f"[CACHE] No se pudo guardar en caché: {e}")
+            return None
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous:
+                self._bytes -= previous['size']
+                if previous['file'] != entry['file']:
+                    try:
+                        (self.folder / previous['file']).unlink()
+                    except OSError:
+                        pass
+            self._entries[key] = entry
+            self._bytes += size
+            # Expulsar los menos usados (y no fijados) hasta respetar el presupuesto
+            now = time.monotonic()
+            for victim in list(self._entries):
+                if self._bytes <= self.max_bytes:
+                    break
+                if victim == key or self._is_pinned(victim, now):
+                    continue
+                self._remove(victim)
+                self.evictions += 1
+            snapshot = self._changed(force=True)
+        self._save(snapshot)
+        return cached_path
+
+    def stats(self) -> Dict:
+        """Uso y contadores de la caché"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'corrupted': self.corrupted,
+                'evictions': self.evictions,
+                'pinned': sum(1 for key in self._entries if self._is_pinned(key, time.monotonic())),
+            }
@@ -0,0 +1,83 @@
+"""Presupuesto de reintentos por trabajo con espera exponencial y jitter"""
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.config import (
+    RETRY_BUDGET_ATTEMPTS, RETRY_BUDGET_SECONDS,
+    RETRY_BASE_DELAY, RETRY_MAX_DELAY
+)
+
+
+class RetryBudget:
+    """
+    Reintentos disponibles para un trabajo y estadísticas de cada intento.
+
+    La espera antes de cada reintento es exponencial con jitter completo
+    (aleatoria entre ``base_delay`` y el tope del intento), para que varios
+    trabajos que fallan a la vez no vuelvan a la carga sincronizados. El
+    presupuesto limita tanto el número de reintentos como el tiempo total
+    de espera.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = RETRY_BUDGET_ATTEMPTS,
+        max_total_delay: float = RETRY_BUDGET_SECONDS,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+    ):
+        self.max_attempts = max_attempts
+        self.max_total_delay = max_total_delay
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.waited = 0.0
+        self.attempts: List[Dict] = []
+        self._started: Optional[float] = None
+
+    def can_retry(self) -> bool:
+        return len(self.attempts) < self.max_attempts and self.waited < self.max_total_delay
+
+    def _next_delay(self) -> float:
+        cap = min(self.max_delay, self.base_delay * 2 ** len(self.attempts))
+        delay = random.uniform(self.base_delay, max(self.base_delay, cap))
+        return round(min(delay, self.max_total_delay - self.waited), 2)
+
+    def begin(self, reason: str, resumed_from: int = 0) -> Dict:
+        """
+        Registra un reintento nuevo.
+
+        Args:
+            reason: Motivo del reintento (p. ej. '403')
+            resumed_from: Bytes ya descargados desde los que se continúa
+
+        Returns:
+            Dict: Estadísticas del intento; ``wait`` es la espera a aplicar
+        """
+        self.end('retry')
+        attempt = {
+            'attempt': len(self.attempts) + 1,
+            'reason': reason,
+            'resumed_from': resumed_from,
+            'wait': self._next_delay(),
+        }
+        self.waited += attempt['wait']
+        self.attempts.append(attempt)
+        self._started = time.monotonic()
+        return attempt
+
+    def end(self, outcome: str):
+        """Cierra el último intento abierto con su resultado y duración"""
+        if self._started is None or not self.attempts:
+            return
+        attempt = self.attempts[-1]
+        attempt['outcome'] = outcome
+        attempt['duration'] = round(time.monotonic() - self._started, 2)
+        self._started = None
+
+    def snapshot(self) -> tuple:
+        """Copia de las estadísticas para publicarlas en el progreso"""
+        return tuple(dict(attempt) for attempt in self.attempts)
@@ -0,0 +1,238 @@
+"""Descarga de un recurso HTTP por rangos de bytes con varias conexiones"""
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.config import (
+    SEGMENTED_SEGMENT_SIZE, SEGMENTED_MIN_CONNECTIONS, SEGMENTED_MAX_CONNECTIONS,
+    SEGMENTED_RETRIES, SEGMENTED_PROBE_INTERVAL
+)
+
+# Bytes leídos por llamada a read()
+READ_SIZE = 256 * 1024
+
+
+class RangeNotSupported(Exception):
+    """El servidor no respeta la cabecera Range"""
+
+
+class _Aborted(Exception):
+    """Otro segmento falló o se canceló la descarga"""
+
+
+class SegmentedDownload:
+    """
+    Descarga un recurso de tamaño conocido repartiendo rangos entre varias
+    conexiones.
+
+    El archivo se reserva entero al principio y cada segmento se escribe en
+    su desplazamiento. Los segmentos terminados se anotan en un archivo
+    ``.segments`` junto al parcial, así que una descarga interrumpida (o
+    reintentada con URLs nuevas tras un 403) continúa donde quedó.
+
+    El número de conexiones empieza en ``min_connections`` y se va subiendo
+    mientras el rendimiento total mejore; deja de subir cuando añadir una
+    conexión no aporta o el servidor empieza a rechazar peticiones.
+
+    Args:
+        open_range: ``open_range(start, end)`` devuelve una respuesta con
+            ``read()``, ``status`` y ``headers`` para el rango pedido
+            (inclusivo). Los errores HTTP deben lanzar excepción.
+        on_progress: Recibe ``(bytes descargados, velocidad en B/s)``
+    """
+
+    def __init__(
+        self,
+        open_range: Callable,
+        path: Path,
+        size: int,
+        segment_size: int = SEGMENTED_SEGMENT_SIZE,
+        min_connections: int = SEGMENTED_MIN_CONNECTIONS,
+        max_connections: int = SEGMENTED_MAX_CONNECTIONS,
+        retries: int = SEGMENTED_RETRIES,
+        on_progress: Optional[Callable[[int, float], None]] = None,
+    ):
+        self.open_range = open_range
+        self.path = Path(path)
+        self.size = size
+        self.segment_size = segment_size
+        self.min_connections = max(1, min_connections)
+        self.max_connections = max(self.min_connections, max_connections)
+        self.retries = retries
+        self.on_progress = on_progress
+        self.state_path = self.path.with_name(self.path.name + '.segments')
+
+        self._lock = threading.Lock()
+        self._segments = [(start, min(start + segment_size, size) - 1) for start in range(0, size, segment_size)]
+        self._done = self._load_state()
+        self._pending: List[int] = [i for i in range(len(self._segments)) if i not in self._done]
+        self._downloaded = sum(self._segment_length(i) for i in self._done)
+        self._error: Optional[BaseException] = None
+        self._throttled = False
+        self._workers: List[threading.Thread] = []
+        self._active = 0
+        self._all_done = threading.Event()
+        self.connections = 0
+        self.stats: Dict = {}
+
+    def _segment_length(self, index: int) -> int:
+        start, end = self._segments[index]
+        return end - start + 1
+
+    def _load_state(self) -> set:
+        """Segmentos ya escritos por un intento anterior con el mismo tamaño"""
+        try:
+            state = json.loads(self.state_path.read_text(encoding='utf-8'))
+            if (state['size'] == self.size and state['segment_size'] == self.segment_size
+                    and self.path.stat().st_size == self.size):
+                return set(state['done'])
+        except (OSError, ValueError, KeyError):
+            pass
+        return set()
+
+    def _save_state(self):
+        tmp_path = self.state_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps({
+            'size': self.size,
+            'segment_size': self.segment_size,
+            'done': sorted(self._done),
+        }), encoding='utf-8')
+        os.replace(tmp_path, self.state_path)
+
+    def _next_segment(self) -> Optional[int]:
+        with self._lock:
+            if self._error is not None or not self._pending:
+                return None
+            return self._pending.pop(0)
+
+    def _fetch_segment(self, index: int, f):
+        start, end = self._segments[index]
+        offset = start
+        attempt = 0
+        while offset <= end:
+            try:
+                response = self.open_range(offset, end)
+                try:
+                    if response.status != 206:
+                        raise RangeNotSupported(f"Respuesta {response.status} a una petición por rango")
+                    f.seek(offset)
+                    while offset <= end:
+                        if self._error is not None:
+                            raise _Aborted()
+                        data = response.read(min(READ_SIZE, end - offset + 1))
+                        if not data:
+                            raise IOError(f"Conexión cerrada en el byte {offset} del segmento {start}-{end}")
+                        f.write(data)
+                        offset += len(data)
+                        with self._lock:
+                            self._downloaded += len(data)
+                finally:
+                    response.close()
+            except Exception as e:
+                if self._error is not None:
+                    raise
+                status = getattr(e, 'status', None)
+                if status in (429, 503):
+                    self._throttled = True
+                # Un 403 es una URL caducada y un rango no soportado no se
+                # arregla reintentando: se aborta la descarga entera
+                if status in (401, 403, 404, 410) or isinstance(e, RangeNotSupported) or attempt >= self.retries:
+                    raise
+                attempt += 1
+                time.sleep(min(2 ** attempt, 10))
+
+    def _worker(self):
+        try:
+            self._download_segments()
+        finally:
+            with self._lock:
+                self._active -= 1
+                if self._active == 0:
+                    self._all_done.set()
+
+    def _download_segments(self):
+        with open(self.path, 'r+b') as f:
+            while True:
+                index = self._next_segment()
+                if index is None:
+                    return
+                try:
+                    self._fetch_segment(index, f)
+                except BaseException as e:
+                    with self._lock:
+                        if self._error is None:
+                            self._error = e
+                        self._pending.insert(0, index)
+                    return
+                f.flush()
+                with self._lock:
+                    self._done.add(index)
+                    self._save_state()
+
+    def _add_worker(self):
+        worker = threading.Thread(target=self._worker, name=f'segment-{len(self._workers)}', daemon=True)
+        with self._lock:
+            self._active += 1
+        self._workers.append(worker)
+        self.connections += 1
+        worker.start()
+
+    def run(self):
+        """
+        Descarga todos los segmentos pendientes.
+
+        Raises:
+            Exception: El primer error no recuperable de cualquier segmento
+        """
+        if not self.path.exists() or self.path.stat().st_size != self.size:
+            with open(self.path, 'wb') as f:
+                f.truncate(self.size)
+
+        started = time.monotonic()
+        resumed_from = self._downloaded
+        for _ in range(min(self.min_connections, len(self._pending))):
+            self._add_worker()
+        if not self._workers:
+            self._all_done.set()
+
+        last_time, last_bytes = started, self._downloaded
+        best_rate = 0.0
+        while not self._all_done.wait(SEGMENTED_PROBE_INTERVAL):
+            now = time.monotonic()
+            rate = (self._downloaded - last_bytes) / (now - last_time)
+            last_time, last_bytes = now, self._downloaded
+            if self.on_progress:
+                try:
+                    self.on_progress(self._downloaded, rate)
+                except BaseException as e:
+                    with self._lock:
+                        self._error = self._error or e
+                    break
+
+            # Añadir una conexión solo si la anterior subió el rendimiento
+            if (not self._throttled and self._active == self.connections and self.connections < self.max_connections
+                    and len(self._pending) > 0 and rate > best_rate * 1.1):
+                best_rate = rate
+                self._add_worker()
+
+        for worker in self._workers:
+            worker.join()
+
+        elapsed = time.monotonic() - started
+        self.stats = {
+            'connections': self.connections,
+            'segments': len(self._segments),
+            'resumed_from': resumed_from,
+            'seconds': round(elapsed, 2),
+            'throttled': self._throttled,
+        }
+        if self._error is not None:
+            raise self._error
+        self.state_path.unlink(missing_ok=True)
+        if self.on_progress:
+            self.on_progress(self.size, (self.size - resumed_from) / elapsed if elapsed else 0.0)
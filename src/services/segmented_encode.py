@@ -0,0 +1,268 @@
+"""Codificación H.264 por segmentos en paralelo con concatenación sin pérdidas"""
+import bisect
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.config import (
+    SEGMENTED_ENCODE_WORKERS, SEGMENTED_ENCODE_MIN_DURATION,
+    SEGMENTED_ENCODE_MIN_SEGMENT, SEGMENTED_ENCODE_SEGMENTS_PER_WORKER
+)
+from src.services.ffmpeg_progress import run_with_progress
+from src.utils import available_cpus
+
+# Margen (segundos) antes de cada keyframe de corte, menor que cualquier frame
+KEYFRAME_EPSILON = 0.001
+
+
+def encode_workers() -> int:
+    """Codificadores simultáneos: el configurado o uno por núcleo disponible"""
+    return SEGMENTED_ENCODE_WORKERS or available_cpus()
+
+
+def video_packets(input_path: str, video_map: str, start_time: float = 0.0) -> Tuple[List[float], List[float]]:
+    """
+    Instantes de todos los frames del vídeo y de sus keyframes, relativos al
+    inicio del archivo.
+
+    Lee solo las cabeceras de los paquetes (no decodifica), así que su coste
+    es el de leer el archivo una vez.
+
+    Returns:
+        Tuple: (tiempos de todos los paquetes, tiempos de los keyframes), ordenados
+    """
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', video_map,
+         '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', input_path],
+        capture_output=True, text=True,
+    )
+    times, keyframes = [], []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(',')
+        try:
+            time_ = float(pts_time) - start_time
+        except ValueError:
+            continue
+        times.append(time_)
+        if 'K' in flags:
+            keyframes.append(time_)
+    return sorted(times), sorted(set(keyframes))
+
+
+def split_at_keyframes(keyframes: List[float], duration: float, segments: int,
+                       min_segment: float = SEGMENTED_ENCODE_MIN_SEGMENT) -> List[Tuple[float, Optional[float]]]:
+    """
+    Reparte el vídeo en ``segments`` tramos parecidos que empiezan en keyframes.
+
+    Returns:
+        List: Tramos ``(inicio, fin)``; el último acaba en ``None`` (hasta el final)
+    """
+    starts = [0.0]
+    for i in range(1, segments):
+        target = duration * i / segments
+        # Primer keyframe a partir del objetivo que deje tramos de al menos min_segment
+        candidate = next((t for t in keyframes if t >= target and t - starts[-1] >= min_segment), None)
+        if candidate is None or duration - candidate < min_segment:
+            break
+        if candidate > starts[-1]:
+            starts.append(candidate)
+    return [(start, starts[i + 1] if i + 1 < len(starts) else None) for i, start in enumerate(starts)]
+
+
+def count_frames(times: List[float], start: float, end: Optional[float]) -> Optional[int]:
+    """Frames con instante en ``[start, end)`` (None para el último tramo)"""
+    if end is None:
+        return None
+    low = bisect.bisect_left(times, start - KEYFRAME_EPSILON)
+    high = bisect.bisect_left(times, end - KEYFRAME_EPSILON)
+    return high - low
+
+
+def plan_segments(input_path: str, plan: Dict, duration: Optional[float], start_time: float = 0.0,
+                  workers: Optional[int] = None) -> List[Tuple[float, Optional[int]]]:
+    """
+    Tramos en los que partir una conversión, o lista vacía si no compensa.
+
+    Solo se parte cuando el vídeo se recodifica, dura al menos
+    ``SEGMENTED_ENCODE_MIN_DURATION`` y hay más de un codificador.
+
+    Returns:
+        List: Tramos ``(inicio, frames)``; el último tiene ``frames`` None (hasta el final)
+    """
+    workers = workers or encode_workers()
+    if plan.get('video') != 'libx264' or not duration or duration < SEGMENTED_ENCODE_MIN_DURATION or workers < 2:
+        return []
+    times, keyframes = video_packets(input_path, plan['video_map'], start_time)
+    segments = split_at_keyframes(keyframes, duration, workers * SEGMENTED_ENCODE_SEGMENTS_PER_WORKER)
+    if len(segments) < 2:
+        return []
+    return [(start, count_frames(times, start, end)) for start, end in segments]
+
+
+def segment_task(input_path: str, output_path: str, plan: Dict, start: float, frames: Optional[int], threads: int) -> Dict:
+    """
+    Descripción autocontenida de un segmento (solo datos serializables, para
+    poder enviarla más adelante a un worker remoto).
+
+    El tramo se corta por número de frames y no por duración: así el redondeo
+    de los tiempos no puede duplicar ni perder el frame de la frontera.
+    """
+    # El corte va un poco antes del keyframe: el redondeo de los tiempos de
+    # ffprobe no debe dejar fuera el propio keyframe
+    seek = max(0.0, start - KEYFRAME_EPSILON)
+    args = ['ffmpeg', '-ss', f'{seek:.6f}', '-i', input_path]
+    if frames is not None:
+        args += ['-frames:v', str(frames)]
+    args += [
+        '-map', f"0:{plan['video_map']}", '-an', '-sn', '-dn',
+        '-c:v', 'libx264', '-preset', 'medium', '-crf', '23',
+        '-threads', str(threads), '-y', output_path,
+    ]
+    return {'args': args, 'output': output_path, 'start': start, 'frames': frames}
+
+
+def run_task(task: Dict, on_progress: Callable[[Dict], None], cancel: threading.Event) -> str:
+    """Ejecuta un segmento (o la pasada de audio) y devuelve su archivo"""
+    run_with_progress(task['args'], on_progress, cancel=cancel, nice=task.get('nice', 0))
+    return task['output']
+
+
+class SegmentedEncoder:
+    """
+    Codifica el vídeo en tramos que empiezan en keyframes, cada uno en su
+    propio proceso ffmpeg, y los une con el demuxer ``concat`` sin
+    recodificar. El audio se procesa en una sola pasada aparte (en paralelo
+    con los segmentos) y se añade al unir.
+
+    Los procesos ffmpeg se lanzan desde un pool de hilos; ``executor``
+    permite sustituirlo por otro ``concurrent.futures.Executor`` (p. ej. uno
+    que envíe las tareas a otras máquinas).
+    """
+
+    def __init__(self, workers: Optional[int] = None, executor: Optional[Executor] = None):
+        self.workers = workers or encode_workers()
+        self.executor = executor
+
+    def encode(
+        self,
+        input_path: str,
+        output_path: str,
+        plan: Dict,
+        segments: List[Tuple[float, Optional[int]]],
+        work_dir: Path,
+        on_progress: Callable[[Dict], None],
+        duration: float,
+        threads: Optional[int] = None,
+        nice: int = 0,
+    ) -> Dict:
+        """
+        Convierte ``input_path`` en ``output_path`` por segmentos.
+
+        Args:
+            plan: Plan de ``plan_h264`` (vídeo recodificado)
+            segments: Tramos de ``plan_segments``
+            work_dir: Carpeta para los segmentos (el scratch del trabajo)
+            on_progress: Recibe el progreso agregado con la forma de ``FFmpegProgress``
+            duration: Duración de la entrada en segundos
+            threads: Hilos de libx264 por segmento (por defecto, núcleos / workers)
+            nice: Niceness de los procesos ffmpeg
+
+        Returns:
+            Dict: Número de segmentos y segundos de codificación y de unión
+        """
+        work_dir = Path(work_dir)
+        work_dir.mkdir(parents=True, exist_ok=True)
+        threads = threads or max(1, available_cpus() // self.workers)
+
+        tasks = [
+            segment_task(input_path, str(work_dir / f'segment_{i:04d}.mp4'), plan, start, frames, threads)
+            for i, (start, frames) in enumerate(segments)
+        ]
+        audio_path = None
+        if plan.get('audio'):
+            audio_path = str(work_dir / 'audio.m4a')
+            audio_args = ['ffmpeg', '-i', input_path, '-map', f"0:{plan['audio_map']}", '-vn', '-c:a', plan['audio']]
+            if plan['audio'] != 'copy':
+                audio_args += ['-b:a', '192k']
+            tasks.append({'args': audio_args + ['-y', audio_path], 'output': audio_path, 'start': 0.0, 'frames': None})
+        for task in tasks:
+            task['nice'] = nice
+
+        # Progreso agregado: segundos codificados de todos los segmentos de vídeo
+        encoded = [0.0] * len(segments)
+        fps = [0.0] * len(segments)
+        lock = threading.Lock()
+        started = time.monotonic()
+
+        def progress_for(index: int):
+            def update(snapshot: Dict):
+                if index >= len(segments):
+                    return  # la pasada de audio no cuenta en el progreso
+                with lock:
+                    encoded[index] = snapshot['out_time']
+                    fps[index] = 0.0 if snapshot['done'] else (snapshot['fps'] or 0.0)
+                    total = sum(encoded)
+                    elapsed = time.monotonic() - started
+                    speed = total / elapsed if elapsed > 0 else None
+                    on_progress({
+                        'out_time': round(total, 2),
+                        'speed': round(speed, 2) if speed else None,
+                        'fps': round(sum(fps), 2),
+                        'frame': 0,
+                        'total_size': 0,
+                        'percent': min(100.0, total / duration * 100),
+                        'eta': max(0, int((duration - total) / speed)) if speed else None,
+                        'done': False,
+                    })
+            return update
+
+        cancel = threading.Event()
+        executor = self.executor or ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='encode')
+        try:
+            futures = [executor.submit(run_task, task, progress_for(i), cancel) for i, task in enumerate(tasks)]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except BaseException:
+                # Un segmento falló: terminar los demás en vez de esperar a que acaben
+                cancel.set()
+                for future in futures:
+                    future.cancel()
+                raise
+        finally:
+            if self.executor is None:
+                executor.shutdown(wait=True)
+        encode_seconds = time.monotonic() - started
+
+        list_path = work_dir / 'segments.txt'
+        list_path.write_text(
+            ''.join("file '{}'\n".format(task['output'].replace("'", "'\\''")) for task in tasks[:len(segments)]),
+            encoding='utf-8',
+        )
+        args = ['ffmpeg', '-f', 'concat', '-safe', '0', '-i', str(list_path)]
+        if audio_path:
+            args += ['-i', audio_path, '-map', '0:v', '-map', '1:a']
+        args += ['-c', 'copy', '-movflags', '+faststart', '-y', output_path]
+        run_with_progress(args, lambda snapshot: None)
+
+        for task in tasks:
+            try:
+                os.unlink(task['output'])
+            except OSError:
+                pass
+        list_path.unlink()
+        try:
+            work_dir.rmdir()
+        except OSError:
+            pass
+        return {
+            'segments': len(segments),
+            'encode_seconds': round(encode_seconds, 2),
+            'concat_seconds': round(time.monotonic() - started - encode_seconds, 2),
+        }
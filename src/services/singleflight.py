@@ -0,0 +1,165 @@
+"""Coalescencia de trabajos idénticos en curso (single-flight)"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Set
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error', 'followers')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Ejecuta una sola vez las llamadas concurrentes con la misma clave.
+
+    La primera llamada (líder) ejecuta la función; las que llegan mientras
+    está en curso esperan y reciben el mismo resultado o la misma excepción.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.coalesced = 0
+
+    def do(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.followers += 1
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def in_flight(self) -> int:
+        """Número de llamadas en curso"""
+        with self._lock:
+            return len(self._calls)
+
+
+class DownloadCoalescer:
+    """
+    Agrupa descargas idénticas en un único trabajo.
+
+    La primera descarga de una clave es la líder; las siguientes que llegan
+    mientras la líder sigue en curso se registran como seguidoras y comparten
+    su progreso y su archivo. Cada descarga (líder o seguidora) es una
+    referencia al trabajo; el archivo no debe limpiarse mientras queden
+    referencias.
+
+    El alias de una seguidora sobrevive a ``release`` (puede volver a pedir
+    el archivo) y dura lo que el trabajo líder: ``forget`` lo borra junto a
+    las referencias que nunca se soltaron cuando el trabajo se expulsa.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._leaders: Dict[Hashable, str] = {}  # clave -> id líder (en curso)
+        self._keys: Dict[str, Hashable] = {}  # id líder -> clave
+        self._aliases: Dict[str, str] = {}  # id seguidora -> id líder
+        self._followers: Dict[str, Set[str]] = {}  # id líder -> ids seguidoras
+        self._holders: Dict[str, Set[str]] = {}  # id líder -> descargas con referencia viva
+        self.coalesced = 0
+
+    def attach(self, key: Hashable, download_id: str) -> Optional[str]:
+        """
+        Registra una descarga.
+
+        Returns:
+            str: ID del trabajo líder si se adjuntó a uno en curso, None si
+            la descarga pasa a ser la líder de su clave
+        """
+        with self._lock:
+            leader_id = self._leaders.get(key)
+            if leader_id is not None:
+                self._aliases[download_id] = leader_id
+                self._followers.setdefault(leader_id, set()).add(download_id)
+                self._holders.setdefault(leader_id, set()).add(download_id)
+                self.coalesced += 1
+                return leader_id
+            self._leaders[key] = download_id
+            self._keys[download_id] = key
+            self._holders.setdefault(download_id, set()).add(download_id)
+            return None
+
+    def finish(self, leader_id: str):
+        """El trabajo terminó: las nuevas descargas de su clave ya no se adjuntan"""
+        with self._lock:
+            key = self._keys.pop(leader_id, None)
+            if key is not None and self._leaders.get(key) == leader_id:
+                del self._leaders[key]
+
+    def resolve(self, download_id: str) -> str:
+        """ID del trabajo que realmente atiende a una descarga"""
+        return self._aliases.get(download_id, download_id)
+
+    def release(self, download_id: str) -> bool:
+        """
+        Suelta la referencia de una descarga (soltarla dos veces no cuenta).
+
+        Returns:
+            bool: True si era la última referencia del trabajo
+        """
+        with self._lock:
+            leader_id = self._aliases.get(download_id, download_id)
+            holders = self._holders.get(leader_id)
+            if holders is None or download_id not in holders:
+                return False
+            holders.discard(download_id)
+            if not holders:
+                del self._holders[leader_id]
+                return True
+            return False
+
+    def detach(self, download_id: str):
+        """Suelta la referencia y separa la descarga de su líder (p. ej. al cancelarla)"""
+        self.release(download_id)
+        with self._lock:
+            leader_id = self._aliases.pop(download_id, None)
+            if leader_id is not None:
+                self._followers.get(leader_id, set()).discard(download_id)
+
+    def forget(self, leader_id: str):
+        """El trabajo líder se expulsó: borra sus alias y referencias pendientes"""
+        with self._lock:
+            for download_id in self._followers.pop(leader_id, ()):
+                self._aliases.pop(download_id, None)
+            self._holders.pop(leader_id, None)
+            key = self._keys.pop(leader_id, None)
+            if key is not None and self._leaders.get(key) == leader_id:
+                del self._leaders[key]
+
+    def refcount(self, leader_id: str) -> int:
+        """Referencias vivas de un trabajo"""
+        with self._lock:
+            return len(self._holders.get(leader_id, ()))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'in_flight': len(self._leaders),
+                'followers': len(self._aliases),
+                'coalesced': self.coalesced,
+            }
@@ -0,0 +1,275 @@
+"""Cuota de disco de la carpeta de descargas con expulsión LRU"""
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.config import (
+    DOWNLOAD_FOLDER, STORAGE_MAX_BYTES, STORAGE_HIGH_WATERMARK, STORAGE_LOW_WATERMARK,
+    STORAGE_PIN_TIMEOUT
+)
+from src.services.job_files import JobFileIndex, PARTIAL_SUFFIXES
+
+# Archivos sueltos en DOWNLOAD_FOLDER que se pueden borrar tras un reinicio:
+# solo temporales; un archivo terminado puede ser del usuario (/api/convert)
+ORPHAN_SUFFIXES = PARTIAL_SUFFIXES
+
+
+def directory_files(path: Path, files: Optional[Dict[Tuple[int, int], int]] = None) -> Dict[Tuple[int, int], int]:
+    """
+    Archivos de una carpeta (recursivo) por ``(st_dev, st_ino)``.
+
+    Los enlaces duros de la deduplicación comparten inodo, así que cada
+    contenido aparece una sola vez con su tamaño.
+    """
+    if files is None:
+        files = {}
+    try:
+        entries = list(os.scandir(path))
+    except FileNotFoundError:
+        return files
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                directory_files(entry.path, files)
+            elif entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                files[(stat.st_dev, stat.st_ino)] = stat.st_size
+        except OSError:
+            pass
+    return files
+
+
+def directory_size(path: Path) -> int:
+    """Bytes que ocupan los archivos de una carpeta (cada inodo una vez)"""
+    return sum(directory_files(path).values())
+
+
+class StorageManager:
+    """
+    Mantiene las carpetas de trabajo por debajo de ``max_bytes``.
+
+    Cada trabajo terminado (con éxito o no) se registra con ``track`` y
+    entra en una lista LRU; servir sus archivos lo marca como usado. Cuando
+    el total supera la marca alta se borran los trabajos menos usados hasta
+    bajar de la marca baja. Los trabajos fijados (``pin``, mientras se
+    envía un archivo) y los que siguen en curso no se borran. Un cliente
+    que corta la conexión puede dejar un pin sin soltar, así que los pins
+    caducan pasado ``STORAGE_PIN_TIMEOUT``.
+
+    El uso se cuenta por inodo: un archivo enlazado desde varios trabajos
+    (deduplicado) ocupa disco una vez y solo se libera al expulsar el
+    último trabajo que lo enlaza.
+    """
+
+    def __init__(
+        self,
+        job_index: JobFileIndex,
+        max_bytes: int = STORAGE_MAX_BYTES,
+        high_watermark: float = STORAGE_HIGH_WATERMARK,
+        low_watermark: float = STORAGE_LOW_WATERMARK,
+        on_evict: Optional[Callable[[str], None]] = None,
+    ):
+        self.job_index = job_index
+        self.max_bytes = max_bytes
+        self.high_bytes = int(max_bytes * high_watermark)
+        self.low_bytes = int(max_bytes * low_watermark)
+        self.on_evict = on_evict
+        self._lock = threading.Lock()
+        # job_id -> {(st_dev, st_ino): tamaño} de sus archivos, en orden LRU
+        self._entries: "OrderedDict[str, Dict[Tuple[int, int], int]]" = OrderedDict()
+        self._links: Dict[Tuple[int, int], int] = {}  # inodo -> trabajos que lo enlazan
+        self._pins: Dict[str, list] = {}  # job_id -> [número de pins, último pin]
+        self._bytes = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.reaped_files = 0
+        self.reaped_bytes = 0
+
+    def _add(self, job_id: str, files: Dict[Tuple[int, int], int]):
+        """Cuenta los archivos de un trabajo (con ``_lock`` tomado)"""
+        self._entries[job_id] = files
+        for key, size in files.items():
+            self._links[key] = self._links.get(key, 0) + 1
+            if self._links[key] == 1:
+                self._bytes += size
+
+    def _remove(self, job_id: str) -> int:
+        """
+        Deja de contar un trabajo (con ``_lock`` tomado).
+
+        Returns:
+            int: Bytes que se liberan (los inodos que nadie más enlaza)
+        """
+        freed = 0
+        for key, size in self._entries.pop(job_id, {}).items():
+            self._links[key] -= 1
+            if self._links[key] == 0:
+                del self._links[key]
+                freed += size
+        self._bytes -= freed
+        return freed
+
+    def track(self, job_id: str):
+        """Registra (o actualiza) el tamaño de un trabajo terminado y aplica la cuota"""
+        files = directory_files(self.job_index.directory(job_id))
+        with self._lock:
+            self._remove(job_id)
+            if files:
+                self._add(job_id, files)
+        self.enforce()
+
+    def forget(self, job_id: str):
+        """Deja de contar un trabajo cuya carpeta se borró por otra vía"""
+        with self._lock:
+            self._remove(job_id)
+
+    def touch(self, job_id: str):
+        """Marca un trabajo como usado recientemente"""
+        with self._lock:
+            if job_id in self._entries:
+                self._entries.move_to_end(job_id)
+
+    @contextmanager
+    def pinned(self, job_id: str):
+        """Impide expulsar el trabajo mientras dure el bloque"""
+        self.pin(job_id)
+        try:
+            yield
+        finally:
+            self.unpin(job_id)
+
+    def pin(self, job_id: str):
+        with self._lock:
+            pin = self._pins.setdefault(job_id, [0, 0.0])
+            pin[0] += 1
+            pin[1] = time.monotonic()
+            if job_id in self._entries:
+                self._entries.move_to_end(job_id)
+
+    def unpin(self, job_id: str):
+        with self._lock:
+            pin = self._pins.get(job_id)
+            if pin is not None:
+                pin[0] -= 1
+                if pin[0] <= 0:
+                    del self._pins[job_id]
+        self.enforce()
+
+    def _is_pinned(self, job_id: str, now: float) -> bool:
+        pin = self._pins.get(job_id)
+        return pin is not None and now - pin[1] < STORAGE_PIN_TIMEOUT
+
+    def enforce(self):
+        """Si se superó la marca alta, expulsa por LRU hasta la marca baja"""
+        victims = []
+        with self._lock:
+            if self._bytes <= self.high_bytes:
+                return
+            now = time.monotonic()
+            for job_id in list(self._entries):
+                if self._bytes <= self.low_bytes:
+                    break
+                if self._is_pinned(job_id, now):
+                    continue
+                victims.append((job_id, self._remove(job_id)))
+            self.evictions += len(victims)
+            self.evicted_bytes += sum(size for _, size in victims)
+
+        for job_id, size in victims:
+            self.job_index.discard(job_id)
+            if self.on_evict:
+                self.on_evict(job_id)
+        if victims:
+            print(f"[STORAGE] {len(victims)} trabajos expulsados ({sum(s for _, s in victims) / 1024 ** 2:.0f} MB)")
+
+    def _reap(self, path: Path):
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        self.reaped_files += 1
+        self.reaped_bytes += size
+
+    def startup(self, is_known: Callable[[str], bool], is_finished: Callable[[str], bool]):
+        """
+        Limpieza al arrancar, cuando el diario ya restauró los trabajos.
+
+        Borra las carpetas de trabajos desconocidos, los parciales de los
+        trabajos terminados, el scratch de los que no se van a reanudar y
+        los temporales sueltos de la carpeta de descargas, y registra el
+        tamaño de los trabajos terminados.
+
+        Args:
+            is_known: Si un ID de trabajo sigue existiendo tras el reinicio
+            is_finished: Si un trabajo conocido ya terminó (se puede expulsar)
+        """
+        finished = []
+        for entry in list(os.scandir(self.job_index.folder)):
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            job_id = entry.name
+            if not is_known(job_id):
+                size = directory_size(Path(entry.path))
+                self.job_index.discard(job_id)
+                self.reaped_files += 1
+                self.reaped_bytes += size
+            elif is_finished(job_id):
+                # Un .publishing es una copia entre volúmenes que no llegó a renombrarse
+                for child in os.scandir(entry.path):
+                    if child.is_file() and child.name.endswith(PARTIAL_SUFFIXES):
+                        self._reap(Path(child.path))
+                finished.append((entry.stat().st_mtime, job_id, directory_files(Path(entry.path))))
+
+        # Scratch de trabajos que no se van a reanudar: desconocidos o ya
+        # terminados (si la descarga llegó a publicar, lo que quede es basura)
+        for entry in list(os.scandir(self.job_index.scratch_folder)):
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            job_id = entry.name
+            if not is_known(job_id) or is_finished(job_id):
+                size = directory_size(Path(entry.path))
+                self.job_index.drop_scratch(job_id)
+                if not is_known(job_id):
+                    self.job_index.discard(job_id)
+                self.reaped_files += 1
+                self.reaped_bytes += size
+
+        # Sin accesos registrados, el orden LRU inicial es el de modificación
+        with self._lock:
+            for _, job_id, files in sorted(finished, key=lambda item: item[:2]):
+                self._add(job_id, files)
+
+        for entry in list(os.scandir(DOWNLOAD_FOLDER)):
+            if entry.is_file(follow_symlinks=False) and entry.name.endswith(ORPHAN_SUFFIXES):
+                self._reap(Path(entry.path))
+
+        if self.reaped_files:
+            print(f"[STORAGE] {self.reaped_files} huérfanos borrados ({self.reaped_bytes / 1024 ** 2:.0f} MB)")
+        self.enforce()
+
+    def stats(self) -> Dict:
+        """Uso de la cuota, marcas y contadores de limpieza"""
+        disk = shutil.disk_usage(self.job_index.folder)
+        with self._lock:
+            return {
+                'used_bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'high_watermark_bytes': self.high_bytes,
+                'low_watermark_bytes': self.low_bytes,
+                'usage_percent': round(self._bytes / self.max_bytes * 100, 1) if self.max_bytes else None,
+                'jobs': len(self._entries),
+                'pinned': sum(1 for job_id in self._pins if self._is_pinned(job_id, time.monotonic())),
+                'evictions': self.evictions,
+                'evicted_bytes': self.evicted_bytes,
+                'reaped_files': self.reaped_files,
+                'reaped_bytes': self.reaped_bytes,
+                'disk_free_bytes': disk.free,
+            }
@@ -0,0 +1,138 @@
+"""Base de las colas de prioridad atendidas por hilos propios"""
+import bisect
+import itertools
+import math
+import threading
+import time
+from typing import Callable, List, Optional
+
+
+class QueuedJob:
+    __slots__ = ('sort_key', 'job_id', 'priority', 'host', 'args')
+
+    def __init__(self, priority: int, seq: int, job_id: str, args: tuple, host: Optional[str] = None):
+        # Mayor prioridad primero; a igual prioridad, orden de llegada
+        self.sort_key = (-priority, seq)
+        self.job_id = job_id
+        self.priority = priority
+        self.host = host
+        self.args = args
+
+    def __lt__(self, other):
+        return self.sort_key < other.sort_key
+
+
+class PriorityWorkerPool:
+    """
+    Ejecuta trabajos por prioridad en un número fijo de hilos propios.
+
+    Las subclases deciden qué trabajo de la cola puede empezar
+    (``_take_runnable``), cómo se llama al manejador (``_run``), qué se
+    publica de cada trabajo en cola (``_publish_position``) y qué hacer al
+    empezar y terminar (``_started``, ``_finished``, con ``_cond`` tomado).
+    """
+
+    # Excepción (con ``retry_after``) cuando la cola está llena
+    queue_full_error = Exception
+    worker_name = 'worker'
+    log_prefix = '[WORKER] Trabajo'
+    # Duración media inicial (segundos) y tope de Retry-After
+    initial_duration = 30.0
+    retry_after_max = 300
+
+    def __init__(self, handler: Callable, max_workers: int, max_queued: int):
+        self._handler = handler
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+
+        self._cond = threading.Condition()
+        self._queue: List[QueuedJob] = []
+        self._seq = itertools.count()
+        self._workers: List[threading.Thread] = []
+        # Duración media de un trabajo (EMA), usada para estimar Retry-After
+        self._avg_duration = self.initial_duration
+
+    def _ensure_workers(self):
+        if self._workers:
+            return
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"{self.worker_name}-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _retry_after(self) -> int:
+        estimate = self._avg_duration * (len(self._queue) + 1) / self.max_workers
+        return max(1, min(self.retry_after_max, math.ceil(estimate)))
+
+    def _enqueue(self, job_id: str, args: tuple, priority: int, host: Optional[str] = None) -> int:
+        with self._cond:
+            if len(self._queue) >= self.max_queued:
+                raise self.queue_full_error(self._retry_after())
+            job = QueuedJob(priority, next(self._seq), job_id, args, host)
+            bisect.insort(self._queue, job)
+            self._ensure_workers()
+            self._publish_positions()
+            self._cond.notify_all()
+            return self.position(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Quita un trabajo de la cola si todavía no ha empezado"""
+        with self._cond:
+            for i, job in enumerate(self._queue):
+                if job.job_id == job_id:
+                    del self._queue[i]
+                    self._publish_positions()
+                    return True
+        return False
+
+    def position(self, job_id: str) -> int:
+        """Posición en la cola de un trabajo (0 si no está en cola)"""
+        for i, job in enumerate(self._queue):
+            if job.job_id == job_id:
+                return i + 1
+        return 0
+
+    def _publish_positions(self):
+        for i, job in enumerate(self._queue):
+            self._publish_position(job, i + 1)
+
+    def _publish_position(self, job: QueuedJob, position: int):
+        pass
+
+    def _take_runnable(self) -> Optional[QueuedJob]:
+        if not self._queue:
+            return None
+        job = self._queue.pop(0)
+        self._started(job)
+        self._publish_positions()
+        return job
+
+    def _started(self, job: QueuedJob):
+        pass
+
+    def _finished(self, job: QueuedJob):
+        pass
+
+    def _run(self, job: QueuedJob):
+        self._handler(job.job_id, *job.args)
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                job = self._take_runnable()
+                while job is None:
+                    self._cond.wait()
+                    job = self._take_runnable()
+
+            started = time.monotonic()
+            try:
+                self._run(job)
+            except Exception as e:
+                print(f"{self.log_prefix} {job.job_id} falló: {e}")
+            finally:
+                elapsed = time.monotonic() - started
+                with self._cond:
+                    self._avg_duration = 0.8 * self._avg_duration + 0.2 * elapsed
+                    self._finished(job)
+                    self._cond.notify_all()
+
@@ -11,6 +11,7 @@ let selectedQuality = null;
 let selectedAudioQuality = 192; // Por defecto 192kbps
 let availableQualities = [];
 let currentDownloadId = null; // ID de la descarga actual para poder cancelarla
+let currentScanToken = null; // Token del último escaneo para reutilizar su extracción
 
 // Theme Handling
 const themeSwitch = document.getElementById('themeSwitch');
@@ -216,6 +217,7 @@ async function scanVideo() {
         if (!response.ok) throw new Error('No se pudo obtener la información del video');
 
         const data = await response.json();
+        currentScanToken = data.scan_token || null;
 
         // Determine start placeholder based on duration format
         const formattedDuration = formatTime(data.duration);
@@ -310,6 +312,17 @@ function formatTimeInput(input) {
     }
 }
 
+function formatBytes(bytes) {
+    const units = ['B', 'KiB', 'MiB', 'GiB'];
+    let value = bytes;
+    let unit = 0;
+    while (value >= 1024 && unit < units.length - 1) {
+        value /= 1024;
+        unit++;
+    }
+    return `${value.toFixed(unit === 0 ? 0 : 1)} ${units[unit]}`;
+}
+
 function formatTime(seconds) {
     if (seconds === null || seconds === undefined || isNaN(seconds)) {
         return '--:--';
@@ -352,10 +365,16 @@ async function download() {
                 start_time: startTime || null,
                 end_time: endTime || null,
                 quality: selectedFormat === 'mp4' ? selectedQuality : null,
-                audio_quality: selectedFormat === 'mp3' ? selectedAudioQuality : null
+                audio_quality: selectedFormat === 'mp3' ? selectedAudioQuality : null,
+                scan_token: currentScanToken
             })
         });
 
+        if (startResponse.status === 429) {
+            const retryAfter = startResponse.headers.get('Retry-After');
+            throw new Error(`Hay demasiadas descargas en cola. Inténtalo de nuevo en ${retryAfter || 'unos'} segundos.`);
+        }
+
         if (!startResponse.ok) {
             const error = await startResponse.json();
             throw new Error(error.detail || 'Error al iniciar descarga');
@@ -364,58 +383,46 @@ async function download() {
         const { download_id } = await startResponse.json();
         currentDownloadId = download_id; // Guardar para poder cancelar
 
-        // Polling para obtener progreso
-        let completed = false;
-        while (!completed) {
-            await new Promise(resolve => setTimeout(resolve, 500)); // Esperar 500ms
-
-            const progressResponse = await fetch(`/api/download/progress/${download_id}`);
-            const progress = await progressResponse.json();
+        // Esperar al final de la descarga (push por SSE, polling como respaldo)
+        const progress = await waitForProgress('download', download_id, updateProgressModal, 500);
+        currentDownloadId = null;
 
-            // Si fue cancelada, salir del loop
-            if (progress.status === 'cancelled') {
-                completed = true;
-                currentDownloadId = null;
-                return; // El modal de cancelación ya se mostró
-            }
-
-            updateProgressModal(progress);
-
-            if (progress.status === 'completed') {
-                completed = true;
-                currentDownloadId = null;
-
-                // Descargar el archivo
-                const fileResponse = await fetch(`/api/download/file/${download_id}`);
-                if (!fileResponse.ok) {
-                    throw new Error('Error al obtener el archivo');
-                }
+        // Si fue cancelada, el modal de cancelación ya se mostró
+        if (progress.status === 'cancelled') {
+            return;
+        }
 
-                const blob = await fileResponse.blob();
-                const downloadUrl = window.URL.createObjectURL(blob);
-                const a = document.createElement('a');
-                a.href = downloadUrl;
-
-                const contentDisposition = fileResponse.headers.get('content-disposition');
-                let filename = 'video.' + selectedFormat;
-                if (contentDisposition) {
-                    const matches = contentDisposition.match(/filename="?(.+)"?/);
-                    if (matches && matches[1]) {
-                        filename = matches[1].replace(/"/g, '');
-                    }
-                }
+        if (progress.status === 'error') {
+            throw new Error(progress.error || 'Error durante la descarga');
+        }
 
-                a.download = filename;
-                document.body.appendChild(a);
-                a.click();
-                window.URL.revokeObjectURL(downloadUrl);
-                a.remove();
+        // Descargar el archivo
+        const fileResponse = await fetch(`/api/download/file/${download_id}`);
+        if (!fileResponse.ok) {
+            throw new Error('Error al obtener el archivo');
+        }
 
-                showModal('success', 'check-circle-2', '¡Descarga Completada!', 'El archivo se ha guardado correctamente');
-            } else if (progress.status === 'error') {
-                throw new Error(progress.error || 'Error durante la descarga');
+        const blob = await fileResponse.blob();
+        const downloadUrl = window.URL.createObjectURL(blob);
+        const a = document.createElement('a');
+        a.href = downloadUrl;
+
+        const contentDisposition = fileResponse.headers.get('content-disposition');
+        let filename = 'video.' + selectedFormat;
+        if (contentDisposition) {
+            const matches = contentDisposition.match(/filename="?(.+)"?/);
+            if (matches && matches[1]) {
+                filename = matches[1].replace(/"/g, '');
             }
         }
+
+        a.download = filename;
+        document.body.appendChild(a);
+        a.click();
+        window.URL.revokeObjectURL(downloadUrl);
+        a.remove();
+
+        showModal('success', 'check-circle-2', '¡Descarga Completada!', 'El archivo se ha guardado correctamente');
     } catch (error) {
         showModal('error', 'x-circle', 'Error', error.message);
     } finally {
@@ -423,6 +430,71 @@ async function download() {
     }
 }
 
+// =====================================================
+// PROGRESS STREAMING
+// =====================================================
+
+const TERMINAL_STATUSES = ['completed', 'error', 'cancelled'];
+
+/**
+ * Sigue el progreso de un trabajo hasta que termina.
+ *
+ * Usa Server-Sent Events (/api/progress/stream), que solo envía cambios, y
+ * vuelve al polling de /api/{kind}/progress/{id} si el push no está disponible.
+ *
+ * @param {string} kind - 'download' o 'convert'
+ * @param {string} id - ID del trabajo
+ * @param {Function} onUpdate - Se llama con cada estado (excepto 'cancelled')
+ * @param {number} pollInterval - Intervalo de polling en ms (solo respaldo)
+ * @returns {Promise<Object>} Estado final del trabajo
+ */
+function waitForProgress(kind, id, onUpdate, pollInterval) {
+    return new Promise((resolve, reject) => {
+        let settled = false;
+
+        const handle = (progress) => {
+            if (settled) return true;
+            if (progress.status !== 'cancelled') onUpdate(progress);
+            if (TERMINAL_STATUSES.includes(progress.status)) {
+                settled = true;
+                resolve(progress);
+                return true;
+            }
+            return false;
+        };
+
+        const poll = async () => {
+            try {
+                while (!settled) {
+                    await new Promise(r => setTimeout(r, pollInterval));
+                    const response = await fetch(`/api/${kind}/progress/${id}`);
+                    if (handle(await response.json())) return;
+                }
+            } catch (error) {
+                settled = true;
+                reject(error);
+            }
+        };
+
+        if (!window.EventSource) {
+            poll();
+            return;
+        }
+
+        const param = kind === 'download' ? 'downloads' : 'conversions';
+        const source = new EventSource(`/api/progress/stream?${param}=${encodeURIComponent(id)}`);
+        source.onmessage = (event) => {
+            const data = JSON.parse(event.data);
+            if (handle(data.progress)) source.close();
+        };
+        source.onerror = () => {
+            // Push no disponible o conexión cortada: seguir por polling
+            source.close();
+            if (!settled) poll();
+        };
+    });
+}
+
 function showProgressModal() {
     const modalOverlay = document.getElementById('modalOverlay');
     const modalContent = document.getElementById('modalContent');
@@ -478,17 +550,23 @@ function updateProgressModal(progress) {
     progressFill.style.width = `${percent}%`;
     progressPercent.textContent = `${percent}%`;
 
-    if (progress.speed) {
-        progressSpeed.textContent = progress.speed;
+    if (progress.message) {
+        progressSpeed.textContent = progress.message;
+    } else if (progress.speed) {
+        progressSpeed.textContent = `${formatBytes(progress.speed)}/s`;
     }
 
     if (progress.status === 'downloading') {
-        const downloaded = progress.downloaded || '';
-        const total = progress.total || '';
-        const eta = progress.eta ? `ETA: ${progress.eta}` : '';
+        const downloaded = progress.downloaded_bytes ? formatBytes(progress.downloaded_bytes) : '';
+        const total = progress.total_bytes ? formatBytes(progress.total_bytes) : '';
+        const eta = progress.eta != null ? `ETA: ${formatTime(progress.eta)}` : '';
         progressDetails.textContent = `${downloaded} / ${total} ${eta}`.trim();
     } else if (progress.status === 'processing') {
         progressDetails.textContent = 'Procesando video...';
+    } else if (progress.status === 'queued') {
+        progressDetails.textContent = progress.queue_position
+            ? `En cola (posición ${progress.queue_position})...`
+            : 'En cola...';
     } else if (progress.status === 'starting') {
         progressDetails.textContent = 'Iniciando descarga...';
     }
@@ -556,42 +634,31 @@ async function uploadAndConvert() {
         const { convert_id } = await startResponse.json();
         currentConvertId = convert_id;
 
-        // Polling para obtener progreso
-        let completed = false;
-        while (!completed) {
-            await new Promise(resolve => setTimeout(resolve, 1000));
-
-            const progressResponse = await fetch(`/api/convert/progress/${convert_id}`);
-            const progress = await progressResponse.json();
-
-            updateConvertProgressModal(progress);
-
-            if (progress.status === 'completed') {
-                completed = true;
-                currentConvertId = null;
+        // Esperar al final de la conversión (push por SSE, polling como respaldo)
+        const progress = await waitForProgress('convert', convert_id, updateConvertProgressModal, 1000);
+        currentConvertId = null;
 
-                // Download the file
-                closeModal();
-                showModal('loading', 'loader', 'Descargando...', 'Tu archivo H.264 está listo. Descargando automáticamente...');
+        if (progress.status === 'error') {
+            throw new Error(progress.error || 'Error durante la conversión');
+        }
 
-                const a = document.createElement('a');
-                a.style.display = 'none';
-                a.href = `/api/convert/download/${convert_id}`;
-                a.download = progress.filename || 'convertido_h264.mp4';
-                document.body.appendChild(a);
-                a.click();
+        // Download the file
+        closeModal();
+        showModal('loading', 'loader', 'Descargando...', 'Tu archivo H.264 está listo. Descargando automáticamente...');
 
-                setTimeout(() => {
-                    document.body.removeChild(a);
-                    closeModal();
-                    showModal('success', 'check-circle-2', '¡Completado!', 'Tu video ha sido convertido y descargado.');
-                    resetUploadZone();
-                }, 2000);
+        const a = document.createElement('a');
+        a.style.display = 'none';
+        a.href = `/api/convert/download/${convert_id}`;
+        a.download = progress.filename || 'convertido_h264.mp4';
+        document.body.appendChild(a);
+        a.click();
 
-            } else if (progress.status === 'error') {
-                throw new Error(progress.error || 'Error durante la conversión');
-            }
-        }
+        setTimeout(() => {
+            document.body.removeChild(a);
+            closeModal();
+            showModal('success', 'check-circle-2', '¡Completado!', 'Tu video ha sido convertido y descargado.');
+            resetUploadZone();
+        }, 2000);
     } catch (error) {
         closeModal();
         showModal('error', 'x-circle', 'Error', error.message);
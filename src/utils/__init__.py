@@ -1,5 +1,7 @@
 """Utilidades del proyecto"""
+from .cpu_utils import available_cpus
 from .ffmpeg_finder import find_ffmpeg
 from .file_utils import sanitize_filename
+from .url_utils import get_host_key, normalize_url
 
-__all__ = ['find_ffmpeg', 'sanitize_filename']
+__all__ = ['available_cpus', 'find_ffmpeg', 'sanitize_filename', 'get_host_key', 'normalize_url']
@@ -0,0 +1,50 @@
+"""Utilidad para saber cuántos núcleos puede usar el proceso"""
+import math
+import os
+from pathlib import Path
+from typing import Optional
+
+# Límites de CPU del contenedor (cgroup v2 y v1)
+CGROUP_V2_CPU_MAX = Path('/sys/fs/cgroup/cpu.max')
+CGROUP_V1_QUOTA = Path('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+CGROUP_V1_PERIOD = Path('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+
+
+def _cgroup_cpu_limit() -> Optional[float]:
+    """Núcleos que permite la cuota del cgroup (None si no hay cuota)"""
+    try:
+        quota, _, period = CGROUP_V2_CPU_MAX.read_text().strip().partition(' ')
+        if quota != 'max':
+            return int(quota) / int(period or 100000)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int(CGROUP_V1_QUOTA.read_text().strip())
+        period = int(CGROUP_V1_PERIOD.read_text().strip())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus() -> int:
+    """
+    Núcleos disponibles para el proceso.
+
+    Tiene en cuenta la afinidad (``taskset``, cpusets) y la cuota de CPU del
+    cgroup (límites de Docker/Kubernetes), no solo los núcleos de la máquina.
+
+    Returns:
+        int: Núcleos utilizables (al menos 1)
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # Windows y macOS no tienen sched_getaffinity
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(1, cpus)
@@ -0,0 +1,50 @@
+"""Utilidades para manejo de URLs"""
+from urllib.parse import urlparse, urlsplit, urlunsplit
+
+# Plataformas conocidas y los dominios que las identifican
+PLATFORM_DOMAINS = {
+    'youtube': ('youtube.com', 'youtu.be', 'youtube-nocookie.com'),
+    'tiktok': ('tiktok.com',),
+    'kick': ('kick.com',),
+    'twitch': ('twitch.tv',),
+    'facebook': ('facebook.com', 'fb.watch'),
+}
+
+
+def get_host_key(url: str) -> str:
+    """
+    Obtiene la clave de plataforma/host de una URL.
+
+    Args:
+        url: URL del video
+
+    Returns:
+        str: Nombre de la plataforma conocida (ej: 'youtube') o el host sin 'www.'
+    """
+    host = (urlparse(url).hostname or '').lower()
+    for platform, domains in PLATFORM_DOMAINS.items():
+        if any(host == d or host.endswith('.' + d) for d in domains):
+            return platform
+    return host[4:] if host.startswith('www.') else host
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normaliza una URL para usarla como clave (caché, deduplicación).
+
+    Quita espacios, pasa el esquema y el host a minúsculas, elimina el
+    fragmento y, en TikTok, los parámetros de seguimiento de la query.
+
+    Args:
+        url: URL original
+
+    Returns:
+        str: URL normalizada
+    """
+    parts = urlsplit(url.strip())
+    netloc = parts.netloc.lower()
+    query = parts.query
+    # Limpiar URL de TikTok (los parámetros solo son de seguimiento)
+    if 'tiktok.com' in netloc:
+        query = ''
+    return urlunsplit((parts.scheme.lower(), netloc, parts.path, query, ''))